@@ -0,0 +1,65 @@
+"""Aggregations over mirrored symptom_records for the admin analytics page
+
+Every function takes the DataFrame from mirror.load_frame (typed columns) and
+works column-wise, so a few hundred thousand records aggregate in well under
+a second.
+"""
+import pandas as pd
+
+RISK_BINS = [0, 20, 40, 60, 80, 100]
+RISK_LABELS = ["0-20%", "20-40%", "40-60%", "60-80%", "80-100%"]
+CONDITION_PATTERN = r"(?:^|, )(?P<condition>.+?) \((?P<risk>High|Medium|Low)\)"
+SCORE_SUFFIX = r" - Risk Score: \d+%$"
+
+def with_date(frame):
+    """Frame with a 'date' column (YYYY-MM-DD) taken from the timestamp"""
+    return frame.assign(date=frame['timestamp'].str.slice(0, 10))
+
+def condition_prevalence(frame, by=None):
+    """Share of submissions flagging each rule-based condition, optionally per group column(s)
+
+    Returns columns [*by, condition, submissions, high_risk, share].
+    """
+    by = [by] if isinstance(by, str) else list(by or [])
+    # Few distinct conditions cells repeat across many records; parse each one once
+    cells = frame.groupby(by + ['conditions'], observed=True).size().rename('records').reset_index()
+    found = cells['conditions'].str.extractall(CONDITION_PATTERN)
+    cell = found.index.get_level_values(0)
+    matches = cells.drop(columns='conditions').iloc[cell].reset_index(drop=True)
+    matches['cell'] = cell
+    # The TB condition carries its score in the name
+    matches['condition'] = found['condition'].str.replace(SCORE_SUFFIX, "", regex=True).to_numpy()
+    matches['high'] = (found['risk'] == "High").to_numpy() * matches['records']
+    # A condition listed twice in one record still counts once
+    matches = matches.drop_duplicates(subset=['cell', 'condition'])
+    counts = matches.groupby(by + ['condition']).agg(
+        submissions=('records', 'sum'), high_risk=('high', 'sum')
+    ).reset_index()
+    if by:
+        counts = counts.join(frame.groupby(by).size().rename('total'), on=by)
+    else:
+        counts['total'] = len(frame)
+    counts['share'] = counts['submissions'] / counts['total']
+    counts = counts.drop(columns='total')
+    return counts.sort_values(by + ['submissions'], ascending=[True] * len(by) + [False], ignore_index=True)
+
+def risk_distribution(frame, column='risk_score', by=None):
+    """Submissions per risk-score band, as a table of bands x groups"""
+    bands = pd.cut(frame[column].clip(0, 100), RISK_BINS, labels=RISK_LABELS, include_lowest=True)
+    if by is None:
+        return bands.value_counts(sort=False).rename('submissions').to_frame()
+    return pd.crosstab(bands, frame[by]).rename_axis(index=column)
+
+def bmi_categories(frame, by=('location', 'date')):
+    """Submissions per BMI category for each group, one column per category"""
+    frame = with_date(frame) if 'date' in by and 'date' not in frame else frame
+    return pd.crosstab([frame[column] for column in by], frame['bmi_category'])
+
+def daily_summary(frame):
+    """Per-day submissions, mean risk scores and mean BMI"""
+    return with_date(frame).groupby('date').agg(
+        submissions=('timestamp', 'size'),
+        mean_risk=('risk_score', 'mean'),
+        mean_tb_risk=('tb_risk_score', 'mean'),
+        mean_bmi=('bmi', 'mean')
+    )
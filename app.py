@@ -1,564 +1,172 @@
 import streamlit as st
-from oauth2client.service_account import ServiceAccountCredentials
-import gspread
 from datetime import datetime
-import pandas as pd
-import numpy as np
-import pickle
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import accuracy_score, classification_report
+import atexit
+import os
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+
+from catalog import CATALOG, FORM_CHOICES, HISTORY_OPTIONS
+from rules import calculate_bmi, enhanced_diagnose
+from storage import (RECORD_STORE, SheetWriter, SheetsRecordStore, configured_record_store,
+                     configured_sheet_connection, format_conditions, format_ml_predictions, make_record_row)
+from metrics import timed, observe, stages, start_exporters
+
+# Set SHOW_METRICS_PANEL=1 to show per-stage latency in the sidebar
+SHOW_METRICS_PANEL = os.environ.get("SHOW_METRICS_PANEL", "0") == "1"
+
+# Where and how submissions are stored is set by RECORD_STORE, RECORD_STORE_PATH,
+# RECORD_FORMAT and SHEETS_STUB; see the CONFIGURED STORE section of storage.py
+
+# Seconds between incremental retrains from stored records; 0 (default) disables them
+RETRAIN_INTERVAL = float(os.environ.get("RETRAIN_INTERVAL", "0"))
+
+# Threads shared by every session for the submit stages, and how long a rendered
+# page waits for its row to be saved before saying it is saving in the background
+SUBMIT_WORKERS = int(os.environ.get("SUBMIT_WORKERS", "8"))
+PERSIST_STATUS_WAIT = 2.0
+
 # ---------- GOOGLE SHEETS CONNECTION ----------
-SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-service_account_info = st.secrets["google_service_account"]
-CREDS = ServiceAccountCredentials.from_json_keyfile_dict(service_account_info, SCOPE)
-CLIENT = gspread.authorize(CREDS)
-SHEET_NAME = "symptom_records"
+@st.cache_resource
+def get_sheet_connection():
+    """One Sheets connection shared by every session in this server process"""
+    return configured_sheet_connection(lambda: dict(st.secrets["google_service_account"]))
 
-# Get the worksheet
-try:
-    sheet = CLIENT.open(SHEET_NAME).sheet1
-except Exception as e:
-    st.error(f"Error connecting to Google Sheets: {e}")
+@st.cache_resource
+def get_sheet_writer():
+    """One background writer per server process, replaying any rows left in the spool"""
+    return SheetWriter(get_sheet_connection())
 
-# ---------- MACHINE LEARNING MODEL SETUP ----------
-class SymptomPredictor:
-    def __init__(self):
-        self.model = None
-        self.label_encoder = LabelEncoder()
-        self.symptom_features = []
-        self.is_trained = False
-        
-    def prepare_training_data(self):
-        """Create synthetic training data for demonstration"""
-        # This would normally come from your historical data
-        np.random.seed(42)
-        
-        # Define features (symptoms)
-        self.symptom_features = [
-            'Fever', 'Cough', 'Shortness_of_breath', 'Chest_pain', 'Fatigue',
-            'Headache', 'Muscle_pain', 'Loss_of_appetite', 'Weight_loss',
-            'Night_sweats', 'Chills', 'Nausea', 'Diarrhea', 'Abdominal_pain',
-            'Joint_pain', 'Rash', 'Sore_throat', 'Runny_nose', 'Wheezing',
-            'Cough_blood', 'Persistent_cough', 'Age', 'Smoking', 'Diabetes'
-        ]
-        
-        n_samples = 1000
-        X = np.random.randint(0, 2, (n_samples, len(self.symptom_features)))
-        
-        # Create realistic disease patterns
-        diseases = ['Healthy', 'Viral_Fever', 'Tuberculosis', 'Dengue', 'Malaria', 
-                   'Typhoid', 'Respiratory_Infection', 'Gastroenteritis']
-        
-        y = []
-        for i in range(n_samples):
-            symptoms = X[i]
-            
-            # TB pattern
-            if symptoms[9] == 1 and symptoms[8] == 1 and symptoms[20] == 1:  # Night sweats, weight loss, persistent cough
-                y.append('Tuberculosis')
-            # Dengue pattern
-            elif symptoms[0] == 1 and symptoms[5] == 1 and symptoms[15] == 1:  # Fever, headache, rash
-                y.append('Dengue')
-            # Malaria pattern
-            elif symptoms[0] == 1 and symptoms[10] == 1 and symptoms[1] == 0:  # Fever, chills, no cough
-                y.append('Malaria')
-            # Typhoid pattern
-            elif symptoms[0] == 1 and symptoms[7] == 1 and symptoms[13] == 1:  # Fever, loss of appetite, abdominal pain
-                y.append('Typhoid')
-            # Viral fever pattern
-            elif symptoms[0] == 1 and symptoms[4] == 1 and symptoms[5] == 1:  # Fever, fatigue, headache
-                y.append('Viral_Fever')
-            # Respiratory infection
-            elif symptoms[1] == 1 and symptoms[2] == 1 and symptoms[3] == 1:  # Cough, shortness of breath, chest pain
-                y.append('Respiratory_Infection')
-            # Gastroenteritis
-            elif symptoms[12] == 1 and symptoms[13] == 1 and symptoms[11] == 1:  # Diarrhea, abdominal pain, nausea
-                y.append('Gastroenteritis')
-            else:
-                y.append('Healthy')
-        
-        self.X = X
-        self.y = self.label_encoder.fit_transform(y)
-        return X, self.y
-    
-    def train_model(self):
-        """Train the Random Forest model"""
-        X, y = self.prepare_training_data()
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
-        )
-        
-        # Train model
-        self.model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=5,
-            min_samples_leaf=2,
-            random_state=42
-        )
-        
-        self.model.fit(X_train, y_train)
-        
-        # Evaluate
-        y_pred = self.model.predict(X_test)
-        accuracy = accuracy_score(y_test, y_pred)
-        
-        self.is_trained = True
-        return accuracy
-    
-    def predict(self, symptoms_dict, age, smoking, diabetes):
-        """Predict disease based on symptoms"""
-        if not self.is_trained:
-            st.warning("Model not trained. Training now...")
-            self.train_model()
-        
-        # Prepare input features
-        input_features = np.zeros(len(self.symptom_features))
-        
-        # Map symptoms to features
-        symptom_mapping = {
-            'Fever': 'Fever',
-            'Chills': 'Chills',
-            'Sweating': 'Chills',
-            'Increased body temperature': 'Fever',
-            'Intermittent fever': 'Fever',
-            'High fever (104°F+)': 'Fever',
-            'Mild fever (100-101°F)': 'Fever',
-            'Night sweats': 'Night_sweats',
-            'Morning fever': 'Fever',
-            'Fatigue': 'Fatigue',
-            'Headache': 'Headache',
-            'Nausea': 'Nausea',
-            'Vomiting': 'Nausea',
-            'Muscle pain': 'Muscle_pain',
-            'Joint pain': 'Joint_pain',
-            'Weakness': 'Fatigue',
-            'Dizziness': 'Headache',
-            'Loss of appetite': 'Loss_of_appetite',
-            'Body pain': 'Muscle_pain',
-            'Weight loss': 'Weight_loss',
-            'Chest pain': 'Chest_pain',
-            'Cough': 'Cough',
-            'Shortness of breath': 'Shortness_of_breath',
-            'Chest tightness': 'Chest_pain',
-            'Runny nose': 'Runny_nose',
-            'Sore throat': 'Sore_throat',
-            'Sneezing': 'Runny_nose',
-            'Wheezing': 'Wheezing',
-            'Loss of smell': 'Runny_nose',
-            'Loss of taste': 'Runny_nose',
-            'Persistent cough (3 weeks+)': 'Persistent_cough',
-            'Cough with blood': 'Cough_blood',
-            'Chest pain when breathing': 'Chest_pain',
-            'Breathlessness': 'Shortness_of_breath',
-            'Cough lasting more than 3 weeks': 'Persistent_cough',
-            'Coughing up blood': 'Cough_blood',
-            'Breathing difficulty': 'Shortness_of_breath',
-            'Diarrhea': 'Diarrhea',
-            'Abdominal pain': 'Abdominal_pain',
-            'Bloating': 'Abdominal_pain',
-            'Constipation': 'Abdominal_pain',
-            'Heartburn': 'Abdominal_pain',
-            'Blood in stool': 'Diarrhea',
-            'Difficulty swallowing': 'Sore_throat',
-            'Excessive thirst': 'Diabetes',
-            'Frequent urination': 'Diabetes',
-            'Abdominal cramps': 'Abdominal_pain',
-            'Rash': 'Rash',
-            'Itching': 'Rash',
-            'Yellow skin/eyes': 'Rash',
-            'Skin discoloration': 'Rash',
-            'Hives': 'Rash',
-            'Swelling': 'Rash',
-            'Easy bruising': 'Rash',
-            'Red spots on skin': 'Rash',
-            'Eye pain': 'Headache',
-            'Red eyes': 'Rash'
-        }
-        
-        # Encode symptoms
-        for symptom_category, symptoms_list in symptoms_dict.items():
-            for symptom in symptoms_list:
-                if symptom in symptom_mapping:
-                    feature_name = symptom_mapping[symptom]
-                    if feature_name in self.symptom_features:
-                        idx = self.symptom_features.index(feature_name)
-                        input_features[idx] = 1
-        
-        # Add demographic features
-        if 'Age' in self.symptom_features:
-            idx = self.symptom_features.index('Age')
-            input_features[idx] = min(age / 100, 1)  # Normalize age
-        
-        if 'Smoking' in self.symptom_features:
-            idx = self.symptom_features.index('Smoking')
-            input_features[idx] = 1 if smoking else 0
-        
-        if 'Diabetes' in self.symptom_features:
-            idx = self.symptom_features.index('Diabetes')
-            input_features[idx] = 1 if diabetes else 0
-        
-        # Make prediction
-        prediction = self.model.predict([input_features])[0]
-        probabilities = self.model.predict_proba([input_features])[0]
-        
-        predicted_disease = self.label_encoder.inverse_transform([prediction])[0]
-        
-        # Get top 3 predictions
-        top_3_idx = np.argsort(probabilities)[-3:][::-1]
-        top_3_diseases = self.label_encoder.inverse_transform(top_3_idx)
-        top_3_probs = probabilities[top_3_idx]
-        
-        return predicted_disease, list(zip(top_3_diseases, top_3_probs)), input_features
-    
-    def get_feature_importance(self):
-        """Get feature importance from the model"""
-        if self.model is None:
-            return None
-        
-        importance_df = pd.DataFrame({
-            'feature': self.symptom_features,
-            'importance': self.model.feature_importances_
-        }).sort_values('importance', ascending=False)
-        
-        return importance_df
+@st.cache_resource
+def get_record_store():
+    """The configured record store, shared by every session in this server process"""
+    if RECORD_STORE == "sheets":
+        return configured_record_store(RECORD_STORE, connection=get_sheet_connection(), writer=get_sheet_writer())
+    store = configured_record_store(RECORD_STORE)
+    atexit.register(store.close)
+    return store
 
-# Initialize ML model
-ml_predictor = SymptomPredictor()
+# ---------- MACHINE LEARNING MODEL ----------
+def load_predictor(path=None):
+    """Load the model artifact, training only if it is missing or stale"""
+    # Imported here so that scikit-learn is not loaded before the form renders
+    from predictor import MODEL_ARTIFACT_PATH, SymptomPredictor
+    return SymptomPredictor.load_or_train(path or MODEL_ARTIFACT_PATH)
+
+def load_model_slot(store):
+    """Slot holding the serving model, retrained from stored records every RETRAIN_INTERVAL seconds if set"""
+    from predictor import ModelSlot
+    slot = ModelSlot(load_predictor())
+    if RETRAIN_INTERVAL:
+        from retrain import Retrainer
+        Retrainer(slot, store, interval=RETRAIN_INTERVAL).start()
+    return slot
+
+@st.cache_resource
+def start_predictor_load(_store):
+    """Load the model once per server process, in the background so the first page renders immediately"""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader").submit(load_model_slot, _store)
+
+# ---------- SUBMIT STAGES ----------
+@st.cache_resource
+def get_submit_pool():
+    """One thread pool per server process for the stages of every submission"""
+    return ThreadPoolExecutor(max_workers=SUBMIT_WORKERS, thread_name_prefix="submit")
+
+def run_diagnosis(*args):
+    with timed("diagnosis"):
+        return enhanced_diagnose(*args)
+
+def run_prediction(symptoms_dict, age, smoking, diabetes):
+    """(predictor, primary label, top predictions, feature vector) from the serving model"""
+    # Waits only if the model is still loading
+    with timed("model_wait"):
+        ml_predictor = ml_predictor_future.result().current
+    with timed("predict"):
+        ml_prediction, top_predictions, feature_vector = ml_predictor.predict(symptoms_dict, age, smoking, diabetes)
+    return ml_predictor, ml_prediction, top_predictions, feature_vector
+
+def persist_record(row):
+    with timed("persist"):
+        record_store.append(row)
 
 # ---------- APP TITLE ----------
 st.set_page_config(page_title="AI-Powered Symptom-Based Disease Checker", page_icon="🤖", layout="wide")
 st.title("🤖 AI-Powered Symptom-Based Disease Checker")
 st.write("Select symptoms and get AI-powered disease predictions with detailed analysis.")
 
+# Initialize ML model and database connection
+record_store = get_record_store()
+ml_predictor_future = start_predictor_load(record_store)
+submit_pool = get_submit_pool()
+start_exporters()
+
 # ---------- USER DETAILS FORM ----------
 with st.form("user_form"):
     col1, col2 = st.columns(2)
     with col1:
         name = st.text_input("👤 Full Name")
         age = st.number_input("🎂 Age", min_value=0, max_value=120, step=1)
-        gender = st.radio("⚧ Gender", ["Male", "Female", "Other"])
+        gender = st.radio("⚧ Gender", FORM_CHOICES['gender'])
         mobile = st.text_input("📱 Mobile Number")
         weight = st.number_input("⚖ Weight (kg)", min_value=1, max_value=300)
         height = st.number_input("📏 Height (cm)", min_value=50, max_value=250)
         
     with col2:
         st.subheader("🩺 Medical History")
-        bp = st.checkbox("High Blood Pressure")
-        diabetes = st.checkbox("Diabetes")
-        heart = st.checkbox("Heart Issues")
-        thyroid = st.checkbox("Thyroid Issues")
-        asthma = st.checkbox("Asthma/Respiratory Issues")
-        kidney = st.checkbox("Kidney Disease")
-        liver = st.checkbox("Liver Disease")
-        cancer_history = st.checkbox("Family History of Cancer")
-        tb_history = st.checkbox("Family History of TB")
-        hiv_immune = st.checkbox("HIV/Weakened Immune System")
+        bp = st.checkbox(HISTORY_OPTIONS['bp'])
+        diabetes = st.checkbox(HISTORY_OPTIONS['diabetes'])
+        heart = st.checkbox(HISTORY_OPTIONS['heart'])
+        thyroid = st.checkbox(HISTORY_OPTIONS['thyroid'])
+        asthma = st.checkbox(HISTORY_OPTIONS['asthma'])
+        kidney = st.checkbox(HISTORY_OPTIONS['kidney'])
+        liver = st.checkbox(HISTORY_OPTIONS['liver'])
+        cancer_history = st.checkbox(HISTORY_OPTIONS['cancer_history'])
+        tb_history = st.checkbox(HISTORY_OPTIONS['tb_history'])
+        hiv_immune = st.checkbox(HISTORY_OPTIONS['hiv_immune'])
         location = st.text_input("📍 Location / City")
 
     st.subheader("🧍 Select Symptoms")
 
-    # ---------- ENHANCED SYMPTOM LISTS ----------
-    fever_symptoms = [
-        "Fever", "Chills", "Sweating", "Increased body temperature", 
-        "Intermittent fever", "High fever (104°F+)", "Mild fever (100-101°F)",
-        "Night sweats", "Morning fever"
-    ]
-    
-    basic_symptoms = [
-        "Fatigue", "Headache", "Nausea", "Vomiting", 
-        "Muscle pain", "Joint pain", "Weakness", "Dizziness",
-        "Loss of appetite", "Body pain", "Weight loss", "Chest pain"
-    ]
-    
-    respiratory_symptoms = [
-        "Cough", "Shortness of breath", "Chest tightness", "Runny nose", 
-        "Sore throat", "Sneezing", "Wheezing", "Loss of smell", "Loss of taste",
-        "Persistent cough (3 weeks+)", "Cough with blood", "Chest pain",
-        "Breathlessness", "Chest pain when breathing"
-    ]
-    
-    tuberculosis_symptoms = [
-        "Cough lasting more than 3 weeks", "Coughing up blood", "Chest pain",
-        "Breathing difficulty", "Night sweats", "Intermittent fever",
-        "Weight loss", "Loss of appetite", "Fatigue and weakness",
-        "Chest pain when breathing or coughing"
-    ]
-    
-    digestive_symptoms = [
-        "Diarrhea", "Abdominal pain", "Bloating", "Constipation", "Heartburn", 
-        "Blood in stool", "Difficulty swallowing", "Excessive thirst", 
-        "Frequent urination", "Abdominal cramps"
-    ]
-    
-    skin_symptoms = [
-        "Rash", "Itching", "Yellow skin/eyes", "Skin discoloration",
-        "Hives", "Swelling", "Easy bruising", "Night sweats",
-        "Red spots on skin", "Eye pain", "Red eyes"
-    ]
-    
-    neurological_symptoms = [
-        "Confusion", "Memory problems", "Numbness", "Tingling sensation",
-        "Vision problems", "Hearing problems", "Balance issues", "Seizures",
-        "Speech difficulties", "Tremors", "Severe headache"
-    ]
-    
-    heart_symptoms = [
-        "Chest pain/pressure", "Pain radiating to arm/jaw/back/neck/throat", 
-        "Shortness of breath", "Rapid/irregular heartbeat", "Swelling in legs/ankles/feet",
-        "Reduced exercise ability", "Persistent cough", "Abdominal swelling",
-        "Rapid weight gain", "Cold sweats", "Palpitations"
-    ]
-    
-    cancer_symptoms = [
-        "Breast lump/thickening", "Unusual nipple discharge", "Pelvic pain/bloating",
-        "Abdominal pain/bloating", "Prostate issues", "Testicular lumps/swelling",
-        "Unusual bleeding/bruising", "Persistent pain", "Mouth sores/bleeding/numbness",
-        "Persistent cough/hoarseness", "Unexplained weight loss", "Swelling/lumps",
-        "Skin changes/jaundice/new moles", "Persistent headaches", "Extreme fatigue",
-        "Vision/hearing problems", "Difficulty swallowing", "Changes in bowel habits"
-    ]
-
     # User symptom selection
     st.subheader("🌡️ Fever and Infection Symptoms")
-    selected_fever = st.multiselect("Fever Symptoms", fever_symptoms)
+    selected_fever = st.multiselect("Fever Symptoms", CATALOG.options('fever'))
     
     st.subheader("🔍 Other Symptoms")
-    selected_basic = st.multiselect("General Symptoms", basic_symptoms)
-    selected_respiratory = st.multiselect("Respiratory Symptoms", respiratory_symptoms)
-    selected_tuberculosis = st.multiselect("Tuberculosis (TB) Symptoms", tuberculosis_symptoms)
-    selected_digestive = st.multiselect("Digestive Symptoms", digestive_symptoms)
-    selected_skin = st.multiselect("Skin and Appearance Symptoms", skin_symptoms)
-    selected_neurological = st.multiselect("Neurological Symptoms", neurological_symptoms)
-    selected_cancer = st.multiselect("Cancer Symptoms", cancer_symptoms)
-    selected_heart = st.multiselect("Heart and Circulatory Symptoms", heart_symptoms)
+    selected_basic = st.multiselect("General Symptoms", CATALOG.options('basic'))
+    selected_respiratory = st.multiselect("Respiratory Symptoms", CATALOG.options('respiratory'))
+    selected_tuberculosis = st.multiselect("Tuberculosis (TB) Symptoms", CATALOG.options('tuberculosis'))
+    selected_digestive = st.multiselect("Digestive Symptoms", CATALOG.options('digestive'))
+    selected_skin = st.multiselect("Skin and Appearance Symptoms", CATALOG.options('skin'))
+    selected_neurological = st.multiselect("Neurological Symptoms", CATALOG.options('neurological'))
+    selected_cancer = st.multiselect("Cancer Symptoms", CATALOG.options('cancer'))
+    selected_heart = st.multiselect("Heart and Circulatory Symptoms", CATALOG.options('heart'))
 
     # Additional information
     st.subheader("📋 Additional Information")
     col3, col4 = st.columns(2)
     with col3:
-        symptom_duration = st.selectbox("How long have you had these symptoms?", 
-                                      ["Less than 1 week", "1-2 weeks", "2-4 weeks", "1-3 months", "More than 3 months"])
-        severity = st.select_slider("Symptom Severity", options=["Mild", "Moderate", "Severe"])
-        fever_pattern = st.selectbox("Fever Pattern", 
-                                   ["Continuous fever", "Intermittent fever", "Low in morning/high in evening", "Night fever", "No specific pattern"])
+        symptom_duration = st.selectbox("How long have you had these symptoms?", FORM_CHOICES['symptom_duration'])
+        severity = st.select_slider("Symptom Severity", options=FORM_CHOICES['severity'])
+        fever_pattern = st.selectbox("Fever Pattern", FORM_CHOICES['fever_pattern'])
     with col4:
         smoking = st.checkbox("Smoker")
         alcohol = st.checkbox("Regular Alcohol Consumption")
-        exercise = st.selectbox("Exercise Frequency", 
-                              ["Never", "Occasionally", "1-2 times/week", "3-5 times/week", "Daily"])
+        exercise = st.selectbox("Exercise Frequency", FORM_CHOICES['exercise'])
         recent_travel = st.checkbox("Recent travel history")
         tb_contact = st.checkbox("Been in contact with TB patient")
 
     submitted = st.form_submit_button("🔍 Analyze Symptoms")
 
-# ---------- BMI CALCULATION ----------
-def calculate_bmi(weight, height_cm):
-    height_m = height_cm / 100
-    bmi = weight / (height_m ** 2)
-    if bmi < 18.5:
-        category = "Underweight"
-    elif 18.5 <= bmi < 25:
-        category = "Normal"
-    elif 25 <= bmi < 30:
-        category = "Overweight"
-    else:
-        category = "Obese"
-    return bmi, category
-
-# ---------- ENHANCED DIAGNOSIS LOGIC ----------
-def enhanced_diagnose(fever, basic, respiratory, tuberculosis, digestive, skin, neurological, cancer, heart, age, medical_history, lifestyle, fever_pattern, recent_travel, tb_contact):
-    conditions = []
-    risk_factors = []
-    recommendations = []
-    risk_score = 0
-    
-    all_symptoms = fever + basic + respiratory + tuberculosis + digestive + skin + neurological + cancer + heart
-    symptom_count = len(all_symptoms)
-    
-    # Risk factors from medical history and lifestyle
-    if medical_history.get('bp'): risk_factors.append("High Blood Pressure")
-    if medical_history.get('diabetes'): risk_factors.append("Diabetes")
-    if medical_history.get('heart'): risk_factors.append("Heart Disease History")
-    if medical_history.get('smoking'): risk_factors.append("Smoking")
-    if medical_history.get('alcohol'): risk_factors.append("Alcohol Use")
-    if medical_history.get('hiv_immune'): risk_factors.append("Weakened Immune System")
-    if recent_travel: risk_factors.append("Recent Travel")
-    if tb_contact: risk_factors.append("Contact with TB Patient")
-    
-    # -------------------------------
-    # TUBERCULOSIS (TB) ANALYSIS
-    # -------------------------------
-    
-    # Major TB symptoms
-    tb_major_symptoms = ["Cough lasting more than 3 weeks", "Coughing up blood", "Night sweats", "Weight loss"]
-    tb_minor_symptoms = ["Intermittent fever", "Loss of appetite", "Fatigue and weakness", "Chest pain", "Breathing difficulty"]
-    
-    tb_major_count = sum(1 for symptom in tb_major_symptoms if symptom in tuberculosis)
-    tb_minor_count = sum(1 for symptom in tb_minor_symptoms if symptom in (tuberculosis + fever + basic + respiratory))
-    
-    # TB risk assessment
-    tb_risk_score = 0
-    
-    # High risk for major symptoms
-    if tb_major_count >= 2:
-        tb_risk_score += 60
-    elif tb_major_count == 1:
-        tb_risk_score += 30
-    
-    # Moderate risk for minor symptoms
-    tb_risk_score += tb_minor_count * 10
-    
-    # Risk factors
-    if medical_history.get('tb_history'):
-        tb_risk_score += 20
-    if medical_history.get('hiv_immune'):
-        tb_risk_score += 25
-    if tb_contact:
-        tb_risk_score += 15
-    if smoking:
-        tb_risk_score += 10
-    
-    # TB diagnosis
-    if tb_risk_score >= 50:
-        risk_level = "High" if tb_risk_score >= 70 else "Medium"
-        conditions.append((f"Tuberculosis (TB) - Risk Score: {tb_risk_score}%", "Lungs and Respiratory System", risk_level))
-        recommendations.append("🚨 Get immediate Chest X-ray and Sputum test")
-        recommendations.append("Visit TB clinic for DOTS therapy")
-        recommendations.append("Wear mask to prevent infection spread")
-    
-    # -------------------------------
-    # FEVER AND INFECTION ANALYSIS
-    # -------------------------------
-    
-    # Normal Fever
-    if "Fever" in fever and len(fever) == 1 and len([s for s in basic if s in ["Headache", "Body pain", "Fatigue"]]) >= 2:
-        conditions.append(("Normal Fever (Viral Fever)", "Immune System", "Low"))
-        recommendations.append("Rest, stay hydrated, and take paracetamol")
-    
-    # Viral Fever
-    viral_fever_symptoms = ["Fever", "Headache", "Body pain", "Fatigue", "Weakness"]
-    viral_count = sum(1 for symptom in viral_fever_symptoms if symptom in (fever + basic))
-    if viral_count >= 4:
-        conditions.append(("Viral Fever", "Immune System", "Medium"))
-        recommendations.append("Get plenty of rest and fluids")
-    
-    # Dengue - Mosquito-borne
-    dengue_symptoms = ["High fever (104°F+)", "Severe headache", "Eye pain", "Joint pain", "Muscle pain", "Red spots on skin"]
-    dengue_count = sum(1 for symptom in dengue_symptoms if symptom in (fever + basic + skin))
-    if dengue_count >= 4:
-        conditions.append(("Dengue Fever", "Blood and Immune System", "High"))
-        risk_factors.append("Mosquito-borne infection")
-        recommendations.append("🚨 Get immediate blood test and consult doctor")
-        recommendations.append("Monitor platelet count")
-    
-    # Malaria - Mosquito-borne
-    malaria_symptoms = ["Intermittent fever", "Chills", "Sweating", "Headache", "Nausea", "Fatigue"]
-    malaria_count = sum(1 for symptom in malaria_symptoms if symptom in (fever + basic))
-    if malaria_count >= 4 and fever_pattern in ["Intermittent fever", "Low in morning/high in evening"]:
-        conditions.append(("Malaria", "Blood and Liver", "High"))
-        risk_factors.append("Mosquito-borne infection")
-        recommendations.append("🚨 Get malaria blood test")
-        recommendations.append("Start anti-malarial medications")
-    
-    # Typhoid - Water/food borne
-    typhoid_symptoms = ["High fever (104°F+)", "Headache", "Weakness", "Abdominal pain", "Diarrhea or constipation", "Loss of appetite"]
-    typhoid_count = sum(1 for symptom in typhoid_symptoms if symptom in (fever + basic + digestive))
-    if typhoid_count >= 4:
-        conditions.append(("Typhoid Fever", "Digestive System and Blood", "High"))
-        risk_factors.append("Contaminated food/water")
-        recommendations.append("🚨 Get Widal test and start antibiotics")
-        recommendations.append("Maintain proper hygiene")
-    
-    # Chikungunya - Mosquito-borne
-    if "Joint pain" in basic and "Fever" in fever and "Red spots on skin" in skin:
-        conditions.append(("Chikungunya", "Joints and Immune System", "Medium"))
-        recommendations.append("Get physiotherapy for joint pain")
-    
-    # -------------------------------
-    # OTHER CONDITIONS
-    # -------------------------------
-    
-    # Respiratory infections
-    respiratory_symptom_count = len(respiratory)
-    if respiratory_symptom_count >= 2 and "Fever" in fever:
-        if "Cough" in respiratory and "Shortness of breath" in respiratory:
-            conditions.append(("Respiratory Infection (COVID-19/Influenza/Pneumonia)", "Respiratory System", "High"))
-        if "Wheezing" in respiratory and "Shortness of breath" in respiratory:
-            conditions.append(("Asthma/Bronchitis", "Respiratory System", "Medium"))
-    
-    # Digestive infections
-    digestive_symptom_count = len(digestive)
-    if digestive_symptom_count >= 3 and "Fever" in fever:
-        if "Diarrhea" in digestive and "Abdominal pain" in digestive:
-            conditions.append(("Gastroenteritis", "Digestive System", "Medium"))
-        if "Blood in stool" in digestive:
-            conditions.append(("Dysentery/Enteritis", "Digestive System", "High"))
-    
-    # Hepatitis
-    if "Yellow skin/eyes" in skin and "Fever" in fever:
-        conditions.append(("Hepatitis/Liver Infection", "Liver", "High"))
-    
-    # Cardiovascular risk assessment
-    heart_symptom_count = len(heart)
-    if heart_symptom_count >= 2:
-        conditions.append(("Cardiovascular Issue", "Heart/Circulatory System", "High"))
-        if "Chest pain/pressure" in heart:
-            recommendations.append("🚨 Seek immediate medical attention for chest pain")
-    
-    # Cancer risk assessment
-    cancer_symptom_count = len(cancer)
-    if cancer_symptom_count >= 2:
-        risk_level = "High" if cancer_symptom_count >= 3 or medical_history.get('cancer_history') else "Medium"
-        conditions.append(("Possible Cancer Indicators", "Multiple Systems", risk_level))
-        recommendations.append("Consult with oncologist for further evaluation")
-    
-    # Lifestyle risk assessment
-    if lifestyle.get('exercise') in ["Never", "Occasionally"] and medical_history.get('bp'):
-        risk_factors.append("Sedentary Lifestyle")
-        recommendations.append("Increase physical activity to 150 minutes per week")
-    
-    # Calculate comprehensive risk score
-    base_score = min(symptom_count * 4, 40)
-    age_score = min(age * 0.5, 20)
-    medical_score = len(risk_factors) * 5
-    lifestyle_score = 0
-    if lifestyle.get('smoking'): lifestyle_score += 10
-    if lifestyle.get('alcohol'): lifestyle_score += 5
-    if lifestyle.get('exercise') in ["Never", "Occasionally"]: lifestyle_score += 5
-    
-    # Additional scores for fever and TB
-    fever_score = len(fever) * 3
-    tb_score = min(tb_risk_score / 2, 20)  # Include TB risk in overall score
-    risk_score = min(base_score + age_score + medical_score + lifestyle_score + fever_score + tb_score, 95)
-    
-    # General recommendations
-    if "Fever" in fever:
-        recommendations.append("Monitor temperature regularly")
-        recommendations.append("Drink plenty of fluids")
-    
-    if tb_risk_score >= 30:
-        recommendations.append("Visit health center for TB screening")
-    
-    if risk_score > 50:
-        recommendations.append("Schedule appointment with primary care physician")
-    if symptom_count > 5:
-        recommendations.append("Consider comprehensive medical evaluation")
-    
-    return conditions, risk_factors, recommendations, risk_score, tb_risk_score
-
 # ---------- SHOW RESULTS ----------
 if submitted:
     if not name or not mobile:
         st.error("❌ Please enter your Name and Mobile Number.")
     else:
+        submit_start = time.perf_counter()
+        
         # Calculate BMI
         bmi_value, bmi_category = calculate_bmi(weight, height)
         
@@ -573,13 +181,6 @@ if submitted:
             'smoking': smoking, 'alcohol': alcohol, 'exercise': exercise
         }
         
-        # Perform traditional diagnosis
-        conditions, risk_factors, recommendations, risk_score, tb_risk_score = enhanced_diagnose(
-            selected_fever, selected_basic, selected_respiratory, selected_tuberculosis,
-            selected_digestive, selected_skin, selected_neurological, selected_cancer, 
-            selected_heart, age, medical_history, lifestyle, fever_pattern, recent_travel, tb_contact
-        )
-
         # Prepare symptoms for ML prediction
         symptoms_dict = {
             'fever': selected_fever,
@@ -593,142 +194,165 @@ if submitted:
             'heart': selected_heart
         }
         
-        # Get ML prediction
-        with st.spinner("🤖 AI Model Analyzing Symptoms..."):
-            # Train model if not already trained
-            if not ml_predictor.is_trained:
-                accuracy = ml_predictor.train_model()
-                st.sidebar.success(f"✅ ML Model Trained (Accuracy: {accuracy:.2%})")
-            
-            # Get prediction
-            ml_prediction, top_predictions, feature_vector = ml_predictor.predict(
-                symptoms_dict, age, smoking, diabetes
-            )
+        # The rule diagnosis and the model prediction are independent, so both run
+        # at once and each section below is drawn as soon as its input is ready
+        diagnosis_future = submit_pool.submit(
+            run_diagnosis,
+            selected_fever, selected_basic, selected_respiratory, selected_tuberculosis,
+            selected_digestive, selected_skin, selected_neurological, selected_cancer,
+            selected_heart, age, medical_history, lifestyle, fever_pattern, recent_travel, tb_contact
+        )
+        prediction_future = submit_pool.submit(run_prediction, symptoms_dict, age, smoking, diabetes)
         
         # Display results
         st.success("## 📊 Analysis Results")
-        
-        # BMI and basic info
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("BMI Score", f"{bmi_value:.1f}", bmi_category)
-        with col2:
-            st.metric("Overall Risk Score", f"{risk_score:.1f}%")
-        with col3:
-            total_symptoms = len(selected_fever + selected_basic + selected_respiratory + 
-                               selected_tuberculosis + selected_digestive + selected_skin + 
-                               selected_neurological + selected_cancer + selected_heart)
-            st.metric("Symptoms Reported", total_symptoms)
-        
-        # AI Prediction Section
-        st.info("## 🤖 AI Disease Prediction")
-        col4, col5 = st.columns(2)
-        
-        with col4:
-            st.subheader("Top Predictions")
-            for i, (disease, prob) in enumerate(top_predictions):
-                confidence_color = "🔴" if prob > 0.7 else "🟡" if prob > 0.4 else "🟢"
-                st.write(f"{confidence_color} **{disease.replace('_', ' ')}**")
-                st.write(f"   Confidence: {prob:.1%}")
-                st.progress(float(prob))
-        
-        with col5:
-            st.subheader("Prediction Insights")
-            st.write(f"**Primary Prediction:** {ml_prediction.replace('_', ' ')}")
-            
-            # Show key influencing factors
-            feature_importance = ml_predictor.get_feature_importance()
-            if feature_importance is not None:
-                st.write("**Key Factors Considered:**")
-                top_factors = feature_importance.head(5)
-                for _, row in top_factors.iterrows():
-                    if feature_vector[ml_predictor.symptom_features.index(row['feature'])] == 1:
-                        st.write(f"• {row['feature'].replace('_', ' ')}")
-        
-        # TB Special Analysis
-        if selected_tuberculosis:
-            st.info("## 🦠 Tuberculosis (TB) Analysis")
-            tb_symptoms_text = ", ".join(selected_tuberculosis)
-            st.write(f"**Selected TB Symptoms:** {tb_symptoms_text}")
-            st.write(f"**TB Risk Score:** {tb_risk_score}%")
-            
-            if tb_risk_score >= 70:
-                st.error("🔴 **High TB Risk:** Get immediate TB testing")
-            elif tb_risk_score >= 50:
-                st.warning("🟡 **Medium TB Risk:** TB screening advised")
-            elif tb_risk_score >= 30:
-                st.info("🟢 **Low TB Risk:** Monitoring advised")
-        
-        # Fever Analysis
-        if selected_fever:
-            st.info("## 🌡️ Fever Analysis")
-            fever_symptoms_text = ", ".join(selected_fever)
-            st.write(f"**Selected Fever Symptoms:** {fever_symptoms_text}")
-            st.write(f"**Fever Pattern:** {fever_pattern}")
-        
-        # Conditions detected
-        if conditions:
-            st.warning("## 🚨 Possible Conditions Detected")
-            for condition, system, risk_level in conditions:
-                risk_color = "🔴" if risk_level == "High" else "🟡" if risk_level == "Medium" else "🟢"
-                st.write(f"{risk_color} **{condition}**")
-                st.write(f"   • Affected System: {system}")
-                st.write(f"   • Risk Level: {risk_level}")
-                st.write("")
-        else:
-            st.info("## ✅ No significant disease indicators found")
-        
-        # Risk factors
-        if risk_factors:
-            st.error("## ⚠️ Identified Risk Factors")
-            for factor in risk_factors:
-                st.write(f"• {factor}")
-        
-        # Recommendations
-        if recommendations:
-            st.success("## 💡 Recommendations")
-            for recommendation in recommendations:
-                st.write(f"• {recommendation}")
-        
-        # General health tips
-        st.info("## 🌟 General Health Tips")
-        if "Fever" in selected_fever:
-            st.write("• Get plenty of rest and stay hydrated")
-            st.write("• Monitor temperature regularly")
-            st.write("• Don't take antibiotics without doctor's advice")
-        
-        if selected_tuberculosis and tb_risk_score > 30:
-            st.write("• Visit nearby health center for TB testing")
-            st.write("• If TB is confirmed, complete full course of medication")
-        
-        if bmi_category in ["Overweight", "Obese"]:
-            st.write("• Consider weight management through balanced diet and exercise")
-        
-        if age > 50:
-            st.write("• Regular health screenings recommended due to age")
+        summary_area = st.container()
+        ai_area = st.container()
+        with ai_area:
+            ai_status = st.empty()
+            ai_status.info("🤖 AI Model Analyzing Symptoms...")
+        rules_area = st.container()
+        
+        for future in as_completed([diagnosis_future, prediction_future]):
+            if future is diagnosis_future:
+                conditions, risk_factors, recommendations, risk_score, tb_risk_score = future.result()
+                
+                # BMI and basic info
+                with summary_area:
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("BMI Score", f"{bmi_value:.1f}", bmi_category)
+                    with col2:
+                        st.metric("Overall Risk Score", f"{risk_score:.1f}%")
+                    with col3:
+                        total_symptoms = len(selected_fever + selected_basic + selected_respiratory + 
+                                           selected_tuberculosis + selected_digestive + selected_skin + 
+                                           selected_neurological + selected_cancer + selected_heart)
+                        st.metric("Symptoms Reported", total_symptoms)
+                
+                with rules_area:
+                    # TB Special Analysis
+                    if selected_tuberculosis:
+                        st.info("## 🦠 Tuberculosis (TB) Analysis")
+                        tb_symptoms_text = ", ".join(selected_tuberculosis)
+                        st.write(f"**Selected TB Symptoms:** {tb_symptoms_text}")
+                        st.write(f"**TB Risk Score:** {tb_risk_score}%")
+                        
+                        if tb_risk_score >= 70:
+                            st.error("🔴 **High TB Risk:** Get immediate TB testing")
+                        elif tb_risk_score >= 50:
+                            st.warning("🟡 **Medium TB Risk:** TB screening advised")
+                        elif tb_risk_score >= 30:
+                            st.info("🟢 **Low TB Risk:** Monitoring advised")
+                    
+                    # Fever Analysis
+                    if selected_fever:
+                        st.info("## 🌡️ Fever Analysis")
+                        fever_symptoms_text = ", ".join(selected_fever)
+                        st.write(f"**Selected Fever Symptoms:** {fever_symptoms_text}")
+                        st.write(f"**Fever Pattern:** {fever_pattern}")
+                    
+                    # Conditions detected
+                    if conditions:
+                        st.warning("## 🚨 Possible Conditions Detected")
+                        for condition, system, risk_level in conditions:
+                            risk_color = "🔴" if risk_level == "High" else "🟡" if risk_level == "Medium" else "🟢"
+                            st.write(f"{risk_color} **{condition}**")
+                            st.write(f"   • Affected System: {system}")
+                            st.write(f"   • Risk Level: {risk_level}")
+                            st.write("")
+                    else:
+                        st.info("## ✅ No significant disease indicators found")
+                    
+                    # Risk factors
+                    if risk_factors:
+                        st.error("## ⚠️ Identified Risk Factors")
+                        for factor in risk_factors:
+                            st.write(f"• {factor}")
+                    
+                    # Recommendations
+                    if recommendations:
+                        st.success("## 💡 Recommendations")
+                        for recommendation in recommendations:
+                            st.write(f"• {recommendation}")
+                    
+                    # General health tips
+                    st.info("## 🌟 General Health Tips")
+                    if "Fever" in selected_fever:
+                        st.write("• Get plenty of rest and stay hydrated")
+                        st.write("• Monitor temperature regularly")
+                        st.write("• Don't take antibiotics without doctor's advice")
+                    
+                    if selected_tuberculosis and tb_risk_score > 30:
+                        st.write("• Visit nearby health center for TB testing")
+                        st.write("• If TB is confirmed, complete full course of medication")
+                    
+                    if bmi_category in ["Overweight", "Obese"]:
+                        st.write("• Consider weight management through balanced diet and exercise")
+                    
+                    if age > 50:
+                        st.write("• Regular health screenings recommended due to age")
+            else:
+                ml_predictor, ml_prediction, top_predictions, feature_vector = future.result()
+                
+                with ai_area:
+                    ai_status.empty()
+                    # AI Prediction Section
+                    st.info("## 🤖 AI Disease Prediction")
+                    col4, col5 = st.columns(2)
+                    
+                    with col4:
+                        st.subheader("Top Predictions")
+                        for i, (disease, prob) in enumerate(top_predictions):
+                            confidence_color = "🔴" if prob > 0.7 else "🟡" if prob > 0.4 else "🟢"
+                            st.write(f"{confidence_color} **{disease.replace('_', ' ')}**")
+                            st.write(f"   Confidence: {prob:.1%}")
+                            st.progress(float(prob))
+                    
+                    with col5:
+                        st.subheader("Prediction Insights")
+                        st.write(f"**Primary Prediction:** {ml_prediction.replace('_', ' ')}")
+                        
+                        # Show the factors that drove this patient's prediction
+                        with timed("feature_contributions"):
+                            key_factors = ml_predictor.explain(feature_vector)
+                            if key_factors:
+                                st.write("**Key Factors Considered:**")
+                                for _, feature, contribution in key_factors:
+                                    st.write(f"• {feature.replace('_', ' ')} (+{contribution:.1%})")
 
         # ---------- SAVE DATA TO GOOGLE SHEET ----------
         entry_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         all_symptoms = selected_fever + selected_basic + selected_respiratory + selected_tuberculosis + selected_digestive + selected_skin + selected_neurological + selected_cancer + selected_heart
-        condition_list = [f"{cond} ({risk})" for cond, sys, risk in conditions]
         
         # Add ML prediction to data
-        ml_predictions_str = "; ".join([f"{disease}: {prob:.1%}" for disease, prob in top_predictions])
+        ml_predictions_str = format_ml_predictions(top_predictions)
         
         # Prepare data row in exact column order
-        data = [
-            entry_time, name, age, gender, mobile, bp, diabetes, heart, thyroid,
-            asthma, kidney, liver, cancer_history, tb_history, hiv_immune, location, 
-            weight, height, ", ".join(all_symptoms), symptom_duration, severity, fever_pattern,
-            smoking, alcohol, exercise, recent_travel, tb_contact,
-            ", ".join(condition_list), ", ".join(risk_factors), 
-            f"{risk_score:.1f}%", f"{tb_risk_score}%", ml_predictions_str,
-            f"{bmi_value:.1f}", bmi_category
-        ]
+        data = make_record_row({
+            'timestamp': entry_time, 'name': name, 'age': age, 'gender': gender, 'mobile': mobile,
+            'bp': bp, 'diabetes': diabetes, 'heart': heart, 'thyroid': thyroid,
+            'asthma': asthma, 'kidney': kidney, 'liver': liver, 'cancer_history': cancer_history,
+            'tb_history': tb_history, 'hiv_immune': hiv_immune, 'location': location,
+            'weight': weight, 'height': height, 'symptoms': ", ".join(all_symptoms),
+            'symptom_duration': symptom_duration, 'severity': severity, 'fever_pattern': fever_pattern,
+            'smoking': smoking, 'alcohol': alcohol, 'exercise': exercise,
+            'recent_travel': recent_travel, 'tb_contact': tb_contact,
+            'conditions': format_conditions(conditions), 'risk_factors': ", ".join(risk_factors),
+            'risk_score': f"{risk_score:.1f}%", 'tb_risk_score': f"{tb_risk_score}%",
+            'ml_predictions': ml_predictions_str,
+            'bmi': f"{bmi_value:.1f}", 'bmi_category': bmi_category
+        })
+        
+        # Saving is off the critical path: everything above is already on screen
+        persist_future = submit_pool.submit(persist_record, data)
+        observe("submit_total", time.perf_counter() - submit_start)
         
         try:
-            sheet.append_row(data)
+            persist_future.result(timeout=PERSIST_STATUS_WAIT)
             st.success("✅ Your response has been recorded securely in our database.")
+        except FuturesTimeoutError:
+            st.info("💾 Your response is being saved in the background.")
         except Exception as e:
             st.error(f"⚠️ Could not save to database: {str(e)}")
 
@@ -751,17 +375,71 @@ with st.sidebar:
     """)
     
     st.header("🤖 ML Model Info")
-    if ml_predictor.is_trained:
+    ml_predictor = ml_predictor_future.result().current if ml_predictor_future.done() else None
+    if ml_predictor is None:
+        st.info("Model is loading...")
+    elif ml_predictor.is_trained:
         st.success("✅ Model: Random Forest")
+        if ml_predictor.accuracy is not None:
+            st.write(f"**Accuracy:** {ml_predictor.accuracy:.2%}")
         st.write("**Trained on:** 1000+ symptom patterns")
         st.write("**Features:** 24 symptoms + demographics")
+        if ml_predictor.revision:
+            st.write(f"**Retrained:** {ml_predictor.revision} times, through {ml_predictor.checkpoint}")
         
         # Show feature importance if available
         if ml_predictor.model is not None:
-            with st.expander("View Feature Importance"):
-                importance_df = ml_predictor.get_feature_importance()
-                if importance_df is not None:
-                    st.dataframe(importance_df.head(10))
+            with st.expander("View Feature Importance"), timed("sidebar_feature_importance", sampled=True):
+                feature_importance = ml_predictor.importance
+                if feature_importance is not None:
+                    top_features = feature_importance.top(10)
+                    st.dataframe({
+                        'feature': [feature for _, feature, _ in top_features],
+                        'importance': [value for _, _, value in top_features]
+                    })
+    
+    st.header("🔌 Database Connection")
+    sheets_store = getattr(record_store, 'store', record_store)
+    if isinstance(sheets_store, SheetsRecordStore):
+        db_health = sheets_store.connection.health()
+        if db_health['circuit'] == "open":
+            st.warning(f"⏸ Google Sheets paused after repeated errors; saving locally, "
+                       f"retrying in {db_health['circuit_retry_in']:.0f}s")
+        elif db_health['connected']:
+            st.success("✅ Connected to Google Sheets")
+            if db_health['last_latency'] is not None:
+                st.write(f"**Last write latency:** {db_health['last_latency'] * 1000:.0f} ms")
+            elif db_health['connect_latency'] is not None:
+                st.write(f"**Connect latency:** {db_health['connect_latency'] * 1000:.0f} ms")
+        elif db_health['last_error']:
+            st.error(f"⚠️ Connection error: {db_health['last_error']}")
+        else:
+            st.info("Connects on first submission")
+        pending_rows = sheets_store.writer.pending()
+        if pending_rows:
+            st.write(f"**Pending writes:** {pending_rows}")
+    else:
+        st.success(f"✅ Saving to local {RECORD_STORE} store")
+    
+    if SHOW_METRICS_PANEL:
+        st.header("📈 Stage Latency")
+        latency_rows = []
+        for stage, hist in sorted(stages().items()):
+            _, count, total = hist.snapshot()
+            if count:
+                latency_rows.append({
+                    'stage': stage, 'count': count, 'mean ms': round(total / count * 1000, 2),
+                    'p50 ≤ ms': hist.quantile(0.5) * 1000, 'p95 ≤ ms': hist.quantile(0.95) * 1000
+                })
+        if latency_rows:
+            st.table(latency_rows)
+        else:
+            st.write("No submissions timed yet")
+        if ml_predictor is not None:
+            from predictor import prediction_cache
+            cache_stats = prediction_cache.stats()
+            st.write(f"**Prediction cache:** {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                     f"{cache_stats['evictions']} evictions ({cache_stats['size']}/{cache_stats['maxsize']} entries)")
     
     st.header("🌡️ Fever Type Guide")
     fever_guide = {
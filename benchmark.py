@@ -0,0 +1,281 @@
+"""Benchmarks for the diagnosis, inference, training and persistence hot paths
+
+Runs each case over realistic symptom selections, reports throughput and
+p50/p95/p99 latency, and writes the results as JSON. Pass --compare with an
+earlier results file to fail when any case's p50 got slower than --tolerance.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --quick --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import sklearn
+
+from catalog import FORM_CHOICES, HISTORY_OPTIONS, SYMPTOM_CATEGORIES, SYMPTOM_OPTIONS
+import predictor as predictor_module
+from predictor import SymptomPredictor, prediction_cache
+from rules import calculate_bmi, enhanced_diagnose, rule_engine
+from storage import (LocalWorksheet, SheetWriter, format_conditions, format_ml_predictions, make_record_row,
+                     open_record_store)
+
+# Share of patients reporting anything in each category, and the mean number
+# of picks when they do. Options earlier in each list are picked more often.
+CATEGORY_RATES = {
+    'fever': (0.7, 2.0), 'basic': (0.8, 2.5), 'respiratory': (0.45, 1.8),
+    'tuberculosis': (0.15, 1.5), 'digestive': (0.3, 1.5), 'skin': (0.2, 1.3),
+    'neurological': (0.1, 1.2), 'cancer': (0.05, 1.2), 'heart': (0.1, 1.5)
+}
+
+def sample_patient(rng):
+    """One randomized but realistic form submission"""
+    selections = {}
+    for category in SYMPTOM_CATEGORIES:
+        options = SYMPTOM_OPTIONS[category]
+        rate, mean_picks = CATEGORY_RATES[category]
+        picks = []
+        if rng.random() < rate:
+            count = min(len(options), 1 + int(rng.expovariate(1 / mean_picks)))
+            # Zipf-like popularity: the first options in a list are the common ones
+            weights = [1 / (i + 1) for i in range(len(options))]
+            while len(picks) < count:
+                symptom = rng.choices(options, weights)[0]
+                if symptom not in picks:
+                    picks.append(symptom)
+        selections[category] = picks
+    smoking = rng.random() < 0.2
+    medical_history = {key: rng.random() < 0.1 for key in HISTORY_OPTIONS}
+    medical_history['smoking'] = smoking
+    return {
+        'symptoms': selections,
+        'age': rng.randint(1, 90),
+        'weight': rng.randint(35, 120),
+        'height': rng.randint(140, 195),
+        'medical_history': medical_history,
+        'lifestyle': {'smoking': smoking, 'alcohol': rng.random() < 0.25, 'exercise': rng.choice(FORM_CHOICES['exercise'])},
+        'fever_pattern': rng.choice(FORM_CHOICES['fever_pattern']),
+        'recent_travel': rng.random() < 0.15,
+        'tb_contact': rng.random() < 0.05
+    }
+
+def diagnose_args(patient):
+    """Positional arguments for enhanced_diagnose"""
+    return ([patient['symptoms'][c] for c in SYMPTOM_CATEGORIES]
+            + [patient['age'], patient['medical_history'], patient['lifestyle'],
+               patient['fever_pattern'], patient['recent_travel'], patient['tb_contact']])
+
+def record_row(patient, diagnosis, top_predictions, bmi):
+    """The row the submit handler would store for this patient"""
+    conditions, risk_factors, _, risk_score, tb_risk_score = diagnosis
+    bmi_value, bmi_category = bmi
+    history = patient['medical_history']
+    lifestyle = patient['lifestyle']
+    record = {key: history[key] for key in HISTORY_OPTIONS}
+    record.update({
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'name': "Benchmark Patient",
+        'age': patient['age'], 'gender': "Other", 'mobile': "0000000000", 'location': "Bench",
+        'weight': patient['weight'], 'height': patient['height'],
+        'symptoms': ", ".join(s for c in SYMPTOM_CATEGORIES for s in patient['symptoms'][c]),
+        'symptom_duration': "1-2 weeks", 'severity': "Moderate", 'fever_pattern': patient['fever_pattern'],
+        'smoking': lifestyle['smoking'], 'alcohol': lifestyle['alcohol'], 'exercise': lifestyle['exercise'],
+        'recent_travel': patient['recent_travel'], 'tb_contact': patient['tb_contact'],
+        'conditions': format_conditions(conditions), 'risk_factors': ", ".join(risk_factors),
+        'risk_score': f"{risk_score:.1f}%", 'tb_risk_score': f"{tb_risk_score}%",
+        'ml_predictions': format_ml_predictions(top_predictions),
+        'bmi': f"{bmi_value:.1f}", 'bmi_category': bmi_category
+    })
+    return make_record_row(record)
+
+def measure(fn, inputs, min_time=0.5, max_iterations=100_000):
+    """Call fn once per input (cycling) and return per-call latencies in seconds"""
+    latencies = []
+    deadline = time.perf_counter() + min_time
+    i = 0
+    while i < len(inputs) or (time.perf_counter() < deadline and i < max_iterations):
+        item = inputs[i % len(inputs)]
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    return np.array(latencies)
+
+def summarize(latencies, items_per_call=1):
+    total = float(latencies.sum())
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'calls': int(len(latencies)),
+        'items_per_call': items_per_call,
+        'total_s': total,
+        'throughput_per_s': len(latencies) * items_per_call / total if total else None,
+        'p50_us': p50 * 1e6,
+        'p95_us': p95 * 1e6,
+        'p99_us': p99 * 1e6
+    }
+
+def run_benchmarks(quick=False, only=None, seed=0):
+    rng = random.Random(seed)
+    n_patients = 200 if quick else 2000
+    min_time = 0.2 if quick else 1.0
+    patients = [sample_patient(rng) for _ in range(n_patients)]
+    results = {}
+
+    def want(name):
+        return only is None or name in only
+
+    predictor = SymptomPredictor()
+    predictor.train_model()
+
+    if want('calculate_bmi'):
+        results['calculate_bmi'] = summarize(measure(
+            lambda p: calculate_bmi(p['weight'], p['height']), patients, min_time))
+    if want('enhanced_diagnose'):
+        args = [diagnose_args(p) for p in patients]
+        results['enhanced_diagnose'] = summarize(measure(lambda a: enhanced_diagnose(*a), args, min_time))
+    if want('enhanced_diagnose_batch'):
+        batch_records = [dict(p['symptoms'], **{k: v for k, v in p.items() if k != 'symptoms'}) for p in patients]
+        results['enhanced_diagnose_batch'] = summarize(measure(
+            lambda records: rule_engine.evaluate_batch(rule_engine.encode_batch(records)),
+            [batch_records], min_time, max_iterations=50), items_per_call=len(batch_records))
+    if want('prepare_training_data'):
+        results['prepare_training_data'] = summarize(measure(
+            lambda _: SymptomPredictor().prepare_training_data(), [None], min_time, max_iterations=200))
+    if want('train_model'):
+        results['train_model'] = summarize(measure(
+            lambda _: SymptomPredictor().train_model(), [None], 0, max_iterations=1 if quick else 3))
+    def predict_one(p):
+        return predictor.predict(p['symptoms'], p['age'], p['lifestyle']['smoking'], p['medical_history']['diabetes'])
+    
+    if want('predict'):
+        # Uncached, so the case keeps measuring the forest
+        cache_size, prediction_cache.maxsize = prediction_cache.maxsize, 0
+        prediction_cache.invalidate()
+        results['predict'] = summarize(measure(predict_one, patients[:200], min_time, max_iterations=2000))
+        prediction_cache.maxsize = cache_size
+    if want('predict_cached'):
+        for p in patients[:200]:
+            predict_one(p)
+        results['predict_cached'] = summarize(measure(predict_one, patients[:200], min_time, max_iterations=20000))
+    if want('predict_batch'):
+        batch = [dict(p['symptoms'], age=p['age'], smoking=p['lifestyle']['smoking'],
+                      diabetes=p['medical_history']['diabetes']) for p in patients]
+        results['predict_batch'] = summarize(measure(
+            predictor.predict_batch, [batch], min_time, max_iterations=50), items_per_call=len(batch))
+    if want('feature_importance_top'):
+        results['feature_importance_top'] = summarize(measure(
+            lambda _: predictor.importance.top(5), [None], min_time, max_iterations=50000))
+    if want('get_feature_importance'):
+        results['get_feature_importance'] = summarize(measure(
+            lambda _: predictor.get_feature_importance(), [None], min_time, max_iterations=5000))
+    if want('serialize_and_append') or want('spool_flush'):
+        rows = []
+        for p in patients:
+            prediction = predict_one(p)
+            rows.append((p, enhanced_diagnose(*diagnose_args(p)), prediction[1], calculate_bmi(p['weight'], p['height'])))
+        with tempfile.TemporaryDirectory() as tmp:
+            worksheet = LocalWorksheet()
+            # A long flush interval keeps the background thread out of the measurement
+            writer = SheetWriter(worksheet, spool_path=os.path.join(tmp, "spool.db"),
+                                 batch_size=10**9, flush_interval=3600)
+            if want('serialize_and_append'):
+                results['serialize_and_append'] = summarize(measure(
+                    lambda r: writer.enqueue(record_row(*r)), rows, min_time, max_iterations=5000))
+            if want('spool_flush'):
+                pending = writer.pending()
+                start = time.perf_counter()
+                writer.flush()
+                elapsed = time.perf_counter() - start
+                results['spool_flush'] = summarize(np.array([elapsed]), items_per_call=max(pending, 1))
+            writer.close()
+    for kind in ('sqlite', 'parquet'):
+        if not (want(f'{kind}_append_many') or want(f'{kind}_query')):
+            continue
+        stored = [record_row(p, enhanced_diagnose(*diagnose_args(p)), [("Common Cold", 0.5)],
+                             calculate_bmi(p['weight'], p['height'])) for p in patients]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, kind)
+            store = open_record_store(kind, **({'path': path} if kind == 'sqlite' else {'root': path}))
+            if want(f'{kind}_append_many'):
+                def append_and_flush(rows):
+                    store.append_many(rows)
+                    store.flush()
+                results[f'{kind}_append_many'] = summarize(measure(
+                    append_and_flush, [stored], min_time, max_iterations=20), items_per_call=len(stored))
+            else:
+                store.append_many(stored)
+            if want(f'{kind}_query'):
+                today = datetime.now().strftime("%Y-%m-%d")
+                results[f'{kind}_query'] = summarize(measure(
+                    lambda _: store.query(start=today, location="Bench"), [None], min_time, max_iterations=200))
+            store.close()
+    return results
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'forest_engine': predictor_module.FOREST_ENGINE,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count()
+    }
+
+def compare(current, baseline, tolerance):
+    """Names of cases whose p50 latency grew by more than tolerance"""
+    regressions = []
+    for name, stats in current.items():
+        previous = baseline.get(name)
+        if previous and previous['p50_us'] and stats['p50_us'] > previous['p50_us'] * (1 + tolerance):
+            regressions.append(name)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--quick", action="store_true", help="fewer patients and shorter runs")
+    parser.add_argument("--only", help="comma-separated case names to run")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the patient sample")
+    parser.add_argument("--compare", help="earlier results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown, as a fraction")
+    args = parser.parse_args(argv)
+
+    only = set(args.only.split(",")) if args.only else None
+    report = {'environment': environment(), 'results': run_benchmarks(args.quick, only, args.seed)}
+
+    for name, stats in report['results'].items():
+        print(f"{name:<26} {stats['throughput_per_s']:>12.1f}/s  p50 {stats['p50_us']:>10.1f}us  "
+              f"p95 {stats['p95_us']:>10.1f}us  p99 {stats['p99_us']:>10.1f}us", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(report['results'], baseline, args.tolerance)
+        for name in regressions:
+            print(f"REGRESSION {name}: p50 {baseline[name]['p50_us']:.1f}us -> "
+                  f"{report['results'][name]['p50_us']:.1f}us", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
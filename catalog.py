@@ -0,0 +1,249 @@
+"""Options offered by the form (symptoms by category, other choices) and the interned symptom catalog
+
+CATALOG gives every symptom a stable integer ID and records which categories
+offer it. The rule engine and the feature encoder check their symptom
+literals against it when they are built, and log any that no form option
+can ever produce.
+"""
+import logging
+
+SYMPTOM_CATEGORIES = ['fever', 'basic', 'respiratory', 'tuberculosis', 'digestive',
+                      'skin', 'neurological', 'cancer', 'heart']
+
+FEVER_SYMPTOMS = [
+    "Fever", "Chills", "Sweating", "Increased body temperature",
+    "Intermittent fever", "High fever (104°F+)", "Mild fever (100-101°F)",
+    "Night sweats", "Morning fever"
+]
+
+BASIC_SYMPTOMS = [
+    "Fatigue", "Headache", "Nausea", "Vomiting",
+    "Muscle pain", "Joint pain", "Weakness", "Dizziness",
+    "Loss of appetite", "Body pain", "Weight loss", "Chest pain"
+]
+
+RESPIRATORY_SYMPTOMS = [
+    "Cough", "Shortness of breath", "Chest tightness", "Runny nose",
+    "Sore throat", "Sneezing", "Wheezing", "Loss of smell", "Loss of taste",
+    "Persistent cough (3 weeks+)", "Cough with blood", "Chest pain",
+    "Breathlessness", "Chest pain when breathing"
+]
+
+TUBERCULOSIS_SYMPTOMS = [
+    "Cough lasting more than 3 weeks", "Coughing up blood", "Chest pain",
+    "Breathing difficulty", "Night sweats", "Intermittent fever",
+    "Weight loss", "Loss of appetite", "Fatigue and weakness",
+    "Chest pain when breathing or coughing"
+]
+
+DIGESTIVE_SYMPTOMS = [
+    "Diarrhea", "Abdominal pain", "Bloating", "Constipation", "Heartburn",
+    "Blood in stool", "Difficulty swallowing", "Excessive thirst",
+    "Frequent urination", "Abdominal cramps"
+]
+
+SKIN_SYMPTOMS = [
+    "Rash", "Itching", "Yellow skin/eyes", "Skin discoloration",
+    "Hives", "Swelling", "Easy bruising", "Night sweats",
+    "Red spots on skin", "Eye pain", "Red eyes"
+]
+
+NEUROLOGICAL_SYMPTOMS = [
+    "Confusion", "Memory problems", "Numbness", "Tingling sensation",
+    "Vision problems", "Hearing problems", "Balance issues", "Seizures",
+    "Speech difficulties", "Tremors", "Severe headache"
+]
+
+HEART_SYMPTOMS = [
+    "Chest pain/pressure", "Pain radiating to arm/jaw/back/neck/throat",
+    "Shortness of breath", "Rapid/irregular heartbeat", "Swelling in legs/ankles/feet",
+    "Reduced exercise ability", "Persistent cough", "Abdominal swelling",
+    "Rapid weight gain", "Cold sweats", "Palpitations"
+]
+
+CANCER_SYMPTOMS = [
+    "Breast lump/thickening", "Unusual nipple discharge", "Pelvic pain/bloating",
+    "Abdominal pain/bloating", "Prostate issues", "Testicular lumps/swelling",
+    "Unusual bleeding/bruising", "Persistent pain", "Mouth sores/bleeding/numbness",
+    "Persistent cough/hoarseness", "Unexplained weight loss", "Swelling/lumps",
+    "Skin changes/jaundice/new moles", "Persistent headaches", "Extreme fatigue",
+    "Vision/hearing problems", "Difficulty swallowing", "Changes in bowel habits"
+]
+
+SYMPTOM_OPTIONS = {
+    'fever': FEVER_SYMPTOMS,
+    'basic': BASIC_SYMPTOMS,
+    'respiratory': RESPIRATORY_SYMPTOMS,
+    'tuberculosis': TUBERCULOSIS_SYMPTOMS,
+    'digestive': DIGESTIVE_SYMPTOMS,
+    'skin': SKIN_SYMPTOMS,
+    'neurological': NEUROLOGICAL_SYMPTOMS,
+    'cancer': CANCER_SYMPTOMS,
+    'heart': HEART_SYMPTOMS
+}
+
+# Medical history checkboxes: record column -> label, in display order
+HISTORY_OPTIONS = {
+    'bp': "High Blood Pressure", 'diabetes': "Diabetes", 'heart': "Heart Issues",
+    'thyroid': "Thyroid Issues", 'asthma': "Asthma/Respiratory Issues", 'kidney': "Kidney Disease",
+    'liver': "Liver Disease", 'cancer_history': "Family History of Cancer",
+    'tb_history': "Family History of TB", 'hiv_immune': "HIV/Weakened Immune System"
+}
+
+# The form's other choices, in display order; the first one is the default.
+# Compact records (compact.py) store a choice as its position, so only append.
+FORM_CHOICES = {
+    'gender': ["Male", "Female", "Other"],
+    'symptom_duration': ["Less than 1 week", "1-2 weeks", "2-4 weeks", "1-3 months", "More than 3 months"],
+    'severity': ["Mild", "Moderate", "Severe"],
+    'fever_pattern': ["Continuous fever", "Intermittent fever", "Low in morning/high in evening",
+                      "Night fever", "No specific pattern"],
+    'exercise': ["Never", "Occasionally", "1-2 times/week", "3-5 times/week", "Daily"]
+}
+
+# Every symptom ever offered, in ID order: a symptom's ID is its position here.
+# IDs are stored (as bits) with records, so only ever append to this list; a
+# symptom dropped from the form keeps its ID.
+SYMPTOM_VOCABULARY = [
+    # first offered under fever
+    "Fever", "Chills", "Sweating", "Increased body temperature", "Intermittent fever",
+    "High fever (104°F+)", "Mild fever (100-101°F)", "Night sweats", "Morning fever",
+    # basic
+    "Fatigue", "Headache", "Nausea", "Vomiting", "Muscle pain", "Joint pain", "Weakness", "Dizziness",
+    "Loss of appetite", "Body pain", "Weight loss", "Chest pain",
+    # respiratory
+    "Cough", "Shortness of breath", "Chest tightness", "Runny nose", "Sore throat", "Sneezing", "Wheezing",
+    "Loss of smell", "Loss of taste", "Persistent cough (3 weeks+)", "Cough with blood", "Breathlessness",
+    "Chest pain when breathing",
+    # tuberculosis
+    "Cough lasting more than 3 weeks", "Coughing up blood", "Breathing difficulty", "Fatigue and weakness",
+    "Chest pain when breathing or coughing",
+    # digestive
+    "Diarrhea", "Abdominal pain", "Bloating", "Constipation", "Heartburn", "Blood in stool",
+    "Difficulty swallowing", "Excessive thirst", "Frequent urination", "Abdominal cramps",
+    # skin
+    "Rash", "Itching", "Yellow skin/eyes", "Skin discoloration", "Hives", "Swelling", "Easy bruising",
+    "Red spots on skin", "Eye pain", "Red eyes",
+    # neurological
+    "Confusion", "Memory problems", "Numbness", "Tingling sensation", "Vision problems", "Hearing problems",
+    "Balance issues", "Seizures", "Speech difficulties", "Tremors", "Severe headache",
+    # cancer
+    "Breast lump/thickening", "Unusual nipple discharge", "Pelvic pain/bloating", "Abdominal pain/bloating",
+    "Prostate issues", "Testicular lumps/swelling", "Unusual bleeding/bruising", "Persistent pain",
+    "Mouth sores/bleeding/numbness", "Persistent cough/hoarseness", "Unexplained weight loss", "Swelling/lumps",
+    "Skin changes/jaundice/new moles", "Persistent headaches", "Extreme fatigue", "Vision/hearing problems",
+    "Changes in bowel habits",
+    # heart
+    "Chest pain/pressure", "Pain radiating to arm/jaw/back/neck/throat", "Rapid/irregular heartbeat",
+    "Swelling in legs/ankles/feet", "Reduced exercise ability", "Persistent cough", "Abdominal swelling",
+    "Rapid weight gain", "Cold sweats", "Palpitations"
+]
+
+logger = logging.getLogger(__name__)
+
+class SymptomCatalog:
+    """Symptoms interned to integer IDs, with per-category option IDs and membership bitmasks"""
+    def __init__(self, vocabulary=SYMPTOM_VOCABULARY, options=SYMPTOM_OPTIONS, categories=SYMPTOM_CATEGORIES):
+        self.names = tuple(vocabulary)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        if len(self.ids) != len(self.names):
+            raise ValueError("SYMPTOM_VOCABULARY lists a symptom twice")
+        self.categories = tuple(categories)
+        self.category_index = {category: i for i, category in enumerate(self.categories)}
+        self.category_ids = {}
+        self.category_masks = {}
+        # membership[id]: bit i set if SYMPTOM_CATEGORIES[i] offers the symptom
+        self.membership = [0] * len(self.names)
+        for i, category in enumerate(self.categories):
+            missing = [name for name in options[category] if name not in self.ids]
+            if missing:
+                raise ValueError(f"{category} options missing from SYMPTOM_VOCABULARY: {missing}")
+            ids = tuple(self.ids[name] for name in options[category])
+            self.category_ids[category] = ids
+            self.category_masks[category] = sum(1 << symptom_id for symptom_id in set(ids))
+            for symptom_id in ids:
+                self.membership[symptom_id] |= 1 << i
+        self.retired = [name for name, member in zip(self.names, self.membership) if not member]
+        self.issues = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def options(self, category):
+        """Option names of a category, in form order"""
+        return [self.names[symptom_id] for symptom_id in self.category_ids[category]]
+
+    def offers(self, category, name):
+        symptom_id = self.ids.get(name)
+        return symptom_id is not None and bool(self.membership[symptom_id] >> self.category_index[category] & 1)
+
+    def first_category(self, name):
+        """Index of the first category offering a symptom, or None for unknown and retired symptoms"""
+        symptom_id = self.ids.get(name)
+        member = self.membership[symptom_id] if symptom_id is not None else 0
+        return (member & -member).bit_length() - 1 if member else None
+
+    def symptom_bits(self, names):
+        """Bitset of a patient's symptoms over catalog IDs (bit i = symptom i); unknown names are skipped"""
+        ids = self.ids
+        bits = 0
+        for name in names:
+            symptom_id = ids.get(name)
+            if symptom_id is not None:
+                bits |= 1 << symptom_id
+        return bits
+
+    def symptom_names(self, bits):
+        """Symptom names of a symptom_bits bitset, in ID order"""
+        names = []
+        while bits:
+            low = bits & -bits
+            names.append(self.names[low.bit_length() - 1])
+            bits ^= low
+        return names
+
+    def check_literals(self, source, literals):
+        """Log and record literals no form option can produce
+
+        literals are (name, categories) pairs: a literal is dead if the
+        catalog has no such symptom, and unmatched if none of the categories
+        it is looked for in offers it.
+        """
+        found = []
+        for name, categories in literals:
+            if name not in self.ids:
+                found.append((source, name, "not a form option"))
+            elif not any(self.offers(category, name) for category in categories):
+                found.append((source, name, f"not offered in {', '.join(categories)}"))
+        for issue in found:
+            if issue not in self.issues:
+                self.issues.append(issue)
+                logger.warning("%s: symptom %r is %s and can never match", *issue)
+        return found
+
+CATALOG = SymptomCatalog()
+
+def split_by_category(symptoms):
+    """Rebuild per-category selections from a flat symptom list as stored in symptom_records
+
+    The stored column is the category lists joined in SYMPTOM_CATEGORIES
+    order, so each symptom goes to the earliest category at or after the
+    previous symptom's category that offers it and does not already hold it.
+    Symptoms no category offers stay in the current category so that
+    per-category counts are preserved.
+    """
+    ids, membership = CATALOG.ids, CATALOG.membership
+    selections = {category: [] for category in SYMPTOM_CATEGORIES}
+    position = 0
+    for symptom in symptoms:
+        symptom_id = ids.get(symptom)
+        member = membership[symptom_id] if symptom_id is not None else 0
+        for i in range(position, len(SYMPTOM_CATEGORIES)):
+            category = SYMPTOM_CATEGORIES[i]
+            if member >> i & 1 and symptom not in selections[category]:
+                position = i
+                break
+        else:
+            category = SYMPTOM_CATEGORIES[position]
+        selections[category].append(symptom)
+    return selections
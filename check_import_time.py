@@ -0,0 +1,92 @@
+"""Import-time budget for the Streamlit entry point
+
+Runs the module-level imports of app.py in a fresh interpreter under
+`python -X importtime`, reports the cumulative cost of each one and fails if
+the app's own modules exceed the budget or pull in a heavy dependency that
+should only load on first use.
+
+    python check_import_time.py --budget-ms 30
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Imported by the framework itself; reported but not counted against the budget
+FRAMEWORK_MODULES = {'streamlit'}
+
+# Must not be imported before the first code path that needs them
+LAZY_MODULES = ['sklearn', 'pandas', 'scipy', 'numpy', 'gspread', 'oauth2client', 'google.auth', 'pyarrow']
+
+def entry_point_imports(path=APP_PATH):
+    """Module-level import statements of the entry point and the modules they name"""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    statements, modules = [], set()
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            modules.add(node.module)
+        else:
+            continue
+        statements.append(ast.unparse(node))
+    return statements, modules
+
+def measure(statements, cwd):
+    """(top-level import timings in microseconds, every module imported) for the statements"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "\n".join(statements)],
+        capture_output=True, text=True, cwd=cwd
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing the entry point failed:\n{result.stderr}")
+    top_level = {}
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        imported.add(module)
+        # Nested imports are indented under their importer
+        if not name[1:].startswith(" "):
+            top_level[module] = top_level.get(module, 0) + int(cumulative)
+    return top_level, imported
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=30.0,
+                        help="allowed cumulative import time of the app's own imports")
+    parser.add_argument("--app", default=APP_PATH, help="entry point to check")
+    args = parser.parse_args(argv)
+
+    statements, modules = entry_point_imports(args.app)
+    top_level, imported = measure(statements, os.path.dirname(os.path.abspath(args.app)))
+
+    # Only the entry point's own imports count; the rest is interpreter startup
+    own_ms = 0.0
+    for module, micros in sorted(top_level.items(), key=lambda item: -item[1]):
+        if module not in modules:
+            continue
+        framework = module.split(".")[0] in FRAMEWORK_MODULES
+        if not framework:
+            own_ms += micros / 1000
+        print(f"{micros / 1000:>9.1f} ms  {module}{'  (framework)' if framework else ''}")
+    print(f"{own_ms:>9.1f} ms  total for app imports (budget {args.budget_ms:.0f} ms)")
+
+    eager = sorted({m for m in imported for lazy in LAZY_MODULES if m == lazy or m.startswith(lazy + ".")})
+    failed = False
+    if eager:
+        print("Heavy modules imported at startup: " + ", ".join(sorted({m.split('.')[0] for m in eager})))
+        failed = True
+    if own_ms > args.budget_ms:
+        print(f"Import time {own_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
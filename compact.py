@@ -0,0 +1,306 @@
+"""Compact symptom_records rows: bitmasks, enum codes and fixed-point numbers
+
+A readable row spends 34 cells on a submission, most of them long text. The
+compact layout (COMPACT_COLUMNS) keeps the free-text fields and packs the
+rest into 16 cells, each small enough to be an exact Sheets number:
+
+    flags           BOOL_COLUMNS as a bitmask (bit i = BOOL_COLUMNS[i])
+    choices         gender, duration, severity, fever pattern, exercise and BMI
+                    category as enum codes in fixed bit fields (0 = blank)
+    symptoms        catalog symptom IDs as a hex bitmask ("x" + 25 hex digits)
+    diagnosis       fired rules (bits 0-23) and rules escalated to High (bits 24-47)
+    risk_score, bmi tenths (41.5% -> 415); tb_risk_score as is
+    ml_predictions  top-3 (disease code, per-mille probability), 15 bits each
+
+decode_row gives back the readable row. Conditions and risk factors are
+re-derived from the fired rules and the flags, so they read exactly as the
+app wrote them; symptoms come back in catalog order, and a symptom picked in
+two categories is listed once. decode_frame turns a batch of compact rows
+into typed pandas columns with array operations only.
+
+Codes are positions in append-only tables (SYMPTOM_VOCABULARY, FORM_CHOICES,
+DIAGNOSIS_RULES, DISEASES), so rows stay decodable as those tables grow.
+"""
+import re
+from collections import Counter
+
+from catalog import CATALOG, FORM_CHOICES
+from rules import DIAGNOSIS_RULES, RISK_FACTOR_RULES, TB_RULES
+from storage import (BOOL_COLUMNS, MEDICAL_HISTORY_COLUMNS, RecordStore, format_conditions, make_record_row,
+                     parse_flag, parse_number, row_to_record)
+
+COMPACT_VERSION = 1
+COMPACT_COLUMNS = [
+    'timestamp', 'name', 'age', 'mobile', 'location', 'weight', 'height', 'flags', 'choices',
+    'symptoms', 'diagnosis', 'risk_score', 'tb_risk_score', 'ml_predictions', 'bmi', 'layout'
+]
+
+BMI_CATEGORIES = ["Underweight", "Normal", "Overweight", "Obese"]
+ENUMS = dict(FORM_CHOICES, bmi_category=BMI_CATEGORIES)
+# (field, shift, width) of each enum code inside the choices cell
+CHOICE_FIELDS = []
+_shift = 0
+for _field in ['gender', 'symptom_duration', 'severity', 'fever_pattern', 'exercise', 'bmi_category']:
+    _width = len(ENUMS[_field]).bit_length()
+    CHOICE_FIELDS.append((_field, _shift, _width))
+    _shift += _width
+
+SYMPTOM_HEX_DIGITS = (len(CATALOG) + 3) // 4
+SYMPTOM_PREFIX = "x"  # keeps Sheets from reading an all-digit bitmask as a number
+RULE_BITS = 24
+PREDICTION_BITS = 15  # 5-bit disease code, 10-bit per-mille probability
+TOP_K = 3
+
+TB_PREFIX = TB_RULES['condition'][0].split("{")[0]
+CONDITION_CELL = re.compile(r"(.+?) \((High|Medium|Low)\)(?:, |$)")
+# Rules that show up in a row: through a condition or through risk factors
+CONDITION_RULES = {rule['condition'][0]: k for k, rule in enumerate(DIAGNOSIS_RULES) if rule.get('condition')}
+if len(DIAGNOSIS_RULES) > RULE_BITS:
+    raise ValueError(f"compact rows hold at most {RULE_BITS} diagnosis rules")
+
+def _diseases():
+    # Imported on first use: predictor pulls in NumPy
+    from predictor import DISEASES
+    return DISEASES
+
+def _whole(value):
+    number = parse_number(value)
+    return int(number) if number.is_integer() else number
+
+def _base_level(rule):
+    level = rule.get('risk_level')
+    return level[0] if isinstance(level, tuple) else level
+
+def flag_risk_factors(flags):
+    """Risk factor labels implied by the flags bitmask, as the app's medical_history produces them"""
+    labels = []
+    for source, key, label in RISK_FACTOR_RULES:
+        column = key if source == 'history' else source
+        # The app's medical_history only holds MEDICAL_HISTORY_COLUMNS
+        if source == 'history' and column not in MEDICAL_HISTORY_COLUMNS:
+            continue
+        if flags >> BOOL_COLUMNS.index(column) & 1:
+            labels.append(label)
+    return labels
+
+def encode_diagnosis(conditions_cell, risk_factors_cell, flags):
+    """The diagnosis cell (fired and escalated rule bits) from a readable row's text"""
+    fired = escalated = 0
+    for name, level in CONDITION_CELL.findall(str(conditions_cell)):
+        if name.startswith(TB_PREFIX):
+            continue  # derived from tb_risk_score
+        k = CONDITION_RULES.get(name)
+        if k is None:
+            raise ValueError(f"Condition {name!r} is not produced by DIAGNOSIS_RULES")
+        fired |= 1 << k
+        if level == "High" and _base_level(DIAGNOSIS_RULES[k]) != "High":
+            escalated |= 1 << k
+    remaining = Counter(label for label in str(risk_factors_cell).split(", ") if label)
+    remaining.subtract(flag_risk_factors(flags))
+    for k, rule in enumerate(DIAGNOSIS_RULES):
+        if fired >> k & 1:
+            remaining.subtract(rule.get('risk_factors', []))
+    # Rules without a condition are only visible through their risk factors
+    for k, rule in enumerate(DIAGNOSIS_RULES):
+        labels = rule.get('risk_factors', [])
+        if not rule.get('condition') and labels and all(remaining[label] > 0 for label in labels):
+            fired |= 1 << k
+            remaining.subtract(labels)
+    unexplained = [label for label, count in remaining.items() if count]
+    if unexplained:
+        raise ValueError(f"Risk factors {unexplained} do not follow from the flags and conditions")
+    return fired | escalated << RULE_BITS
+
+def decode_diagnosis(diagnosis, flags, tb_risk_score):
+    """(conditions, risk_factors) lists as the rule engine returned them"""
+    tb = TB_RULES
+    conditions = []
+    risk_factors = flag_risk_factors(flags)
+    if tb_risk_score >= tb['condition_score']:
+        name, system = tb['condition']
+        level = "High" if tb_risk_score >= tb['high_risk_score'] else "Medium"
+        conditions.append((name.format(score=tb_risk_score), system, level))
+    for k, rule in enumerate(DIAGNOSIS_RULES):
+        if not diagnosis >> k & 1:
+            continue
+        if rule.get('condition'):
+            level = "High" if diagnosis >> (RULE_BITS + k) & 1 else _base_level(rule)
+            conditions.append((rule['condition'][0], rule['condition'][1], level))
+        risk_factors.extend(rule.get('risk_factors', []))
+    return conditions, risk_factors
+
+def encode_predictions(cell):
+    """Pack a 'Disease: 42.0%; ...' cell into one integer"""
+    codes = {disease: i + 1 for i, disease in enumerate(_diseases())}
+    packed = 0
+    for j, part in enumerate(p for p in str(cell).split("; ") if p):
+        disease, _, share = part.rpartition(": ")
+        if j >= TOP_K or disease not in codes:
+            raise ValueError(f"Cannot encode prediction {part!r}")
+        permille = round(parse_number(share) * 10)
+        packed |= (codes[disease] << 10 | permille) << (PREDICTION_BITS * j)
+    return packed
+
+def decode_predictions(packed):
+    diseases = _diseases()
+    parts = []
+    for j in range(TOP_K):
+        pair = packed >> (PREDICTION_BITS * j) & (1 << PREDICTION_BITS) - 1
+        if pair:
+            parts.append(f"{diseases[(pair >> 10) - 1]}: {(pair & 0x3FF) / 10:.1f}%")
+    return "; ".join(parts)
+
+def encode_row(row):
+    """Compact row from a readable row (RECORD_COLUMNS order, as stored or as Sheets returns it)"""
+    record = row_to_record(row)
+    flags = 0
+    for i, column in enumerate(BOOL_COLUMNS):
+        if parse_flag(record[column]):
+            flags |= 1 << i
+    choices = 0
+    for field, shift, _ in CHOICE_FIELDS:
+        value = record[field]
+        if value not in ("", None) and value not in ENUMS[field]:
+            raise ValueError(f"{field} {value!r} has no enum code")
+        code = ENUMS[field].index(value) + 1 if value not in ("", None) else 0
+        choices |= code << shift
+    symptoms = [s.strip() for s in str(record['symptoms']).split(",") if s.strip()]
+    unknown = [s for s in symptoms if s not in CATALOG.ids]
+    if unknown:
+        raise ValueError(f"Symptoms {unknown} are not in the catalog")
+    return [
+        record['timestamp'], record['name'], _whole(record['age']), record['mobile'], record['location'],
+        _whole(record['weight']), _whole(record['height']), flags, choices,
+        f"{SYMPTOM_PREFIX}{CATALOG.symptom_bits(symptoms):0{SYMPTOM_HEX_DIGITS}x}",
+        encode_diagnosis(record['conditions'], record['risk_factors'], flags),
+        round(parse_number(record['risk_score']) * 10), _whole(record['tb_risk_score']),
+        encode_predictions(record['ml_predictions']), round(parse_number(record['bmi']) * 10), COMPACT_VERSION
+    ]
+
+def is_compact(row):
+    """Whether a stored row uses this layout (readable rows are longer)"""
+    return len(row) == len(COMPACT_COLUMNS)
+
+def decode_row(compact):
+    """The readable row (RECORD_COLUMNS order) for a compact row"""
+    cells = dict(zip(COMPACT_COLUMNS, compact))
+    flags = int(parse_number(cells['flags']))
+    choices = int(parse_number(cells['choices']))
+    tb_risk_score = _whole(cells['tb_risk_score'])
+    record = {column: bool(flags >> i & 1) for i, column in enumerate(BOOL_COLUMNS)}
+    for field, shift, width in CHOICE_FIELDS:
+        code = choices >> shift & (1 << width) - 1
+        record[field] = ENUMS[field][code - 1] if code else ""
+    conditions, risk_factors = decode_diagnosis(int(parse_number(cells['diagnosis'])), flags, tb_risk_score)
+    symptoms = CATALOG.symptom_names(int(str(cells['symptoms'])[len(SYMPTOM_PREFIX):] or "0", 16))
+    record.update(
+        timestamp=cells['timestamp'], name=cells['name'], age=_whole(cells['age']), mobile=cells['mobile'],
+        location=cells['location'], weight=_whole(cells['weight']), height=_whole(cells['height']),
+        symptoms=", ".join(symptoms), conditions=format_conditions(conditions), risk_factors=", ".join(risk_factors),
+        risk_score=f"{parse_number(cells['risk_score']) / 10:.1f}%", tb_risk_score=f"{tb_risk_score}%",
+        ml_predictions=decode_predictions(int(parse_number(cells['ml_predictions']))),
+        bmi=f"{parse_number(cells['bmi']) / 10:.1f}"
+    )
+    return make_record_row(record)
+
+# ---------- VECTORIZED DECODING ----------
+def _numbers(values):
+    import numpy as np
+    import pandas as pd
+    return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+def decode_frame(rows):
+    """Typed DataFrame for a batch of compact rows
+
+    Flags become bool columns, enum codes categoricals, fixed-point numbers
+    floats, and the packed predictions ml_1..ml_3 (categorical) with
+    ml_1_prob..ml_3_prob; 'symptoms' and 'diagnosis' stay packed, see
+    symptom_matrix and condition_matrix.
+    """
+    import numpy as np
+    import pandas as pd
+    rows = [list(row) + [""] * (len(COMPACT_COLUMNS) - len(row)) for row in rows]
+    cells = dict(zip(COMPACT_COLUMNS, zip(*rows))) if rows else {c: () for c in COMPACT_COLUMNS}
+    frame = pd.DataFrame({column: pd.Series(cells[column], dtype=object).astype(str)
+                          for column in ('timestamp', 'name', 'mobile', 'location')})
+    for column in ('age', 'weight', 'height'):
+        frame[column] = _numbers(cells[column])
+    flags = _numbers(cells['flags']).astype(np.int64)
+    for i, column in enumerate(BOOL_COLUMNS):
+        frame[column] = (flags >> i & 1).astype(bool)
+    choices = _numbers(cells['choices']).astype(np.int64)
+    for field, shift, width in CHOICE_FIELDS:
+        frame[field] = pd.Categorical.from_codes(((choices >> shift) & (1 << width) - 1) - 1, categories=ENUMS[field])
+    frame['symptoms'] = pd.Series(cells['symptoms'], dtype=object).astype(str).to_numpy()
+    frame['diagnosis'] = _numbers(cells['diagnosis']).astype(np.int64)
+    frame['risk_score'] = _numbers(cells['risk_score']) / 10
+    frame['tb_risk_score'] = _numbers(cells['tb_risk_score'])
+    frame['bmi'] = _numbers(cells['bmi']) / 10
+    predictions = _numbers(cells['ml_predictions']).astype(np.int64)
+    for j in range(TOP_K):
+        pair = predictions >> (PREDICTION_BITS * j) & (1 << PREDICTION_BITS) - 1
+        frame[f'ml_{j + 1}'] = pd.Categorical.from_codes((pair >> 10) - 1, categories=_diseases())
+        frame[f'ml_{j + 1}_prob'] = (pair & 0x3FF) / 1000
+    return frame
+
+def symptom_matrix(symptoms):
+    """Bool DataFrame with one column per catalog symptom from packed symptom cells"""
+    import numpy as np
+    import pandas as pd
+    digits = pd.Series(symptoms, dtype=object).astype(str).str.slice(len(SYMPTOM_PREFIX)).str.zfill(SYMPTOM_HEX_DIGITS)
+    raw = digits.to_numpy().astype(f"S{SYMPTOM_HEX_DIGITS}").view(np.uint8).reshape(len(digits), SYMPTOM_HEX_DIGITS)
+    hex_values = np.zeros(256, dtype=np.uint8)
+    hex_values[np.frombuffer(b"0123456789abcdefABCDEF", dtype=np.uint8)] = list(range(16)) + list(range(10, 16))
+    nibbles = hex_values[raw]
+    # Most significant digit first; reverse so column i is bit i
+    bits = np.unpackbits(nibbles[:, :, np.newaxis], axis=2)[:, :, 4:].reshape(len(digits), -1)[:, ::-1]
+    return pd.DataFrame(bits[:, :len(CATALOG)].astype(bool), columns=list(CATALOG.names), index=getattr(symptoms, 'index', None))
+
+def condition_matrix(frame):
+    """Bool DataFrame with one column per condition, from decode_frame's diagnosis and tb_risk_score"""
+    import pandas as pd
+    diagnosis = frame['diagnosis'].to_numpy()
+    columns = {TB_PREFIX.split(" - ")[0]: frame['tb_risk_score'].to_numpy() >= TB_RULES['condition_score']}
+    for name, k in CONDITION_RULES.items():
+        columns[name] = (diagnosis >> k & 1).astype(bool)
+    return pd.DataFrame(columns, index=frame.index)
+
+# ---------- STORE ----------
+class CompactRecordStore(RecordStore):
+    """Writes compact rows through a Sheets record store; reads return readable rows
+
+    A sheet switched to RECORD_FORMAT=compact keeps its earlier readable
+    rows, so reads take both layouts.
+    """
+    def __init__(self, store):
+        self.store = store
+
+    def append_many(self, rows):
+        self.store.append_many([encode_row(row) for row in rows])
+
+    def scan(self, batch_size=10_000):
+        for batch in self.store.scan(batch_size):
+            yield [decode_row(row) if is_compact(row) else row for row in batch]
+
+    def scan_frame(self):
+        """Every stored row as one decode_frame DataFrame
+
+        Readable rows are packed with encode_row first; ones it cannot pack
+        (values outside the catalog and code tables) are left out.
+        """
+        rows = []
+        for batch in self.store.scan():
+            for row in batch:
+                if not is_compact(row):
+                    try:
+                        row = encode_row(row)
+                    except ValueError:
+                        continue
+                rows.append(row)
+        return decode_frame(rows)
+
+    def flush(self):
+        self.store.flush()
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,220 @@
+"""Offline load test: many concurrent Streamlit sessions submitting the form
+
+Each simulated session is a Streamlit AppTest of app.py: it loads the page,
+fills user_form with a randomized but realistic patient (the benchmark's
+sampler) and submits. AppTest keeps per-run state in module globals, so the
+--sessions concurrent sessions each get a worker process of their own; each
+worker warms its cached resources (model, sheet connection) before timing
+starts, like one replica of the server. Google Sheets is replaced by an in-memory worksheet (SHEETS_STUB)
+with an optional per-call latency, and the run happens in a scratch working
+directory, so nothing leaves the machine.
+
+Arrivals follow a Poisson process at --rate submissions per second (0 means
+every session submits again as soon as it finishes). The report gives
+throughput, p50/p99 page-load, submit and end-to-end latency (end-to-end
+includes waiting for a free session), CPU seconds per submission and the
+largest worker RSS.
+
+    python loadtest.py --sessions 16 --rate 5 --submissions 300
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmark import sample_patient
+from catalog import FORM_CHOICES, HISTORY_OPTIONS, SYMPTOM_CATEGORIES, SYMPTOM_OPTIONS
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+PAGE_TIMEOUT = 120  # seconds an AppTest run may take (the first one may train the model)
+
+LOCATIONS = ["Pune", "Nagpur", "Nashik", "Aurangabad", "Solapur"]
+
+def rss_bytes():
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def widget(widgets, label):
+    for w in widgets:
+        if w.label == label:
+            return w
+    raise LookupError(f"No widget labelled {label!r}")
+
+def fill_form(at, patient, rng):
+    """Enter one patient into user_form"""
+    widget(at.text_input, "👤 Full Name").input(f"Load Test {rng.randrange(10**6)}")
+    widget(at.text_input, "📱 Mobile Number").input(f"9{rng.randrange(10**9):09d}")
+    widget(at.text_input, "📍 Location / City").input(rng.choice(LOCATIONS))
+    widget(at.number_input, "🎂 Age").set_value(patient['age'])
+    widget(at.number_input, "⚖ Weight (kg)").set_value(patient['weight'])
+    widget(at.number_input, "📏 Height (cm)").set_value(patient['height'])
+    widget(at.radio, "⚧ Gender").set_value(rng.choice(FORM_CHOICES['gender']))
+    for key, label in HISTORY_OPTIONS.items():
+        if patient['medical_history'][key]:
+            widget(at.checkbox, label).check()
+    # Symptom multiselects are told apart by their options
+    for ms in at.multiselect:
+        for category in SYMPTOM_CATEGORIES:
+            if list(ms.options) == SYMPTOM_OPTIONS[category]:
+                ms.set_value(patient['symptoms'][category])
+    widget(at.selectbox, "Fever Pattern").set_value(patient['fever_pattern'])
+    widget(at.selectbox, "Exercise Frequency").set_value(patient['lifestyle']['exercise'])
+    for label, value in (("Smoker", patient['lifestyle']['smoking']),
+                         ("Regular Alcohol Consumption", patient['lifestyle']['alcohol']),
+                         ("Recent travel history", patient['recent_travel']),
+                         ("Been in contact with TB patient", patient['tb_contact'])):
+        if value:
+            widget(at.checkbox, label).check()
+
+def run_session(rng):
+    """One visitor: load the page, fill the form, submit. Returns (page_load_s, submit_s, ok)"""
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP_PATH, default_timeout=PAGE_TIMEOUT)
+    start = time.perf_counter()
+    at.run()
+    page_load = time.perf_counter() - start
+    fill_form(at, sample_patient(rng), rng)
+    start = time.perf_counter()
+    widget(at.button, "🔍 Analyze Symptoms").click().run()
+    submit = time.perf_counter() - start
+    ok = not at.exception and any("Analysis Results" in str(s.value) for s in at.success)
+    return page_load, submit, ok
+
+def percentiles(values):
+    if not values:
+        return {'p50_ms': None, 'p99_ms': None}
+    p50, p99 = np.percentile(values, [50, 99])
+    return {'p50_ms': p50 * 1000, 'p99_ms': p99 * 1000}
+
+def start_worker(workdir, warmup, warmup_lock, ready):
+    """Pool initializer: run from the shared workdir, warm this process's caches, then wait for the rest"""
+    os.chdir(workdir)
+    # One at a time, so the first worker trains and saves the model and the others load it
+    with warmup_lock:
+        for n in range(warmup):
+            run_session(random.Random(n))
+    ready.wait()
+
+def timed_session(seed):
+    """run_session plus the CPU time it took in this worker and the worker's RSS afterwards"""
+    cpu_before = time.process_time()
+    try:
+        page_load, submit, ok = run_session(random.Random(seed))
+    except Exception as e:
+        page_load, submit, ok = None, None, False
+        print(f"[loadtest] session failed: {e}", file=sys.stderr)
+    return page_load, submit, ok, time.process_time() - cpu_before, rss_bytes()
+
+def run_load(sessions, submissions, rate, seed=0, warmup=1):
+    """Drive the app and return the report dict"""
+    rng = random.Random(seed)
+    context = multiprocessing.get_context("spawn")
+    manager = context.Manager()
+    warmup_lock, ready = manager.Lock(), manager.Barrier(sessions + 1)
+    samples = []
+    done = threading.Semaphore(0)
+
+    def collect(arrival):
+        def callback(result):
+            samples.append(result + (time.perf_counter() - arrival,))
+            done.release()
+        return callback
+
+    with context.Pool(sessions, initializer=start_worker, initargs=(os.getcwd(), warmup, warmup_lock, ready)) as pool:
+        ready.wait()
+        start = time.perf_counter()
+        # Arrival times, relative to the start; a closed loop has none
+        if rate > 0:
+            arrivals = np.cumsum(np.random.RandomState(seed).exponential(1 / rate, submissions))
+            for offset in arrivals:
+                delay = start + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                arrival = time.perf_counter()
+                pool.apply_async(timed_session, (rng.random(),), callback=collect(arrival))
+        else:
+            # Closed loop: keep exactly one submission in flight per session
+            for i in range(submissions):
+                if i >= sessions:
+                    done.acquire()
+                pool.apply_async(timed_session, (rng.random(),), callback=collect(time.perf_counter()))
+        pool.close()
+        pool.join()
+        elapsed = time.perf_counter() - start
+
+    completed = [s for s in samples if s[2]]
+    cpu = sum(s[3] for s in samples)
+    # Each worker reports its own RSS; the last report per worker is not identifiable, so use the largest
+    rss_peak = max((s[4] for s in samples), default=0)
+    return {
+        'sessions': sessions,
+        'submissions': submissions,
+        'target_rate_per_s': rate or None,
+        'elapsed_s': elapsed,
+        'completed': len(completed),
+        'failed': len(samples) - len(completed),
+        'throughput_per_s': len(completed) / elapsed if elapsed else None,
+        'page_load': percentiles([s[0] for s in completed]),
+        'submit': percentiles([s[1] for s in completed]),
+        'end_to_end': percentiles([s[5] for s in completed]),
+        'cpu_s_per_session': cpu / max(len(samples), 1),
+        'cpu_utilization': cpu / elapsed if elapsed else None,
+        'rss_mb_per_worker': rss_peak / 2**20
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent sessions")
+    parser.add_argument("--submissions", type=int, default=100, help="total form submissions")
+    parser.add_argument("--rate", type=float, default=0.0, help="arrivals per second (0: closed loop)")
+    parser.add_argument("--sheet-latency", type=float, default=0.2, help="seconds per stub Sheets call")
+    parser.add_argument("--sheet-error-rate", type=float, default=0.0, help="fraction of stub Sheets calls failing")
+    parser.add_argument("--record-store", default="sheets", help="RECORD_STORE for the app under test")
+    parser.add_argument("--seed", type=int, default=0, help="seed for patients and arrivals")
+    parser.add_argument("--workdir", help="working directory for the app (default: a fresh temp dir)")
+    parser.add_argument("--output", help="write the report JSON here")
+    args = parser.parse_args(argv)
+
+    os.environ['SHEETS_STUB'] = "1"
+    os.environ['SHEETS_STUB_LATENCY'] = str(args.sheet_latency)
+    os.environ['SHEETS_STUB_ERROR_RATE'] = str(args.sheet_error_rate)
+    os.environ['RECORD_STORE'] = args.record_store
+    workdir = args.workdir or tempfile.mkdtemp(prefix="loadtest-")
+    os.chdir(workdir)
+
+    report = run_load(args.sessions, args.submissions, args.rate, args.seed)
+    report['sheet_latency_s'] = args.sheet_latency
+    report['sheet_error_rate'] = args.sheet_error_rate
+    report['record_store'] = args.record_store
+
+    print(f"{report['completed']} submissions ({report['failed']} failed) in {report['elapsed_s']:.1f}s: "
+          f"{report['throughput_per_s']:.2f}/s with {args.sessions} sessions", file=sys.stderr)
+    for stage in ('page_load', 'submit', 'end_to_end'):
+        stats = report[stage]
+        if stats['p50_ms'] is not None:
+            print(f"  {stage:<11} p50 {stats['p50_ms']:>8.1f} ms  p99 {stats['p99_ms']:>8.1f} ms", file=sys.stderr)
+    print(f"  CPU {report['cpu_s_per_session'] * 1000:.0f} ms/session ({report['cpu_utilization']:.0%} of one core), "
+          f"RSS {report['rss_mb_per_worker']:.0f} MB per worker", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    # AppTest replaces __main__ with the app script, so workers must find their functions as loadtest.*
+    import loadtest
+    loadtest.main()
@@ -0,0 +1,179 @@
+"""Process-wide latency histograms and event counters with Prometheus text export
+
+Stages are timed with `timed(stage)` and events counted with `count(event)`.
+Timing is a couple of perf_counter calls and a bucket increment, cheap enough
+to leave on. Hooks around expensive or
+high-volume stages pass `sampled=True` and only record a fraction of calls
+(METRICS_SAMPLE_RATE). Settings come from environment variables:
+
+    METRICS_ENABLED      0 disables all recording (default 1)
+    METRICS_SAMPLE_RATE  fraction of sampled hooks that record (default 0.1)
+    METRICS_FILE         write the Prometheus text to this file periodically
+    METRICS_PORT         serve the Prometheus text over HTTP on this port
+"""
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_NAME = "symptom_checker_stage_latency_seconds"
+COUNTER_NAME = "symptom_checker_events_total"
+EXPORT_INTERVAL = 15  # seconds between METRICS_FILE writes
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+SAMPLE_RATE = float(os.environ.get("METRICS_SAMPLE_RATE", "0.1"))
+
+class Histogram:
+    """Cumulative latency histogram with fixed buckets"""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.sum
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile"""
+        counts, count, _ = self.snapshot()
+        if count == 0:
+            return None
+        target = q * count
+        running = 0
+        for bound, n in zip(self.buckets + (float('inf'),), counts):
+            running += n
+            if running >= target:
+                return bound
+        return float('inf')
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+def histogram(stage):
+    """The histogram for a stage, created on first use"""
+    hist = _histograms.get(stage)
+    if hist is None:
+        with _histograms_lock:
+            hist = _histograms.setdefault(stage, Histogram())
+    return hist
+
+def observe(stage, seconds):
+    if ENABLED:
+        histogram(stage).observe(seconds)
+
+@contextmanager
+def timed(stage, sampled=False):
+    """Record how long the block takes under `stage`"""
+    if not ENABLED or (sampled and random.random() >= SAMPLE_RATE):
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram(stage).observe(time.perf_counter() - start)
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+def count(event, n=1):
+    """Add n to the counter for `event`"""
+    if ENABLED:
+        with _counters_lock:
+            _counters[event] = _counters.get(event, 0) + n
+
+def counters():
+    """Snapshot of every counter: {event: total}"""
+    with _counters_lock:
+        return dict(_counters)
+
+def stages():
+    """Snapshot of every stage: {stage: Histogram}"""
+    with _histograms_lock:
+        return dict(_histograms)
+
+def render_prometheus():
+    """All histograms and counters in the Prometheus text exposition format"""
+    lines = [
+        f"# HELP {METRIC_NAME} Latency of app stages in seconds",
+        f"# TYPE {METRIC_NAME} histogram"
+    ]
+    for stage, hist in sorted(stages().items()):
+        counts, count, total = hist.snapshot()
+        running = 0
+        for bound, n in zip(hist.buckets, counts):
+            running += n
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound:g}"}} {running}')
+        lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {total:.6f}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {count}')
+    lines.append(f"# HELP {COUNTER_NAME} Events counted by the app")
+    lines.append(f"# TYPE {COUNTER_NAME} counter")
+    for event, total in sorted(counters().items()):
+        lines.append(f'{COUNTER_NAME}{{event="{event}"}} {total}')
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path):
+    """Atomically write the Prometheus text to a file (for node_exporter's textfile collector)"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+def _export_file_forever(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_prometheus(path)
+        except OSError:
+            pass
+
+def start_http_server(port):
+    """Serve /metrics from a daemon thread"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+_exporters_started = False
+
+def start_exporters():
+    """Start the file and HTTP exporters configured in the environment, once per process"""
+    global _exporters_started
+    with _histograms_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    path = os.environ.get("METRICS_FILE")
+    if path:
+        threading.Thread(target=_export_file_forever, args=(path, EXPORT_INTERVAL),
+                         name="metrics-file", daemon=True).start()
+    port = os.environ.get("METRICS_PORT")
+    if port:
+        start_http_server(int(port))
@@ -0,0 +1,122 @@
+"""Incremental local Parquet mirror of the symptom_records sheet
+
+Each sync asks Sheets only for the rows below the last one already mirrored
+and writes them, typed, to a ParquetRecordStore (date=YYYY-MM-DD partitions
+that DuckDB, pandas and pyarrow read directly), one file per page and date
+named after the page's first sheet row. The sheet row reached so far
+is kept in _sync.json next to the data; files starting with "_" are ignored
+by Parquet readers. Rows written in the compact layout (RECORD_FORMAT=compact)
+are decoded to the readable one, so the mirror always has RECORD_COLUMNS.
+
+    python mirror.py --root data/mirror        # one sync, e.g. from cron
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from compact import decode_row, is_compact
+from storage import RECORD_COLUMNS, ParquetRecordStore, SheetConnection, is_number, parquet_files, row_to_record
+
+MIRROR_ROOT = os.path.join("data", "mirror")
+SYNC_STATE_NAME = "_sync.json"
+SYNC_PAGE_ROWS = 5000  # rows requested per Sheets call
+LAST_COLUMN = "AH"  # column letter of RECORD_COLUMNS[-1]
+
+class SheetMirror:
+    """Keeps a Parquet copy of the sheet up to date by fetching appended rows only"""
+    def __init__(self, connection, root=MIRROR_ROOT, page_rows=SYNC_PAGE_ROWS):
+        self.connection = connection
+        self.root = root
+        self.page_rows = page_rows
+        self.store = ParquetRecordStore(root, buffer_rows=page_rows)
+        self._state_path = os.path.join(root, SYNC_STATE_NAME)
+
+    def state(self):
+        """{'synced_rows': sheet rows mirrored so far (header included), 'synced_at': ...}"""
+        if not os.path.exists(self._state_path):
+            return {'synced_rows': 0, 'synced_at': None}
+        with open(self._state_path) as f:
+            return json.load(f)
+
+    def _save_state(self, state):
+        tmp_path = f"{self._state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._state_path)
+
+    def sync(self):
+        """Mirror the rows appended since the last sync; returns how many were added"""
+        state = self.state()
+        synced = state['synced_rows']
+        added = 0
+        while True:
+            first = synced + 1
+            rows = self.connection.call('get', f"A{first}:{LAST_COLUMN}{first + self.page_rows - 1}")
+            if not rows:
+                break
+            fetched = len(rows)
+            # A header row has a non-numeric age cell
+            if synced == 0 and not is_number(row_to_record(rows[0])['age']):
+                rows = rows[1:]
+            rows = [decode_row(row) if is_compact(row) else row for row in rows if any(cell != "" for cell in row)]
+            # Data first, then the state. A crash in between re-fetches the page from
+            # the same first row, and its files replace the ones already written
+            written = self.store.write_rows(rows, f"rows-{first:09d}")
+            synced += fetched
+            added += len(rows)
+            self._save_state({'synced_rows': synced, 'synced_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+            # Only once the page is recorded, so a replay never meets its rows merged away
+            self.store.compact(written)
+            if fetched < self.page_rows:
+                break
+        return added
+
+    def rebuild(self):
+        """Drop the mirror and its sync state so the next sync starts from the top"""
+        for directory, _, files in os.walk(self.root, topdown=False):
+            for name in files:
+                if name.endswith(".parquet") or name == SYNC_STATE_NAME:
+                    os.remove(os.path.join(directory, name))
+            if directory != self.root and not os.listdir(directory):
+                os.rmdir(directory)
+
+def load_frame(root=MIRROR_ROOT, columns=None, start=None, end=None):
+    """Mirrored records as a DataFrame, optionally only some columns and a [start, end) date range"""
+    import pyarrow.dataset as ds
+    import pandas as pd
+    columns = list(columns or RECORD_COLUMNS)
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=columns)
+    dataset = ds.dataset(parquet_files(root), format="parquet", schema=ParquetRecordStore.schema())
+    condition = None
+    if start is not None:
+        condition = ds.field('timestamp') >= str(start)
+    if end is not None:
+        upper = ds.field('timestamp') < str(end)
+        condition = upper if condition is None else condition & upper
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+def main(argv=None):
+    import tomllib
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default=MIRROR_ROOT, help="mirror directory")
+    parser.add_argument("--secrets", default=os.path.join(".streamlit", "secrets.toml"),
+                        help="Streamlit secrets file holding google_service_account")
+    parser.add_argument("--rebuild", action="store_true", help="discard the mirror and sync from the first row")
+    args = parser.parse_args(argv)
+
+    with open(args.secrets, 'rb') as f:
+        connection = SheetConnection(dict(tomllib.load(f)['google_service_account']))
+    mirror = SheetMirror(connection, args.root)
+    if args.rebuild:
+        mirror.rebuild()
+    start = time.perf_counter()
+    added = mirror.sync()
+    print(f"[mirror] {added} rows added, {mirror.state()['synced_rows']} sheet rows mirrored "
+          f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
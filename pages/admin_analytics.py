@@ -0,0 +1,116 @@
+import streamlit as st
+import hmac
+import time
+from datetime import date, timedelta
+
+from mirror import MIRROR_ROOT, SheetMirror, load_frame
+from storage import RECORD_STORE, configured_sheet_connection, record_store_path
+
+# The app's record store: a Parquet store is read in place, the Google Sheet
+# through the incremental mirror
+ANALYTICS_ROOT = record_store_path(RECORD_STORE) if RECORD_STORE == "parquet" else MIRROR_ROOT
+ANALYTICS_COLUMNS = ['timestamp', 'location', 'conditions', 'risk_score', 'tb_risk_score', 'bmi', 'bmi_category']
+
+@st.cache_resource
+def get_sheet_mirror():
+    """One mirror per server process, sharing nothing with the submit path's connection"""
+    return SheetMirror(configured_sheet_connection(lambda: dict(st.secrets["google_service_account"])))
+
+@st.cache_data(show_spinner=False)
+def load_records(root, start, end, version):
+    """Mirrored records in [start, end); version changes whenever a sync adds rows"""
+    return load_frame(root, ANALYTICS_COLUMNS, start, end)
+
+st.set_page_config(page_title="Admin Analytics", page_icon="📊", layout="wide")
+st.title("📊 Submission Analytics")
+
+# ---------- ACCESS ----------
+admin_password = st.secrets.get("admin_password") if st.secrets.load_if_toml_exists() else None
+if not admin_password:
+    st.error("🔒 Analytics are disabled until an admin_password is set in the Streamlit secrets.")
+    st.stop()
+entered = st.text_input("🔑 Admin password", type="password")
+if not hmac.compare_digest(entered.encode(), str(admin_password).encode()):
+    st.stop()
+
+# ---------- SYNC ----------
+if RECORD_STORE == "sheets":
+    mirror = get_sheet_mirror()
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        sync_now = st.button("🔄 Sync from Google Sheets")
+    if sync_now or mirror.state()['synced_at'] is None:
+        with st.spinner("Fetching new rows..."):
+            try:
+                added = mirror.sync()
+                st.success(f"✅ {added} new rows mirrored")
+            except Exception as e:
+                st.error(f"⚠️ Sync failed: {str(e)}")
+    sync_state = mirror.state()
+    with col2:
+        st.write(f"**Rows mirrored:** {sync_state['synced_rows']} (last sync {sync_state['synced_at'] or 'never'})")
+    data_version = sync_state['synced_rows']
+elif RECORD_STORE == "parquet":
+    data_version = time.time() // 60  # the store is written in place; re-read at most once a minute
+else:
+    st.info(f"Analytics reads Parquet; the {RECORD_STORE} store is not supported here.")
+    st.stop()
+
+# ---------- FILTERS ----------
+col1, col2 = st.columns(2)
+with col1:
+    start_date = st.date_input("From", date.today() - timedelta(days=30))
+with col2:
+    end_date = st.date_input("To", date.today())
+
+load_start = time.perf_counter()
+records = load_records(ANALYTICS_ROOT, start_date.strftime("%Y-%m-%d"),
+                       (end_date + timedelta(days=1)).strftime("%Y-%m-%d"), data_version)
+if records.empty:
+    st.info("No submissions in this date range")
+    st.stop()
+
+from analytics import bmi_categories, condition_prevalence, daily_summary, risk_distribution
+
+locations = sorted(records['location'].dropna().unique())
+selected_locations = st.multiselect("📍 Locations", locations)
+if selected_locations:
+    records = records[records['location'].isin(selected_locations)]
+
+# ---------- OVERVIEW ----------
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Submissions", len(records))
+col2.metric("Locations", records['location'].nunique())
+col3.metric("Mean risk score", f"{records['risk_score'].mean():.1f}%")
+col4.metric("Mean BMI", f"{records['bmi'].mean():.1f}")
+
+st.subheader("📈 Daily Submissions")
+daily = daily_summary(records)
+st.line_chart(daily['submissions'])
+
+# ---------- CONDITIONS ----------
+st.subheader("🚨 Condition Prevalence")
+prevalence = condition_prevalence(records)
+st.bar_chart(prevalence.set_index('condition')['share'])
+with st.expander("By location"):
+    st.dataframe(condition_prevalence(records, by='location'), hide_index=True)
+
+# ---------- RISK ----------
+st.subheader("⚠️ Risk Score Distribution")
+col1, col2 = st.columns(2)
+with col1:
+    st.write("**Overall risk score**")
+    st.bar_chart(risk_distribution(records, 'risk_score'))
+with col2:
+    st.write("**TB risk score**")
+    st.bar_chart(risk_distribution(records, 'tb_risk_score'))
+with st.expander("Risk bands by location"):
+    st.dataframe(risk_distribution(records, 'risk_score', by='location'))
+
+# ---------- BMI ----------
+st.subheader("⚖ BMI Categories")
+st.dataframe(bmi_categories(records, by=('location',)))
+with st.expander("By location and date"):
+    st.dataframe(bmi_categories(records))
+
+st.caption(f"Computed in {(time.perf_counter() - load_start) * 1000:.0f} ms")
@@ -0,0 +1,716 @@
+"""Random Forest disease predictor and its saved model artifact
+
+scikit-learn and pandas are imported inside the methods that need them so
+that importing this module stays cheap.
+"""
+import os
+import sys
+import pickle
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+import numpy as np
+
+from catalog import CATALOG, SYMPTOM_CATEGORIES
+from storage import parse_flag, parse_number
+
+logger = logging.getLogger(__name__)
+
+# ---------- MACHINE LEARNING MODEL SETUP ----------
+# Bump MODEL_VERSION whenever the training data recipe changes so that
+# previously saved artifacts are treated as stale and retrained.
+MODEL_VERSION = 1
+MODEL_ARTIFACT_PATH = os.path.join("models", "symptom_predictor.pkl")
+
+SYMPTOM_FEATURES = [
+    'Fever', 'Cough', 'Shortness_of_breath', 'Chest_pain', 'Fatigue',
+    'Headache', 'Muscle_pain', 'Loss_of_appetite', 'Weight_loss',
+    'Night_sweats', 'Chills', 'Nausea', 'Diarrhea', 'Abdominal_pain',
+    'Joint_pain', 'Rash', 'Sore_throat', 'Runny_nose', 'Wheezing',
+    'Cough_blood', 'Persistent_cough', 'Age', 'Smoking', 'Diabetes'
+]
+
+TRAINING_SAMPLES = 1000
+TRAINING_SEED = 42
+
+# Compact records (compact.py) store a disease as its position here
+DISEASES = ['Healthy', 'Viral_Fever', 'Tuberculosis', 'Dengue', 'Malaria',
+            'Typhoid', 'Respiratory_Infection', 'Gastroenteritis']
+
+MODEL_PARAMS = {
+    'n_estimators': 100,
+    'max_depth': 10,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+    'random_state': 42
+}
+
+def model_fingerprint():
+    """Hash of everything that determines the trained model"""
+    import sklearn
+    spec = {
+        'version': MODEL_VERSION,
+        'features': SYMPTOM_FEATURES,
+        'params': MODEL_PARAMS,
+        'samples': TRAINING_SAMPLES,
+        'seed': TRAINING_SEED,
+        'sklearn': sklearn.__version__
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+# UI symptom option -> model feature it switches on
+SYMPTOM_FEATURE_MAP = {
+    'Fever': 'Fever',
+    'Chills': 'Chills',
+    'Sweating': 'Chills',
+    'Increased body temperature': 'Fever',
+    'Intermittent fever': 'Fever',
+    'High fever (104°F+)': 'Fever',
+    'Mild fever (100-101°F)': 'Fever',
+    'Night sweats': 'Night_sweats',
+    'Morning fever': 'Fever',
+    'Fatigue': 'Fatigue',
+    'Headache': 'Headache',
+    'Nausea': 'Nausea',
+    'Vomiting': 'Nausea',
+    'Muscle pain': 'Muscle_pain',
+    'Joint pain': 'Joint_pain',
+    'Weakness': 'Fatigue',
+    'Dizziness': 'Headache',
+    'Loss of appetite': 'Loss_of_appetite',
+    'Body pain': 'Muscle_pain',
+    'Weight loss': 'Weight_loss',
+    'Chest pain': 'Chest_pain',
+    'Cough': 'Cough',
+    'Shortness of breath': 'Shortness_of_breath',
+    'Chest tightness': 'Chest_pain',
+    'Runny nose': 'Runny_nose',
+    'Sore throat': 'Sore_throat',
+    'Sneezing': 'Runny_nose',
+    'Wheezing': 'Wheezing',
+    'Loss of smell': 'Runny_nose',
+    'Loss of taste': 'Runny_nose',
+    'Persistent cough (3 weeks+)': 'Persistent_cough',
+    'Cough with blood': 'Cough_blood',
+    'Chest pain when breathing': 'Chest_pain',
+    'Breathlessness': 'Shortness_of_breath',
+    'Cough lasting more than 3 weeks': 'Persistent_cough',
+    'Coughing up blood': 'Cough_blood',
+    'Breathing difficulty': 'Shortness_of_breath',
+    'Diarrhea': 'Diarrhea',
+    'Abdominal pain': 'Abdominal_pain',
+    'Bloating': 'Abdominal_pain',
+    'Constipation': 'Abdominal_pain',
+    'Heartburn': 'Abdominal_pain',
+    'Blood in stool': 'Diarrhea',
+    'Difficulty swallowing': 'Sore_throat',
+    'Excessive thirst': 'Diabetes',
+    'Frequent urination': 'Diabetes',
+    'Abdominal cramps': 'Abdominal_pain',
+    'Rash': 'Rash',
+    'Itching': 'Rash',
+    'Yellow skin/eyes': 'Rash',
+    'Skin discoloration': 'Rash',
+    'Hives': 'Rash',
+    'Swelling': 'Rash',
+    'Easy bruising': 'Rash',
+    'Red spots on skin': 'Rash',
+    'Eye pain': 'Headache',
+    'Red eyes': 'Rash'
+}
+
+def record_symptoms(record):
+    """All symptoms of one record, from per-category lists or a comma-joined 'symptoms' field"""
+    symptoms = record.get('symptoms')
+    if symptoms is not None:
+        if isinstance(symptoms, str):
+            return [s.strip() for s in symptoms.split(',') if s.strip()]
+        return list(symptoms)
+    selected = []
+    for category in SYMPTOM_CATEGORIES:
+        selected.extend(record.get(category) or [])
+    return selected
+
+class FeatureEncoder:
+    """Maps UI symptom strings straight to feature column indices for one feature layout"""
+    def __init__(self, symptom_features, catalog=CATALOG):
+        self.symptom_features = list(symptom_features)
+        self.catalog = catalog
+        position = {name: i for i, name in enumerate(self.symptom_features)}
+        catalog.check_literals("feature map", [(symptom, catalog.categories) for symptom in SYMPTOM_FEATURE_MAP])
+        # column_of_id[symptom ID] is the feature column it switches on, or -1
+        self.column_of_id = np.full(len(catalog), -1)
+        for symptom_id, symptom in enumerate(catalog.names):
+            feature = SYMPTOM_FEATURE_MAP.get(symptom)
+            if feature in position:
+                self.column_of_id[symptom_id] = position[feature]
+        self.symptom_index = {
+            catalog.names[symptom_id]: int(column)
+            for symptom_id, column in enumerate(self.column_of_id) if column >= 0
+        }
+        self.age_index = position.get('Age')
+        self.smoking_index = position.get('Smoking')
+        self.diabetes_index = position.get('Diabetes')
+        self.binary_columns = np.array([i for i in range(len(self.symptom_features)) if i != self.age_index])
+        self.bit_weights = 2.0 ** np.arange(len(self.binary_columns))
+    
+    def encode(self, symptoms_dict, age, smoking, diabetes):
+        """Build the model input vector for one patient"""
+        input_features = np.zeros(len(self.symptom_features))
+        symptom_index = self.symptom_index
+        for symptoms_list in symptoms_dict.values():
+            for symptom in symptoms_list:
+                idx = symptom_index.get(symptom)
+                if idx is not None:
+                    input_features[idx] = 1
+        
+        # Demographic slots are written last so they override symptom aliases
+        # such as 'Excessive thirst' -> 'Diabetes'
+        if self.age_index is not None:
+            input_features[self.age_index] = min(age / 100, 1)  # Normalize age
+        if self.smoking_index is not None:
+            input_features[self.smoking_index] = 1 if smoking else 0
+        if self.diabetes_index is not None:
+            input_features[self.diabetes_index] = 1 if diabetes else 0
+        return input_features
+    
+    def pack(self, input_features):
+        """The binary columns of an encoded vector as one integer (bit i = column i)"""
+        return int(input_features[self.binary_columns] @ self.bit_weights)
+    
+    def encode_batch(self, records):
+        """Build the model input matrix for many records in one go
+
+        The matrix is float32, the dtype the forest evaluates in, so each row
+        scores the same as encode() for the same patient.
+        """
+        records = list(records)
+        rows, symptom_ids = [], []
+        ages = np.zeros(len(records))
+        smoking = np.zeros(len(records), dtype=bool)
+        diabetes = np.zeros(len(records), dtype=bool)
+        ids = self.catalog.ids
+        for i, record in enumerate(records):
+            for symptom in record_symptoms(record):
+                symptom_id = ids.get(symptom)
+                if symptom_id is not None:
+                    rows.append(i)
+                    symptom_ids.append(symptom_id)
+            ages[i] = parse_number(record.get('age', 0))
+            smoking[i] = parse_flag(record.get('smoking', False))
+            diabetes[i] = parse_flag(record.get('diabetes', False))
+        
+        X = np.zeros((len(records), len(self.symptom_features)), dtype=np.float32)
+        cols = self.column_of_id[np.array(symptom_ids, dtype=np.int64)]
+        mapped = cols >= 0
+        X[np.array(rows, dtype=np.int64)[mapped], cols[mapped]] = 1
+        if self.age_index is not None:
+            X[:, self.age_index] = np.minimum(ages / 100, 1)
+        if self.smoking_index is not None:
+            X[:, self.smoking_index] = smoking
+        if self.diabetes_index is not None:
+            X[:, self.diabetes_index] = diabetes
+        return X
+
+def label_symptom_patterns(X):
+    """Label each row of a symptom matrix with the first disease pattern it matches"""
+    f = {name: X[:, i] == 1 for i, name in enumerate(SYMPTOM_FEATURES)}
+    # Patterns are checked in priority order; np.select picks the first match per row
+    patterns = [
+        ('Tuberculosis', f['Night_sweats'] & f['Weight_loss'] & f['Persistent_cough']),
+        ('Dengue', f['Fever'] & f['Headache'] & f['Rash']),
+        ('Malaria', f['Fever'] & f['Chills'] & ~f['Cough']),
+        ('Typhoid', f['Fever'] & f['Loss_of_appetite'] & f['Abdominal_pain']),
+        ('Viral_Fever', f['Fever'] & f['Fatigue'] & f['Headache']),
+        ('Respiratory_Infection', f['Cough'] & f['Shortness_of_breath'] & f['Chest_pain']),
+        ('Gastroenteritis', f['Diarrhea'] & f['Abdominal_pain'] & f['Nausea'])
+    ]
+    return np.select([mask for _, mask in patterns], [name for name, _ in patterns], default='Healthy')
+
+def generate_training_chunks(n_samples=TRAINING_SAMPLES, seed=TRAINING_SEED, chunk_size=100_000):
+    """Yield (X, labels) chunks of synthetic training data in bounded memory
+
+    The random stream is the same however it is chunked, so the concatenated
+    chunks equal a single call with chunk_size >= n_samples.
+    """
+    rng = np.random.RandomState(seed)
+    for start in range(0, n_samples, chunk_size):
+        X = rng.randint(0, 2, (min(chunk_size, n_samples - start), len(SYMPTOM_FEATURES)))
+        yield X, label_symptom_patterns(X)
+
+# ---------- FLATTENED FOREST ----------
+# "flat" evaluates the forest with FlatForest, "sklearn" with predict_proba
+FOREST_ENGINE = os.environ.get("FOREST_ENGINE", "flat")
+# Beyond this many rows predict_proba's compiled traversal is faster
+FLAT_FOREST_MAX_ROWS = 256
+
+def tree_probabilities(tree):
+    """Class probabilities of every node, computed as DecisionTreeClassifier.predict_proba does"""
+    import sklearn
+    value = tree.value[:, 0, :]
+    # scikit-learn >= 1.4 stores fractions and returns them as they are; before, it stored counts and normalized
+    if tuple(int(part) for part in sklearn.__version__.split(".")[:2]) >= (1, 4):
+        return value
+    normalizer = value.sum(axis=1, keepdims=True)
+    normalizer[normalizer == 0.0] = 1.0
+    return value / normalizer
+
+class FlatForest:
+    """A fitted RandomForestClassifier flattened into contiguous node arrays
+
+    All trees are walked together, one level per step, so scoring a row is a
+    few dozen NumPy operations instead of predict_proba's per-call validation
+    and per-tree dispatch. Leaves point to themselves, so rows that reach a
+    leaf early simply stay there. Probabilities match predict_proba to float
+    rounding.
+    
+    Positions are 2 * node + went_right: feature and threshold are stored
+    twice per node and children holds positions, so each level is one lookup
+    per array. delta holds, per position, the change in class probabilities
+    from the node to the child it leads to (zero at leaves), which is what
+    contributions() adds up along each row's path.
+    """
+    def __init__(self, model):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        self.roots = 2 * offsets[:-1]
+        self.depth = max(tree.max_depth for tree in trees)
+        self.n_features = model.n_features_in_
+        feature, threshold, children, value = [], [], [], []
+        for offset, tree in zip(offsets, trees):
+            is_leaf = tree.children_left < 0
+            nodes = np.arange(tree.node_count) + offset
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+            children.append(np.column_stack([
+                np.where(is_leaf, nodes, tree.children_left + offset),
+                np.where(is_leaf, nodes, tree.children_right + offset)
+            ]).ravel())
+            value.append(tree_probabilities(tree))
+        self.feature = np.repeat(np.concatenate(feature), 2).astype(np.intp)
+        self.threshold = np.repeat(np.concatenate(threshold), 2)
+        self.children = 2 * np.concatenate(children).astype(np.intp)
+        self.value = np.repeat(np.concatenate(value), 2, axis=0)
+        self.delta = self.value[self.children] - self.value
+        self.model = model
+    
+    def apply(self, X):
+        """Leaf position reached in every tree, shape (rows, trees)"""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        feature, threshold, children = self.feature, self.threshold, self.children
+        if len(X) == 1:
+            x = X[0]
+            positions = self.roots
+            for _ in range(self.depth):
+                positions = children[positions + (x[feature[positions]] > threshold[positions])]
+            return positions[np.newaxis, :]
+        x = X.ravel()
+        row_start = (np.arange(len(X)) * self.n_features)[:, np.newaxis]
+        positions = np.tile(self.roots, (len(X), 1))
+        for _ in range(self.depth):
+            positions = children[positions + (x[row_start + feature[positions]] > threshold[positions])]
+        return positions
+    
+    def predict_proba(self, X):
+        """Class probabilities for a 2-D array of rows, like RandomForestClassifier.predict_proba"""
+        # Summed tree by tree and then divided, in the same order as sklearn
+        return self.value[self.apply(X)].sum(axis=1) / len(self.roots)
+    
+    def contributions(self, X, classes=None):
+        """Decision-path feature contributions to one class per row
+
+        Every split a row passes credits its feature with the delta of the
+        branch taken, averaged over trees. classes holds each row's class
+        column (default: the most probable one). Returns (classes, bias,
+        contributions) with contributions shaped (rows, features), where
+        bias + contributions.sum(axis=1) equals that class's predict_proba.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        feature, threshold, children = self.feature, self.threshold, self.children
+        x = X.ravel()
+        row_start = (np.arange(len(X)) * self.n_features)[:, np.newaxis]
+        positions = np.tile(self.roots, (len(X), 1))
+        cells, taken = [], []
+        for _ in range(self.depth):
+            cells.append(row_start + feature[positions])
+            taken.append(positions + (x[cells[-1]] > threshold[positions]))
+            positions = children[taken[-1]]
+        if classes is None:
+            classes = self.value[positions].sum(axis=1).argmax(axis=1)
+        classes = np.asarray(classes, dtype=np.intp)
+        # One class per row, so every split is a scalar and a single bincount sums them
+        weights = self.delta[np.stack(taken), classes[:, np.newaxis]]
+        contributions = np.bincount(np.stack(cells).ravel(), weights.ravel(), minlength=len(X) * self.n_features)
+        bias = self.value[self.roots, :][:, classes].mean(axis=0)
+        return classes, bias, contributions.reshape(len(X), self.n_features) / len(self.roots)
+
+# ---------- PREDICTION CACHE ----------
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "4096"))
+
+class PredictionCache:
+    """Bounded LRU of predict() results keyed on (model version, packed symptom bits, age)
+
+    Inputs are 23 binary columns plus age, and traffic concentrates on a few
+    symptom combinations, so most submissions can skip the forest entirely.
+    Age is part of the key at the one-year resolution the form collects, which
+    keeps cached results identical to fresh ones.
+    """
+    def __init__(self, maxsize=PREDICTION_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self):
+        """Drop every entry, e.g. because a different model was loaded"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else None
+            }
+
+prediction_cache = PredictionCache()
+
+# ---------- FEATURE IMPORTANCE ----------
+class FeatureImportance(namedtuple('FeatureImportance', ['order', 'names', 'values'])):
+    """Features ranked by importance: column indices, names and importances, most important first"""
+    __slots__ = ()
+    
+    @classmethod
+    def from_model(cls, model, symptom_features):
+        importances = model.feature_importances_
+        order = np.argsort(-importances, kind='stable')
+        return cls(order, [symptom_features[i] for i in order], importances[order])
+    
+    def top(self, k):
+        """The k most important features as (column index, name, importance) tuples"""
+        return list(zip(self.order[:k].tolist(), self.names[:k], self.values[:k].tolist()))
+
+class SymptomPredictor:
+    def __init__(self):
+        from sklearn.preprocessing import LabelEncoder
+        self.model = None
+        self.label_encoder = LabelEncoder()
+        self.symptom_features = []
+        self.is_trained = False
+        self.accuracy = None
+        self.fingerprint = None
+        self.encoder = None
+        self.revision = 0  # incremented by every incremental retrain
+        self.checkpoint = None  # timestamp of the newest real record trained on
+        self.checkpoint_rows = []  # keys of the records at that timestamp already trained on
+        self._flat_forest = None
+        self._importance = None
+        
+    @property
+    def model_version(self):
+        """Identifies the fitted forest: training recipe plus incremental retrains"""
+        return f"{self.fingerprint}:{self.revision}"
+    
+    def predict_proba(self, X):
+        """Class probabilities from the configured forest engine"""
+        if FOREST_ENGINE != "flat" or len(X) > FLAT_FOREST_MAX_ROWS:
+            return self.model.predict_proba(X)
+        return self.flat_forest.predict_proba(X)
+    
+    @property
+    def flat_forest(self):
+        """FlatForest of the fitted model, built once per model"""
+        flat = self._flat_forest
+        if flat is None or flat.model is not self.model:
+            flat = self._flat_forest = FlatForest(self.model)
+        return flat
+    
+    def prepare_training_data(self, n_samples=TRAINING_SAMPLES, seed=TRAINING_SEED):
+        """Create synthetic training data for demonstration"""
+        # This would normally come from your historical data
+        self.symptom_features = list(SYMPTOM_FEATURES)
+        
+        # No chunk at all for n_samples=0
+        X, y = next(generate_training_chunks(n_samples, seed, chunk_size=max(n_samples, 1)),
+                    (np.zeros((0, len(SYMPTOM_FEATURES)), dtype=int), np.array([], dtype=object)))
+        
+        self.X = X
+        self.y = self.label_encoder.fit_transform(y)
+        return X, self.y
+    
+    def train_model(self):
+        """Train the Random Forest model"""
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import accuracy_score
+        
+        X, y = self.prepare_training_data()
+        
+        # Split data
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=42, stratify=y
+        )
+        
+        # Train model
+        self.model = RandomForestClassifier(**MODEL_PARAMS)
+        
+        self.model.fit(X_train, y_train)
+        
+        # Evaluate
+        y_pred = self.model.predict(X_test)
+        accuracy = accuracy_score(y_test, y_pred)
+        
+        self.is_trained = True
+        self.accuracy = accuracy
+        self.encoder = FeatureEncoder(self.symptom_features)
+        self.fingerprint = model_fingerprint()
+        self.rank_features()
+        prediction_cache.invalidate()
+        return accuracy
+    
+    def save(self, path=MODEL_ARTIFACT_PATH):
+        """Write the fitted model, label encoder and feature order to disk"""
+        artifact = {
+            'version': MODEL_VERSION,
+            'fingerprint': self.fingerprint,
+            'model': self.model,
+            'label_encoder': self.label_encoder,
+            'symptom_features': self.symptom_features,
+            'accuracy': self.accuracy,
+            'revision': self.revision,
+            'checkpoint': self.checkpoint,
+            'checkpoint_rows': self.checkpoint_rows,
+            'importance': {'order': self.importance.order, 'values': self.importance.values},
+            'trained_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temp file first so a concurrent reader never sees a partial pickle
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path=MODEL_ARTIFACT_PATH):
+        """Load a saved artifact, or return None if it is missing or stale"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                artifact = pickle.load(f)
+        except Exception:
+            return None
+        if artifact.get('fingerprint') != model_fingerprint():
+            return None
+        
+        predictor = cls()
+        predictor.model = artifact['model']
+        predictor.label_encoder = artifact['label_encoder']
+        predictor.symptom_features = artifact['symptom_features']
+        predictor.accuracy = artifact.get('accuracy')
+        predictor.fingerprint = artifact['fingerprint']
+        predictor.revision = artifact.get('revision', 0)
+        predictor.checkpoint = artifact.get('checkpoint')
+        predictor.checkpoint_rows = artifact.get('checkpoint_rows', [])
+        predictor.encoder = FeatureEncoder(predictor.symptom_features)
+        importance = artifact.get('importance')
+        if importance is not None:
+            order = importance['order']
+            predictor._importance = (predictor.model, FeatureImportance(
+                order, [predictor.symptom_features[i] for i in order], importance['values']))
+        predictor.is_trained = True
+        prediction_cache.invalidate()
+        return predictor
+    
+    @classmethod
+    def load_or_train(cls, path=MODEL_ARTIFACT_PATH):
+        """Load the artifact at path, or train a model and save it there if it is missing or stale"""
+        predictor = cls.load(path)
+        if predictor is None:
+            predictor = cls()
+            predictor.train_model()
+            # A model that trained fine still serves when it cannot be written
+            try:
+                predictor.save(path)
+            except Exception as e:
+                logger.warning("Could not save the model artifact to %s: %s", path, e)
+        return predictor
+    
+    def predict(self, symptoms_dict, age, smoking, diabetes):
+        """Predict disease based on symptoms"""
+        if not self.is_trained:
+            self.train_model()
+        
+        # Encode symptoms and demographics with the precompiled encoder
+        input_features = self.encoder.encode(symptoms_dict, age, smoking, diabetes)
+        
+        age_value = input_features[self.encoder.age_index] if self.encoder.age_index is not None else 0.0
+        cache_key = (self.model_version, self.encoder.pack(input_features), float(age_value))
+        cached = prediction_cache.get(cache_key)
+        if cached is not None:
+            predicted_disease, top_3 = cached
+            return predicted_disease, list(top_3), input_features
+        
+        # Make prediction with a single pass over the forest
+        probabilities = self.predict_proba(input_features[np.newaxis, :])[0]
+        class_labels = self.label_encoder.classes_[self.model.classes_]
+        
+        predicted_disease = class_labels[np.argmax(probabilities)]
+        
+        # Get top 3 predictions
+        k = min(3, len(probabilities))
+        top_3_idx = np.argpartition(probabilities, -k)[-k:]
+        top_3_idx = top_3_idx[np.argsort(probabilities[top_3_idx])[::-1]]
+        top_3_diseases = class_labels[top_3_idx]
+        top_3_probs = probabilities[top_3_idx]
+        
+        top_3 = tuple(zip(top_3_diseases, top_3_probs))
+        prediction_cache.put(cache_key, (predicted_disease, top_3))
+        return predicted_disease, list(top_3), input_features
+    
+    def predict_batch(self, records, k=3):
+        """Predict diseases for many patients with one call into the forest
+
+        records is a DataFrame or an iterable of dicts with 'age', 'smoking',
+        'diabetes' and either per-category symptom lists (as in symptoms_dict)
+        or a comma-joined 'symptoms' string as stored in symptom_records.
+        Returns the primary labels, an (n, k) array of top-k labels and the
+        matching (n, k) probabilities.
+        """
+        if not self.is_trained:
+            self.train_model()
+        # A DataFrame can only exist if pandas is already imported
+        pandas = sys.modules.get('pandas')
+        if pandas is not None and isinstance(records, pandas.DataFrame):
+            records = records.to_dict('records')
+        X = self.encoder.encode_batch(records)
+        class_labels = self.label_encoder.classes_[self.model.classes_]
+        if len(X) == 0:
+            return class_labels[:0], class_labels[:0].reshape(0, k), np.zeros((0, k))
+        
+        probabilities = self.predict_proba(X)
+        k = min(k, probabilities.shape[1])
+        top_idx = np.argpartition(probabilities, -k, axis=1)[:, -k:]
+        top_probs = np.take_along_axis(probabilities, top_idx, axis=1)
+        order = np.argsort(-top_probs, axis=1, kind='stable')
+        top_idx = np.take_along_axis(top_idx, order, axis=1)
+        top_probs = np.take_along_axis(top_probs, order, axis=1)
+        
+        return class_labels[top_idx[:, 0]], class_labels[top_idx], top_probs
+    
+    def explain(self, input_features, k=5):
+        """Features of this patient that raised the predicted disease most, from the forest's decision paths
+
+        Returns up to k (column index, name, contribution) tuples with positive
+        contributions, largest first; contributions are in probability units.
+        Only features the patient has (a symptom or flag that is set, and age)
+        are ranked: the absence of a symptom can also push the prediction up,
+        but it is not something the patient reported.
+        """
+        if not self.is_trained:
+            self.train_model()
+        features = np.asarray(input_features)
+        _, _, contributions = self.flat_forest.contributions(features[np.newaxis, :])
+        values = contributions[0]
+        present = features != 0
+        if self.encoder.age_index is not None:
+            present[self.encoder.age_index] = True
+        ranked = np.flatnonzero(present & (values > 0))
+        order = ranked[np.argsort(-values[ranked], kind='stable')][:k].tolist()
+        return [(i, self.symptom_features[i], float(values[i])) for i in order]
+    
+    def explain_batch(self, records):
+        """Decision-path contributions for many patients (records as in predict_batch)
+
+        Returns each row's predicted label, the forest's base probability of
+        that label and an (n, features) array of contributions to it, which
+        add up to the predicted probability together with the base.
+        """
+        if not self.is_trained:
+            self.train_model()
+        pandas = sys.modules.get('pandas')
+        if pandas is not None and isinstance(records, pandas.DataFrame):
+            records = records.to_dict('records')
+        X = self.encoder.encode_batch(records)
+        class_labels = self.label_encoder.classes_[self.model.classes_]
+        if len(X) == 0:
+            return class_labels[:0], np.zeros(0), np.zeros((0, len(self.symptom_features)))
+        classes, bias, contributions = self.flat_forest.contributions(X)
+        return class_labels[classes], bias, contributions
+    
+    def rank_features(self):
+        """Compute the importance view for the current model"""
+        self._importance = (self.model, FeatureImportance.from_model(self.model, self.symptom_features))
+    
+    @property
+    def importance(self):
+        """FeatureImportance of the fitted model, computed once per model"""
+        if self.model is None:
+            return None
+        if self._importance is None or self._importance[0] is not self.model:
+            self.rank_features()
+        return self._importance[1]
+    
+    def get_feature_importance(self):
+        """Get feature importance from the model"""
+        import pandas as pd
+        view = self.importance
+        if view is None:
+            return None
+        
+        importance_df = pd.DataFrame({'feature': view.names, 'importance': view.values}, index=view.order)
+        
+        return importance_df
+
+class ModelSlot:
+    """Holds the serving predictor so a retrained one can replace it while requests are in flight
+
+    Readers take `slot.current` once per request and keep using that object;
+    a swap is a single reference assignment, so readers never wait on it.
+    """
+    def __init__(self, predictor):
+        self._predictor = predictor
+        self._swap_lock = threading.Lock()
+    
+    @property
+    def current(self):
+        return self._predictor
+    
+    def swap(self, predictor, expected=None):
+        """Install a new predictor; with expected, only if it is still the current one"""
+        with self._swap_lock:
+            if expected is not None and self._predictor is not expected:
+                return False
+            self._predictor = predictor
+        prediction_cache.invalidate()
+        return True
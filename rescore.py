@@ -0,0 +1,186 @@
+"""Re-score the symptom_records history with the current rules and model
+
+Reads a CSV export of the sheet as a stream, rebuilds each row's inputs from
+the stored columns (decoding compact rows first) and re-scores chunks of rows
+across a process pool. Each finished chunk is written to its own part file in
+the output directory, so an interrupted run resumes by skipping the chunks
+that are already there.
+
+    python rescore.py symptom_records.csv rescored/ --workers 8 --format parquet
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas as pd
+
+from catalog import split_by_category
+from compact import decode_row, is_compact
+from predictor import MODEL_ARTIFACT_PATH, SymptomPredictor
+from rules import RuleEngine
+from storage import (MEDICAL_HISTORY_COLUMNS, format_conditions, format_ml_predictions,
+                     parse_flag, parse_number, row_to_record)
+
+OUTPUT_COLUMNS = ['row', 'timestamp', 'conditions', 'risk_factors', 'risk_score',
+                  'tb_risk_score', 'ml_prediction', 'ml_predictions']
+MANIFEST_NAME = "_rescore.json"
+
+_predictor = None
+_engine = None
+
+def _init_worker(model_path):
+    global _predictor, _engine
+    _predictor = SymptomPredictor.load(model_path)
+    if _predictor is None:
+        raise RuntimeError(f"No usable model artifact at {model_path}")
+    _engine = RuleEngine()
+
+def rebuild_inputs(record):
+    """enhanced_diagnose keyword arguments (plus smoking/diabetes for the model) from a stored record"""
+    symptoms = [s.strip() for s in str(record['symptoms']).split(',') if s.strip()]
+    inputs = split_by_category(symptoms)
+    age = parse_number(record['age'])
+    inputs['age'] = int(age) if age.is_integer() else age
+    inputs['medical_history'] = {column: parse_flag(record[column]) for column in MEDICAL_HISTORY_COLUMNS}
+    inputs['lifestyle'] = {
+        'smoking': parse_flag(record['smoking']),
+        'alcohol': parse_flag(record['alcohol']),
+        'exercise': record['exercise']
+    }
+    inputs['fever_pattern'] = record['fever_pattern']
+    inputs['recent_travel'] = parse_flag(record['recent_travel'])
+    inputs['tb_contact'] = parse_flag(record['tb_contact'])
+    inputs['smoking'] = inputs['lifestyle']['smoking']
+    inputs['diabetes'] = inputs['medical_history']['diabetes']
+    return inputs
+
+def rescore_rows(first_row, rows, predictor=None, engine=None):
+    """Re-score a list of stored rows (readable or compact); first_row is the sheet row number of rows[0]"""
+    predictor = predictor or _predictor
+    engine = engine or _engine
+    records = [row_to_record(decode_row(row) if is_compact(row) else row) for row in rows]
+    inputs = [rebuild_inputs(record) for record in records]
+    results = engine.evaluate_batch(engine.encode_batch(inputs))
+    primary, top_labels, top_probs = predictor.predict_batch(inputs)
+
+    output = []
+    for i, record in enumerate(records):
+        conditions, risk_factors, _, risk_score, tb_risk_score = engine.results_from_batch(results, i)
+        output.append([
+            first_row + i, record['timestamp'], format_conditions(conditions), ", ".join(risk_factors),
+            f"{risk_score:.1f}%", f"{tb_risk_score}%", str(primary[i]),
+            format_ml_predictions(zip(top_labels[i], top_probs[i]))
+        ])
+    return pd.DataFrame(output, columns=OUTPUT_COLUMNS)
+
+def _part_path(output_dir, chunk_index, fmt):
+    return os.path.join(output_dir, f"part-{chunk_index:06d}.{fmt}")
+
+def _score_chunk(chunk_index, first_row, rows, output_dir, fmt):
+    frame = rescore_rows(first_row, rows)
+    path = _part_path(output_dir, chunk_index, fmt)
+    tmp_path = f"{path}.tmp"
+    if fmt == 'parquet':
+        frame.to_parquet(tmp_path, index=False)
+    else:
+        frame.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return chunk_index, len(frame)
+
+def _check_manifest(output_dir, manifest, restart):
+    """Refuse to resume from parts written with different settings"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(path) and not restart:
+        with open(path) as f:
+            previous = json.load(f)
+        if previous != manifest:
+            raise SystemExit(f"{output_dir} holds parts from a different run ({previous}); use --restart")
+    elif restart:
+        for name in os.listdir(output_dir):
+            if name.startswith("part-"):
+                os.remove(os.path.join(output_dir, name))
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+def iter_chunks(path, chunk_size, header):
+    """Yield (chunk_index, first_row, rows) from a CSV export without loading it all"""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        first_row = 1
+        if header == 'auto':
+            first = next(reader, None)
+            if first is None:
+                return
+            # A header row has a non-numeric age cell
+            try:
+                float(first[2])
+                reader = itertools.chain([first], reader)
+            except (IndexError, ValueError):
+                first_row = 2
+        elif header == 'yes':
+            next(reader, None)
+            first_row = 2
+        for chunk_index in itertools.count():
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                return
+            yield chunk_index, first_row, rows
+            first_row += len(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="CSV export of symptom_records")
+    parser.add_argument("output_dir", help="directory for part files and the resume manifest")
+    parser.add_argument("--model", default=MODEL_ARTIFACT_PATH, help="model artifact to score with")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows per chunk")
+    parser.add_argument("--format", choices=['csv', 'parquet'], default='csv', help="part file format")
+    parser.add_argument("--header", choices=['auto', 'yes', 'no'], default='auto', help="whether the first row is a header")
+    parser.add_argument("--restart", action="store_true", help="discard existing parts instead of resuming")
+    args = parser.parse_args(argv)
+
+    # Make sure an up-to-date artifact exists before the workers load it
+    predictor = SymptomPredictor.load_or_train(args.model)
+    if SymptomPredictor.load(args.model) is None:
+        raise SystemExit(f"Could not save the model artifact to {args.model}, which the workers load")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest = {
+        'input': os.path.abspath(args.input),
+        'chunk_size': args.chunk_size,
+        'format': args.format,
+        'model': predictor.fingerprint
+    }
+    _check_manifest(args.output_dir, manifest, args.restart)
+
+    start = time.perf_counter()
+    done_rows = 0
+    skipped = 0
+    max_pending = max(args.workers, 1) * 2
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.model,)) as pool:
+        pending = set()
+        for chunk_index, first_row, rows in iter_chunks(args.input, args.chunk_size, args.header):
+            if os.path.exists(_part_path(args.output_dir, chunk_index, args.format)):
+                skipped += 1
+                continue
+            pending.add(pool.submit(_score_chunk, chunk_index, first_row, rows, args.output_dir, args.format))
+            # Keep a bounded number of chunks in flight so memory stays flat
+            if len(pending) >= max_pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done_rows += future.result()[1]
+                elapsed = time.perf_counter() - start
+                print(f"[rescore] {done_rows} rows re-scored, {done_rows / elapsed:.0f} rows/s", file=sys.stderr)
+        for future in pending:
+            done_rows += future.result()[1]
+
+    elapsed = time.perf_counter() - start
+    print(f"[rescore] done: {done_rows} rows in {elapsed:.1f}s, {skipped} chunks already complete", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Incremental retraining of the disease predictor from stored submissions
+
+Pulls the records stored since the model's checkpoint, encodes them with the
+model's feature layout and grows the forest with extra trees (warm_start)
+instead of refitting it. The candidate replaces the serving model only if it
+scores at least as well on a holdout set, and the swap never blocks requests.
+
+symptom_records has no confirmed-diagnosis column, so real records are
+labelled with the same symptom patterns as the synthetic training data; what
+they add is the real distribution of symptom combinations and ages.
+
+    python retrain.py --store sqlite --path data/records.db
+"""
+import argparse
+import copy
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from predictor import (MODEL_ARTIFACT_PATH, MODEL_PARAMS, ModelSlot, SymptomPredictor,
+                       label_symptom_patterns)
+from storage import RECORD_STORES, open_record_store, row_to_record, typed_row
+
+RETRAIN_MIN_ROWS = 50  # new records needed before a retrain is attempted
+RETRAIN_TREES = 20  # trees added per retrain
+MAX_FOREST_TREES = 300  # oldest trees are dropped beyond this
+HOLDOUT_EVERY = 5  # every n-th new record is held out for the check
+HOLDOUT_TOLERANCE = 0.01  # largest accuracy drop a candidate may show
+RETRAIN_INTERVAL = 3600  # seconds between background retrains
+
+def row_key(row):
+    """Key of a stored row, the same for every store it is read from"""
+    return hashlib.sha1(json.dumps(typed_row(row), default=str).encode()).hexdigest()
+
+def encode_records(predictor, rows):
+    """(X, encoded labels, newest timestamp) for stored rows, dropping labels the model does not know"""
+    records = [row_to_record(row) for row in rows]
+    X = predictor.encoder.encode_batch(records)
+    labels = label_symptom_patterns(X)
+    known = np.isin(labels, predictor.label_encoder.classes_)
+    newest = max(str(record['timestamp']) for record in records)
+    return X[known], predictor.label_encoder.transform(labels[known]), newest
+
+def synthetic_split():
+    """The synthetic train/test split train_model() uses
+
+    Models with the current fingerprint were trained on exactly this data, so
+    its label encoding matches theirs.
+    """
+    from sklearn.model_selection import train_test_split
+    X, y = SymptomPredictor().prepare_training_data()
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+def grow_forest(model, X, y, extra_trees=RETRAIN_TREES, max_trees=MAX_FOREST_TREES, seed=None):
+    """Copy of a fitted forest with extra_trees more trees fitted on (X, y)
+
+    Pass a different seed for every retrain: with a fixed one, every retrain
+    of a forest already at max_trees draws the same tree seeds again.
+    """
+    candidate = copy.deepcopy(model)
+    candidate.set_params(warm_start=True, n_estimators=len(candidate.estimators_) + extra_trees)
+    if seed is not None:
+        candidate.set_params(random_state=seed)
+    candidate.fit(X, y)
+    if len(candidate.estimators_) > max_trees:
+        candidate.estimators_ = candidate.estimators_[-max_trees:]
+    candidate.set_params(warm_start=False, n_estimators=len(candidate.estimators_))
+    return candidate
+
+def holdout_accuracy(model, X, y):
+    return float(np.mean(model.predict(X) == y)) if len(y) else None
+
+class Retrainer:
+    """Retrains the predictor in a slot from a record store, in the background or on demand"""
+    def __init__(self, slot, store, model_path=MODEL_ARTIFACT_PATH, min_rows=RETRAIN_MIN_ROWS,
+                 interval=RETRAIN_INTERVAL):
+        self.slot = slot
+        self.store = store
+        self.model_path = model_path
+        self.min_rows = min_rows
+        self.interval = interval
+        self.retrains = 0
+        self.rejected = 0
+        self.last_result = None
+        self.last_error = None
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def new_rows(self, predictor):
+        """Stored rows the predictor has not been trained on"""
+        rows = self.store.query(start=predictor.checkpoint)
+        if predictor.checkpoint is None:
+            return rows
+        # Timestamps have one-second resolution, so rows stored in the checkpoint's
+        # second after the last retrain read them are told apart by their keys
+        used = Counter(predictor.checkpoint_rows)
+        fresh = []
+        for row in rows:
+            if str(row_to_record(row)['timestamp']) == predictor.checkpoint:
+                key = row_key(row)
+                if used[key]:
+                    used[key] -= 1
+                    continue
+            fresh.append(row)
+        return fresh
+
+    def run_once(self):
+        """Retrain from new records and swap the result in if it passes; returns a summary dict"""
+        with self._run_lock:
+            current = self.slot.current
+            rows = self.new_rows(current)
+            if len(rows) < self.min_rows:
+                return {'status': 'waiting', 'new_rows': len(rows)}
+            start = time.perf_counter()
+            X_real, y_real, newest = encode_records(current, rows)
+            holdout = np.arange(len(y_real)) % HOLDOUT_EVERY == 0
+            X_train, X_test, y_train, y_test = synthetic_split()
+            # Synthetic rows keep every class present, which warm_start requires
+            X_fit = np.vstack([X_train, X_real[~holdout]]).astype(np.float32)
+            y_fit = np.concatenate([y_train, y_real[~holdout]])
+            X_check = np.vstack([X_test, X_real[holdout]]).astype(np.float32)
+            y_check = np.concatenate([y_test, y_real[holdout]])
+
+            revision = current.revision + 1
+            model = grow_forest(current.model, X_fit, y_fit, seed=MODEL_PARAMS['random_state'] + revision)
+            baseline = holdout_accuracy(current.model, X_check, y_check)
+            accuracy = holdout_accuracy(model, X_check, y_check)
+            result = {
+                'new_rows': len(rows), 'trees': len(model.estimators_), 'baseline_accuracy': baseline,
+                'accuracy': accuracy, 'fit_seconds': time.perf_counter() - start
+            }
+            if accuracy < baseline - HOLDOUT_TOLERANCE:
+                self.rejected += 1
+                result['status'] = 'rejected'
+                self.last_result = result
+                return result
+
+            candidate = SymptomPredictor()
+            candidate.model = model
+            candidate.label_encoder = current.label_encoder
+            candidate.symptom_features = current.symptom_features
+            candidate.encoder = current.encoder
+            candidate.fingerprint = current.fingerprint
+            candidate.accuracy = accuracy
+            candidate.revision = revision
+            candidate.checkpoint = newest
+            candidate.checkpoint_rows = [row_key(row) for row in rows
+                                         if str(row_to_record(row)['timestamp']) == newest]
+            if newest == current.checkpoint:
+                candidate.checkpoint_rows += current.checkpoint_rows
+            candidate.is_trained = True
+            # Built before the swap so the first request on the new model does not pay for it
+            candidate.flat_forest
+            if not self.slot.swap(candidate, expected=current):
+                # Another model went in meanwhile; it stays, and so does its artifact
+                result['status'] = 'superseded'
+                self.last_result = result
+                return result
+            self.retrains += 1
+            result['status'] = 'swapped'
+            result['revision'] = candidate.revision
+            self.last_result = result
+            # Only the serving model is saved
+            candidate.save(self.model_path)
+            return result
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+
+    def start(self):
+        """Retrain every `interval` seconds from a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-retrainer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--store", choices=[kind for kind in RECORD_STORES if kind != 'sheets'], default='sqlite',
+                        help="local record store to read")
+    parser.add_argument("--path", required=True, help="SQLite file or Parquet directory of the store")
+    parser.add_argument("--model", default=MODEL_ARTIFACT_PATH, help="model artifact to grow and overwrite")
+    parser.add_argument("--min-rows", type=int, default=RETRAIN_MIN_ROWS, help="new records needed to retrain")
+    args = parser.parse_args(argv)
+
+    predictor = SymptomPredictor.load_or_train(args.model)
+    store = open_record_store(args.store, **({'path': args.path} if args.store == 'sqlite' else {'root': args.path}))
+    result = Retrainer(ModelSlot(predictor), store, args.model, args.min_rows).run_once()
+    store.close()
+    print(f"[retrain] {result}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
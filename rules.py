@@ -0,0 +1,632 @@
+"""BMI calculation and the rule-based diagnosis engine
+
+Only the vectorized batch mode needs NumPy, so it is imported there.
+"""
+from catalog import CATALOG, SYMPTOM_CATEGORIES
+
+# ---------- BMI CALCULATION ----------
+def calculate_bmi(weight, height_cm):
+    height_m = height_cm / 100
+    bmi = weight / (height_m ** 2)
+    if bmi < 18.5:
+        category = "Underweight"
+    elif 18.5 <= bmi < 25:
+        category = "Normal"
+    elif 25 <= bmi < 30:
+        category = "Overweight"
+    else:
+        category = "Obese"
+    return bmi, category
+
+# ---------- ENHANCED DIAGNOSIS LOGIC ----------
+# The diagnosis rules are plain data. RuleEngine compiles them once into
+# integer symptom IDs and bitmasks so a patient is scored with a few ORs,
+# popcounts and comparisons. Clauses inside a rule are ANDed together:
+#   ('all', [(category, symptom), ...])        every symptom selected in its category
+#   ('count', symptoms, categories, n)         at least n of symptoms selected in any of categories
+#   ('min_len', category, n) / ('len_eq', category, n)   number of selections in a category
+#   ('fever_pattern', [patterns])              reported fever pattern is one of these
+#   ('exercise', [levels])                     reported exercise frequency is one of these
+#   ('history', key)                           medical_history flag is set
+#   ('any', [clause, ...])                     at least one sub-clause holds
+
+# (source, key, label) in the order risk factors are reported
+RISK_FACTOR_RULES = [
+    ('history', 'bp', "High Blood Pressure"),
+    ('history', 'diabetes', "Diabetes"),
+    ('history', 'heart', "Heart Disease History"),
+    ('history', 'smoking', "Smoking"),
+    ('history', 'alcohol', "Alcohol Use"),
+    ('history', 'hiv_immune', "Weakened Immune System"),
+    ('recent_travel', None, "Recent Travel"),
+    ('tb_contact', None, "Contact with TB Patient")
+]
+
+TB_RULES = {
+    'major_symptoms': ["Cough lasting more than 3 weeks", "Coughing up blood", "Night sweats", "Weight loss"],
+    'major_categories': ['tuberculosis'],
+    'major_points': [(2, 60), (1, 30)],  # (minimum major symptoms, points), first match wins
+    'minor_symptoms': ["Intermittent fever", "Loss of appetite", "Fatigue and weakness", "Chest pain", "Breathing difficulty"],
+    'minor_categories': ['tuberculosis', 'fever', 'basic', 'respiratory'],
+    'minor_points': 10,  # per minor symptom
+    'history_points': [('tb_history', 20), ('hiv_immune', 25), ('smoking', 10)],
+    'contact_points': 15,
+    'condition_score': 50,
+    'high_risk_score': 70,
+    'condition': ("Tuberculosis (TB) - Risk Score: {score}%", "Lungs and Respiratory System"),
+    'recommendations': [
+        "🚨 Get immediate Chest X-ray and Sputum test",
+        "Visit TB clinic for DOTS therapy",
+        "Wear mask to prevent infection spread"
+    ]
+}
+
+# Evaluated in order after the TB assessment. 'risk_level' is either a fixed
+# level or (level, high_if_clauses) to escalate to "High". Compact records
+# (compact.py) store fired rules by position, so add new rules at the end.
+DIAGNOSIS_RULES = [
+    {
+        'when': [('all', [('fever', "Fever")]), ('len_eq', 'fever', 1),
+                 ('count', ["Headache", "Body pain", "Fatigue"], ['basic'], 2)],
+        'condition': ("Normal Fever (Viral Fever)", "Immune System"),
+        'risk_level': "Low",
+        'recommendations': ["Rest, stay hydrated, and take paracetamol"]
+    },
+    {
+        'when': [('count', ["Fever", "Headache", "Body pain", "Fatigue", "Weakness"], ['fever', 'basic'], 4)],
+        'condition': ("Viral Fever", "Immune System"),
+        'risk_level': "Medium",
+        'recommendations': ["Get plenty of rest and fluids"]
+    },
+    {
+        'when': [('count', ["High fever (104°F+)", "Severe headache", "Eye pain", "Joint pain", "Muscle pain", "Red spots on skin"],
+                  ['fever', 'basic', 'skin'], 4)],
+        'condition': ("Dengue Fever", "Blood and Immune System"),
+        'risk_level': "High",
+        'risk_factors': ["Mosquito-borne infection"],
+        'recommendations': ["🚨 Get immediate blood test and consult doctor", "Monitor platelet count"]
+    },
+    {
+        'when': [('count', ["Intermittent fever", "Chills", "Sweating", "Headache", "Nausea", "Fatigue"], ['fever', 'basic'], 4),
+                 ('fever_pattern', ["Intermittent fever", "Low in morning/high in evening"])],
+        'condition': ("Malaria", "Blood and Liver"),
+        'risk_level': "High",
+        'risk_factors': ["Mosquito-borne infection"],
+        'recommendations': ["🚨 Get malaria blood test", "Start anti-malarial medications"]
+    },
+    {
+        'when': [('count', ["High fever (104°F+)", "Headache", "Weakness", "Abdominal pain", "Diarrhea or constipation", "Loss of appetite"],
+                  ['fever', 'basic', 'digestive'], 4)],
+        'condition': ("Typhoid Fever", "Digestive System and Blood"),
+        'risk_level': "High",
+        'risk_factors': ["Contaminated food/water"],
+        'recommendations': ["🚨 Get Widal test and start antibiotics", "Maintain proper hygiene"]
+    },
+    {
+        'when': [('all', [('basic', "Joint pain"), ('fever', "Fever"), ('skin', "Red spots on skin")])],
+        'condition': ("Chikungunya", "Joints and Immune System"),
+        'risk_level': "Medium",
+        'recommendations': ["Get physiotherapy for joint pain"]
+    },
+    {
+        'when': [('min_len', 'respiratory', 2), ('all', [('fever', "Fever"), ('respiratory', "Cough"), ('respiratory', "Shortness of breath")])],
+        'condition': ("Respiratory Infection (COVID-19/Influenza/Pneumonia)", "Respiratory System"),
+        'risk_level': "High"
+    },
+    {
+        'when': [('min_len', 'respiratory', 2), ('all', [('fever', "Fever"), ('respiratory', "Wheezing"), ('respiratory', "Shortness of breath")])],
+        'condition': ("Asthma/Bronchitis", "Respiratory System"),
+        'risk_level': "Medium"
+    },
+    {
+        'when': [('min_len', 'digestive', 3), ('all', [('fever', "Fever"), ('digestive', "Diarrhea"), ('digestive', "Abdominal pain")])],
+        'condition': ("Gastroenteritis", "Digestive System"),
+        'risk_level': "Medium"
+    },
+    {
+        'when': [('min_len', 'digestive', 3), ('all', [('fever', "Fever"), ('digestive', "Blood in stool")])],
+        'condition': ("Dysentery/Enteritis", "Digestive System"),
+        'risk_level': "High"
+    },
+    {
+        'when': [('all', [('skin', "Yellow skin/eyes"), ('fever', "Fever")])],
+        'condition': ("Hepatitis/Liver Infection", "Liver"),
+        'risk_level': "High"
+    },
+    {
+        'when': [('min_len', 'heart', 2)],
+        'condition': ("Cardiovascular Issue", "Heart/Circulatory System"),
+        'risk_level': "High"
+    },
+    {
+        'when': [('min_len', 'heart', 2), ('all', [('heart', "Chest pain/pressure")])],
+        'recommendations': ["🚨 Seek immediate medical attention for chest pain"]
+    },
+    {
+        'when': [('min_len', 'cancer', 2)],
+        'condition': ("Possible Cancer Indicators", "Multiple Systems"),
+        'risk_level': ("Medium", [('any', [('min_len', 'cancer', 3), ('history', 'cancer_history')])]),
+        'recommendations': ["Consult with oncologist for further evaluation"]
+    },
+    {
+        'when': [('exercise', ["Never", "Occasionally"]), ('history', 'bp')],
+        'risk_factors': ["Sedentary Lifestyle"],
+        'recommendations': ["Increase physical activity to 150 minutes per week"]
+    }
+]
+
+RISK_SCORE_RULES = {
+    'per_symptom': 4, 'symptom_cap': 40,
+    'per_year_of_age': 0.5, 'age_cap': 20,
+    'per_risk_factor': 5,
+    'smoking': 10, 'alcohol': 5,
+    'sedentary_levels': ["Never", "Occasionally"], 'sedentary': 5,
+    'per_fever_symptom': 3,
+    'tb_divisor': 2, 'tb_cap': 20,
+    'cap': 95
+}
+
+# Appended after scoring, in this order
+GENERAL_RECOMMENDATION_RULES = [
+    ('symptom', ('fever', "Fever"), ["Monitor temperature regularly", "Drink plenty of fluids"]),
+    ('tb_risk_score_min', 30, ["Visit health center for TB screening"]),
+    ('risk_score_above', 50, ["Schedule appointment with primary care physician"]),
+    ('symptom_count_above', 5, ["Consider comprehensive medical evaluation"])
+]
+
+def _popcount(x):
+    """Vectorized popcount for uint64 arrays"""
+    import numpy as np
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(x)
+    # NumPy < 2.0 has no bitwise_count
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+class RuleEngine:
+    """Diagnosis rules compiled to symptom bitmasks, for one patient or a batch"""
+    def __init__(self, diagnosis_rules=DIAGNOSIS_RULES, tb_rules=TB_RULES, catalog=CATALOG):
+        self.categories = list(SYMPTOM_CATEGORIES)
+        self.category_index = {c: i for i, c in enumerate(self.categories)}
+        self.catalog = catalog
+        # Rule literal -> bit. Only symptoms some rule mentions get a bit, so a
+        # category mask fits in a uint64 even though the catalog is larger.
+        self.symptom_ids = {}
+        self.literals = []  # (symptom, categories it is looked for in), for the catalog check
+        self.tb_rules = tb_rules
+        self.diagnosis_rules = diagnosis_rules
+
+        self.tb_major = self._count_clause(tb_rules['major_symptoms'], tb_rules['major_categories'], 0)
+        self.tb_minor = self._count_clause(tb_rules['minor_symptoms'], tb_rules['minor_categories'], 0)
+        self.compiled_rules = []
+        for rule in diagnosis_rules:
+            risk_level = rule.get('risk_level')
+            escalate = None
+            if isinstance(risk_level, tuple):
+                risk_level, high_if = risk_level
+                escalate = [self._compile(clause) for clause in high_if]
+            self.compiled_rules.append((
+                [self._compile(clause) for clause in rule['when']],
+                rule.get('condition'), risk_level, escalate,
+                rule.get('risk_factors', []), rule.get('recommendations', [])
+            ))
+        self.general_rules = []
+        for kind, arg, texts in GENERAL_RECOMMENDATION_RULES:
+            if kind == 'symptom':
+                arg = self._compile(('all', [arg]))
+            self.general_rules.append((kind, arg, texts))
+        self.fever = self.category_index['fever']
+        self.n_symptoms = len(self.symptom_ids)
+        catalog.check_literals("rules", self.literals)
+
+        # Scalar layout: every ('all', ...) clause of a rule folds into one mask
+        # over the packed category word, and every other clause becomes an
+        # "atom" bit computed once per patient, so each rule is two AND/compares
+        self.count_sets = []
+        self.count_atoms, self.min_len_atoms, self.len_eq_atoms, self.context_atoms = [], [], [], []
+        self.atom_keys = {}
+        self.scalar_rules = [
+            (self._scalar_check(when), condition, risk_level,
+             None if escalate is None else self._scalar_check(escalate), rule_risk_factors, rule_recommendations)
+            for when, condition, risk_level, escalate, rule_risk_factors, rule_recommendations in self.compiled_rules
+        ]
+        self.tb_major_set = self._count_set(self.tb_major[1])
+        self.tb_minor_set = self._count_set(self.tb_minor[1])
+        self.scalar_general = [
+            (kind, self._scalar_check([arg]) if kind == 'symptom' else arg, texts)
+            for kind, arg, texts in self.general_rules
+        ]
+
+    def _bit(self, symptom):
+        """Intern a symptom literal to its bit"""
+        if symptom not in self.symptom_ids:
+            self.symptom_ids[symptom] = len(self.symptom_ids)
+        return 1 << self.symptom_ids[symptom]
+
+    def _count_clause(self, symptoms, categories, threshold):
+        mask = 0
+        for symptom in symptoms:
+            mask |= self._bit(symptom)
+            self.literals.append((symptom, tuple(categories)))
+        return ('count', tuple(self.category_index[c] for c in categories), mask, threshold)
+
+    def _compile(self, clause):
+        kind = clause[0]
+        if kind == 'all':
+            required = {}
+            for category, symptom in clause[1]:
+                idx = self.category_index[category]
+                required[idx] = required.get(idx, 0) | self._bit(symptom)
+                self.literals.append((symptom, (category,)))
+            return ('all', tuple(required.items()))
+        if kind == 'count':
+            return self._count_clause(clause[1], clause[2], clause[3])
+        if kind in ('min_len', 'len_eq'):
+            return (kind, self.category_index[clause[1]], clause[2])
+        if kind in ('fever_pattern', 'exercise'):
+            return (kind, frozenset(clause[1]))
+        if kind == 'history':
+            return clause
+        if kind == 'any':
+            return ('any', [self._compile(c) for c in clause[1]])
+        raise ValueError(f"Unknown rule clause: {kind}")
+
+    # ----- single patient -----
+    def _count_set(self, indices):
+        """Index of the per-patient union mask for a set of categories"""
+        if indices not in self.count_sets:
+            self.count_sets.append(indices)
+        return self.count_sets.index(indices)
+
+    def _atom(self, clause):
+        """Bit for a non-symptom clause, shared by every rule that uses it"""
+        key = repr(clause)
+        if key not in self.atom_keys:
+            bit = 1 << len(self.atom_keys)
+            self.atom_keys[key] = bit
+            kind = clause[0]
+            if kind == 'count':
+                self.count_atoms.append((bit, self._count_set(clause[1]), clause[2], clause[3]))
+            elif kind == 'min_len':
+                self.min_len_atoms.append((bit, clause[1], clause[2]))
+            elif kind == 'len_eq':
+                self.len_eq_atoms.append((bit, clause[1], clause[2]))
+            else:
+                self.context_atoms.append((bit, self._closure(clause)))
+        return self.atom_keys[key]
+
+    def _scalar_check(self, clauses):
+        """(required symptom word, required atoms) for a conjunction of clauses"""
+        required_word = 0
+        required_atoms = 0
+        for clause in clauses:
+            if clause[0] == 'all':
+                for idx, mask in clause[1]:
+                    required_word |= mask << (idx * self.n_symptoms)
+            else:
+                required_atoms |= self._atom(clause)
+        return required_word, required_atoms
+
+    def _closure(self, clause):
+        """Predicate over (masks, lengths, ctx) for clauses that are not packed"""
+        kind = clause[0]
+        if kind == 'all':
+            pairs = clause[1]
+            return lambda m, l, c: all(m[idx] & required == required for idx, required in pairs)
+        if kind == 'count':
+            _, indices, mask, threshold = clause
+            return lambda m, l, c: (self._present(m, indices) & mask).bit_count() >= threshold
+        if kind == 'min_len':
+            _, idx, n = clause
+            return lambda m, l, c: l[idx] >= n
+        if kind == 'len_eq':
+            _, idx, n = clause
+            return lambda m, l, c: l[idx] == n
+        if kind == 'fever_pattern':
+            allowed = clause[1]
+            return lambda m, l, c: c['fever_pattern'] in allowed
+        if kind == 'exercise':
+            allowed = clause[1]
+            return lambda m, l, c: c['lifestyle'].get('exercise') in allowed
+        if kind == 'history':
+            key = clause[1]
+            return lambda m, l, c: bool(c['medical_history'].get(key))
+        if kind == 'any':
+            options = [self._closure(sub) for sub in clause[1]]
+            return lambda m, l, c: any(p(m, l, c) for p in options)
+        raise ValueError(f"Unknown rule clause: {kind}")
+
+    @staticmethod
+    def _present(masks, indices):
+        present = 0
+        for idx in indices:
+            present |= masks[idx]
+        return present
+
+    def encode(self, symptom_lists):
+        """Per-category bitmasks and selection counts for one patient"""
+        symptom_ids = self.symptom_ids
+        masks = []
+        for symptoms in symptom_lists:
+            mask = 0
+            for symptom in symptoms:
+                bit = symptom_ids.get(symptom)
+                if bit is not None:
+                    mask |= 1 << bit
+            masks.append(mask)
+        return masks, [len(symptoms) for symptoms in symptom_lists]
+
+    def evaluate(self, symptom_lists, age, medical_history, lifestyle, fever_pattern, recent_travel, tb_contact):
+        """Score one patient; symptom_lists follow SYMPTOM_CATEGORIES order"""
+        masks, lengths = self.encode(symptom_lists)
+        word = 0
+        shift = 0
+        for mask in masks:
+            word |= mask << shift
+            shift += self.n_symptoms
+        presents = []
+        for indices in self.count_sets:
+            present = 0
+            for idx in indices:
+                present |= masks[idx]
+            presents.append(present)
+        ctx = {'medical_history': medical_history, 'lifestyle': lifestyle, 'fever_pattern': fever_pattern}
+        atoms = 0
+        for bit, set_idx, mask, threshold in self.count_atoms:
+            if (presents[set_idx] & mask).bit_count() >= threshold:
+                atoms |= bit
+        for bit, idx, n in self.min_len_atoms:
+            if lengths[idx] >= n:
+                atoms |= bit
+        for bit, idx, n in self.len_eq_atoms:
+            if lengths[idx] == n:
+                atoms |= bit
+        for bit, predicate in self.context_atoms:
+            if predicate(masks, lengths, ctx):
+                atoms |= bit
+        conditions = []
+        risk_factors = []
+        recommendations = []
+
+        flags = {'recent_travel': recent_travel, 'tb_contact': tb_contact}
+        for source, key, label in RISK_FACTOR_RULES:
+            if (medical_history.get(key) if source == 'history' else flags[source]):
+                risk_factors.append(label)
+
+        # TB assessment
+        tb = self.tb_rules
+        tb_risk_score = 0
+        tb_major_count = (presents[self.tb_major_set] & self.tb_major[2]).bit_count()
+        for minimum, points in tb['major_points']:
+            if tb_major_count >= minimum:
+                tb_risk_score += points
+                break
+        tb_risk_score += (presents[self.tb_minor_set] & self.tb_minor[2]).bit_count() * tb['minor_points']
+        for key, points in tb['history_points']:
+            if medical_history.get(key):
+                tb_risk_score += points
+        if tb_contact:
+            tb_risk_score += tb['contact_points']
+        if tb_risk_score >= tb['condition_score']:
+            risk_level = "High" if tb_risk_score >= tb['high_risk_score'] else "Medium"
+            name, system = tb['condition']
+            conditions.append((name.format(score=tb_risk_score), system, risk_level))
+            recommendations.extend(tb['recommendations'])
+
+        for (required_word, required_atoms), condition, risk_level, escalate, rule_risk_factors, rule_recommendations in self.scalar_rules:
+            if word & required_word != required_word or atoms & required_atoms != required_atoms:
+                continue
+            if condition is not None:
+                level = risk_level
+                if escalate is not None and word & escalate[0] == escalate[0] and atoms & escalate[1] == escalate[1]:
+                    level = "High"
+                conditions.append((condition[0], condition[1], level))
+            risk_factors.extend(rule_risk_factors)
+            recommendations.extend(rule_recommendations)
+
+        # Calculate comprehensive risk score
+        r = RISK_SCORE_RULES
+        symptom_count = sum(lengths)
+        base_score = min(symptom_count * r['per_symptom'], r['symptom_cap'])
+        age_score = min(age * r['per_year_of_age'], r['age_cap'])
+        medical_score = len(risk_factors) * r['per_risk_factor']
+        lifestyle_score = 0
+        if lifestyle.get('smoking'): lifestyle_score += r['smoking']
+        if lifestyle.get('alcohol'): lifestyle_score += r['alcohol']
+        if lifestyle.get('exercise') in r['sedentary_levels']: lifestyle_score += r['sedentary']
+        fever_score = lengths[self.fever] * r['per_fever_symptom']
+        tb_score = min(tb_risk_score / r['tb_divisor'], r['tb_cap'])
+        risk_score = min(base_score + age_score + medical_score + lifestyle_score + fever_score + tb_score, r['cap'])
+
+        for kind, arg, texts in self.scalar_general:
+            if ((kind == 'symptom' and word & arg[0] == arg[0])
+                    or (kind == 'tb_risk_score_min' and tb_risk_score >= arg)
+                    or (kind == 'risk_score_above' and risk_score > arg)
+                    or (kind == 'symptom_count_above' and symptom_count > arg)):
+                recommendations.extend(texts)
+
+        return conditions, risk_factors, recommendations, risk_score, tb_risk_score
+
+    # ----- vectorized -----
+    def encode_batch(self, records):
+        """Pack many patients into arrays for evaluate_batch
+
+        Each record is a dict of enhanced_diagnose's keyword arguments:
+        the nine symptom lists plus age, medical_history, lifestyle,
+        fever_pattern, recent_travel and tb_contact.
+        """
+        import numpy as np
+        records = list(records)
+        n = len(records)
+        symptom_ids = self.symptom_ids
+        masks = np.zeros((len(self.categories), n), dtype=np.uint64)
+        lengths = np.zeros((len(self.categories), n), dtype=np.int64)
+        for j, record in enumerate(records):
+            for i, category in enumerate(self.categories):
+                symptoms = record.get(category) or []
+                lengths[i, j] = len(symptoms)
+                mask = 0
+                for symptom in symptoms:
+                    bit = symptom_ids.get(symptom)
+                    if bit is not None:
+                        mask |= 1 << bit
+                masks[i, j] = mask
+        history_keys = {key for source, key, _ in RISK_FACTOR_RULES if source == 'history'}
+        history_keys |= {key for key, _ in self.tb_rules['history_points']} | {'cancer_history'}
+        return {
+            'masks': masks,
+            'lengths': lengths,
+            'age': np.array([r.get('age', 0) for r in records], dtype=np.float64),
+            'medical_history': {
+                key: np.array([bool(r['medical_history'].get(key)) for r in records], dtype=bool)
+                for key in sorted(history_keys)
+            },
+            'smoking': np.array([bool(r['lifestyle'].get('smoking')) for r in records], dtype=bool),
+            'alcohol': np.array([bool(r['lifestyle'].get('alcohol')) for r in records], dtype=bool),
+            'exercise': np.array([str(r['lifestyle'].get('exercise')) for r in records], dtype=object),
+            'fever_pattern': np.array([str(r.get('fever_pattern')) for r in records], dtype=object),
+            'recent_travel': np.array([bool(r.get('recent_travel')) for r in records], dtype=bool),
+            'tb_contact': np.array([bool(r.get('tb_contact')) for r in records], dtype=bool)
+        }
+
+    def _holds_batch(self, clause, batch):
+        import numpy as np
+        kind = clause[0]
+        masks = batch['masks']
+        if kind == 'all':
+            result = np.ones(masks.shape[1], dtype=bool)
+            for idx, required in clause[1]:
+                required = np.uint64(required)
+                result &= (masks[idx] & required) == required
+            return result
+        if kind == 'count':
+            return self._count_batch(clause, masks) >= clause[3]
+        if kind == 'min_len':
+            return batch['lengths'][clause[1]] >= clause[2]
+        if kind == 'len_eq':
+            return batch['lengths'][clause[1]] == clause[2]
+        if kind == 'fever_pattern':
+            return np.isin(batch['fever_pattern'], list(clause[1]))
+        if kind == 'exercise':
+            return np.isin(batch['exercise'], list(clause[1]))
+        if kind == 'history':
+            return batch['medical_history'][clause[1]].copy()
+        if kind == 'any':
+            result = np.zeros(masks.shape[1], dtype=bool)
+            for c in clause[1]:
+                result |= self._holds_batch(c, batch)
+            return result
+
+    def _count_batch(self, clause, masks):
+        import numpy as np
+        present = np.bitwise_or.reduce(masks[list(clause[1])], axis=0)
+        return _popcount(present & np.uint64(clause[2])).astype(np.int64)
+
+    def evaluate_batch(self, batch):
+        """Score every patient in an encode_batch result in one NumPy pass
+
+        Returns arrays: 'fired' (N x rules), 'escalated' (N x rules),
+        'risk_factor_flags' (N x RISK_FACTOR_RULES), 'tb_risk_score',
+        'risk_score' and 'general' (N x GENERAL_RECOMMENDATION_RULES).
+        Use results_from_batch to turn a row back into enhanced_diagnose's output.
+        """
+        import numpy as np
+        n = batch['masks'].shape[1]
+        history = batch['medical_history']
+        flags = {'recent_travel': batch['recent_travel'], 'tb_contact': batch['tb_contact']}
+        risk_factor_flags = np.column_stack([
+            history[key] if source == 'history' else flags[source]
+            for source, key, _ in RISK_FACTOR_RULES
+        ]) if n else np.zeros((0, len(RISK_FACTOR_RULES)), dtype=bool)
+
+        tb = self.tb_rules
+        tb_major_count = self._count_batch(self.tb_major, batch['masks'])
+        major_points = np.zeros(n, dtype=np.int64)
+        for minimum, points in reversed(tb['major_points']):
+            major_points = np.where(tb_major_count >= minimum, points, major_points)
+        tb_risk_score = major_points + self._count_batch(self.tb_minor, batch['masks']) * tb['minor_points']
+        for key, points in tb['history_points']:
+            tb_risk_score += history[key] * points
+        tb_risk_score += batch['tb_contact'] * tb['contact_points']
+
+        fired = np.zeros((n, len(self.compiled_rules)), dtype=bool)
+        escalated = np.zeros((n, len(self.compiled_rules)), dtype=bool)
+        rule_risk_factors = np.zeros(n, dtype=np.int64)
+        for k, (when, condition, risk_level, escalate, rule_rf, _) in enumerate(self.compiled_rules):
+            holds = np.ones(n, dtype=bool)
+            for clause in when:
+                holds &= self._holds_batch(clause, batch)
+            fired[:, k] = holds
+            if escalate is not None:
+                high = np.ones(n, dtype=bool)
+                for clause in escalate:
+                    high &= self._holds_batch(clause, batch)
+                escalated[:, k] = holds & high
+            rule_risk_factors += holds * len(rule_rf)
+
+        r = RISK_SCORE_RULES
+        symptom_count = batch['lengths'].sum(axis=0)
+        base_score = np.minimum(symptom_count * r['per_symptom'], r['symptom_cap'])
+        age_score = np.minimum(batch['age'] * r['per_year_of_age'], r['age_cap'])
+        medical_score = (risk_factor_flags.sum(axis=1) + rule_risk_factors) * r['per_risk_factor']
+        lifestyle_score = (batch['smoking'] * r['smoking'] + batch['alcohol'] * r['alcohol']
+                           + np.isin(batch['exercise'], r['sedentary_levels']) * r['sedentary'])
+        fever_score = batch['lengths'][self.fever] * r['per_fever_symptom']
+        tb_score = np.minimum(tb_risk_score / r['tb_divisor'], r['tb_cap'])
+        risk_score = np.minimum(base_score + age_score + medical_score + lifestyle_score + fever_score + tb_score, r['cap'])
+
+        general = np.zeros((n, len(self.general_rules)), dtype=bool)
+        for k, (kind, arg, _) in enumerate(self.general_rules):
+            if kind == 'symptom':
+                general[:, k] = self._holds_batch(arg, batch)
+            elif kind == 'tb_risk_score_min':
+                general[:, k] = tb_risk_score >= arg
+            elif kind == 'risk_score_above':
+                general[:, k] = risk_score > arg
+            elif kind == 'symptom_count_above':
+                general[:, k] = symptom_count > arg
+
+        return {
+            'fired': fired,
+            'escalated': escalated,
+            'risk_factor_flags': risk_factor_flags,
+            'tb_risk_score': tb_risk_score,
+            'risk_score': risk_score,
+            'general': general
+        }
+
+    def results_from_batch(self, results, i):
+        """Rebuild enhanced_diagnose's return value for row i of evaluate_batch"""
+        tb = self.tb_rules
+        tb_risk_score = int(results['tb_risk_score'][i])
+        conditions = []
+        risk_factors = [label for (_, _, label), on in zip(RISK_FACTOR_RULES, results['risk_factor_flags'][i]) if on]
+        recommendations = []
+        if tb_risk_score >= tb['condition_score']:
+            risk_level = "High" if tb_risk_score >= tb['high_risk_score'] else "Medium"
+            name, system = tb['condition']
+            conditions.append((name.format(score=tb_risk_score), system, risk_level))
+            recommendations.extend(tb['recommendations'])
+        for k, (_, condition, risk_level, _, rule_rf, rule_recs) in enumerate(self.compiled_rules):
+            if not results['fired'][i, k]:
+                continue
+            if condition is not None:
+                level = "High" if results['escalated'][i, k] else risk_level
+                conditions.append((condition[0], condition[1], level))
+            risk_factors.extend(rule_rf)
+            recommendations.extend(rule_recs)
+        for k, (_, _, texts) in enumerate(self.general_rules):
+            if results['general'][i, k]:
+                recommendations.extend(texts)
+        risk_score = float(results['risk_score'][i])
+        return conditions, risk_factors, recommendations, risk_score, tb_risk_score
+
+rule_engine = RuleEngine()
+
+def enhanced_diagnose(fever, basic, respiratory, tuberculosis, digestive, skin, neurological, cancer, heart, age, medical_history, lifestyle, fever_pattern, recent_travel, tb_contact):
+    return rule_engine.evaluate(
+        [fever, basic, respiratory, tuberculosis, digestive, skin, neurological, cancer, heart],
+        age, medical_history, lifestyle, fever_pattern, recent_travel, tb_contact
+    )
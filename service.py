@@ -0,0 +1,341 @@
+"""Headless HTTP scoring service: rule diagnosis and model prediction without Streamlit
+
+Partner systems POST the same fields as the app's user_form and get back the
+conditions, risk scores and top-3 model predictions, and every scored
+submission is saved to the configured record store exactly as the app saves
+it. The predictor is loaded once per process. Scoring runs on a fixed pool of
+--workers threads. Up to --queue further requests may wait for a worker; any
+request beyond that is answered at once with 503 and Retry-After.
+
+    POST /score     one submission (JSON object) or a batch (JSON array)
+    GET  /health    model version, pool occupancy and rejected requests
+    GET  /metrics   stage latencies in the Prometheus text format
+
+A submission holds name, mobile, age, gender, weight, height, location, the
+medical history flags, "symptoms" (an object of lists keyed by category, or a
+flat list in any order, each symptom going to the first category offering
+it), symptom_duration, severity, fever_pattern, smoking, alcohol, exercise,
+recent_travel and tb_contact. Fields left out take the form's defaults. Runs
+entirely offline with --record-store sqlite or SHEETS_STUB=1:
+
+    python service.py --port 8080 --workers 4 --queue 32 --record-store sqlite
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from catalog import CATALOG, FORM_CHOICES, SYMPTOM_CATEGORIES, split_by_category
+from metrics import render_prometheus, timed
+from predictor import MODEL_ARTIFACT_PATH, SymptomPredictor
+from rules import RuleEngine, calculate_bmi
+from storage import (MEDICAL_HISTORY_COLUMNS, RECORD_STORE, configured_record_store, configured_sheet_connection,
+                     format_conditions, format_ml_predictions, make_record_row)
+
+SERVICE_WORKERS = int(os.environ.get("SERVICE_WORKERS", "4"))
+SERVICE_QUEUE = int(os.environ.get("SERVICE_QUEUE", "32"))
+MAX_BATCH = 500  # submissions per request
+MAX_BODY_BYTES = 2 * 2**20
+RETRY_AFTER = 1  # seconds suggested to clients turned away when the queue is full
+
+# (minimum, maximum) of the form's number inputs; the minimum is the default
+FORM_RANGES = {'age': (0, 120), 'weight': (1, 300), 'height': (50, 250)}
+FLAG_FIELDS = MEDICAL_HISTORY_COLUMNS + ['alcohol', 'recent_travel', 'tb_contact']
+
+class InvalidSubmission(ValueError):
+    """A submission the form itself would not have allowed"""
+
+def _symptom_list(value, field):
+    if isinstance(value, str):
+        value = [s.strip() for s in value.split(",") if s.strip()]
+    if not isinstance(value, list) or not all(isinstance(s, str) for s in value):
+        raise InvalidSubmission(f"{field} must be a list of symptom names")
+    # The form's multiselects hold each symptom once
+    return list(dict.fromkeys(value))
+
+def parse_submission(payload):
+    """Validated form values from one JSON submission, with the form's defaults filled in"""
+    if not isinstance(payload, dict):
+        raise InvalidSubmission("each submission must be a JSON object")
+    form = {}
+    for field in ('name', 'mobile', 'location'):
+        value = payload.get(field, "")
+        if not isinstance(value, str):
+            raise InvalidSubmission(f"{field} must be a string")
+        form[field] = value.strip()
+    if not form['name'] or not form['mobile']:
+        raise InvalidSubmission("name and mobile are required")
+    for field, (low, high) in FORM_RANGES.items():
+        value = payload.get(field, low)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+            raise InvalidSubmission(f"{field} must be a number from {low} to {high}")
+        form[field] = value
+    for field, choices in FORM_CHOICES.items():
+        value = payload.get(field, choices[0])
+        if value not in choices:
+            raise InvalidSubmission(f"{field} must be one of {choices}")
+        form[field] = value
+    for field in FLAG_FIELDS:
+        value = payload.get(field, False)
+        if not isinstance(value, bool):
+            raise InvalidSubmission(f"{field} must be true or false")
+        form[field] = value
+
+    # 'heart' is both a history flag and a symptom category, so symptoms have a field of their own
+    symptoms = payload.get('symptoms', [])
+    if isinstance(symptoms, dict):
+        if set(symptoms) - set(SYMPTOM_CATEGORIES):
+            raise InvalidSubmission(f"symptom categories are {SYMPTOM_CATEGORIES}")
+        selections = {category: _symptom_list(symptoms.get(category, []), f"symptoms.{category}")
+                      for category in SYMPTOM_CATEGORIES}
+    else:
+        symptoms = _symptom_list(symptoms, 'symptoms')
+        unknown = [s for s in symptoms if CATALOG.first_category(s) is None]
+        if unknown:
+            raise InvalidSubmission(f"unknown symptoms: {unknown}")
+        # split_by_category expects the stored column's category order
+        selections = split_by_category(sorted(symptoms, key=CATALOG.first_category))
+    for category, symptoms in selections.items():
+        unknown = [s for s in symptoms if not CATALOG.offers(category, s)]
+        if unknown:
+            raise InvalidSubmission(f"unknown {category} symptoms: {unknown}")
+    form['symptoms'] = selections
+    return form
+
+def diagnosis_inputs(form):
+    """RuleEngine.encode_batch / predict_batch record for one parsed submission (as rescore builds them)"""
+    inputs = dict(form['symptoms'])
+    inputs['age'] = form['age']
+    inputs['medical_history'] = {column: form[column] for column in MEDICAL_HISTORY_COLUMNS}
+    inputs['lifestyle'] = {'smoking': form['smoking'], 'alcohol': form['alcohol'], 'exercise': form['exercise']}
+    inputs['fever_pattern'] = form['fever_pattern']
+    inputs['recent_travel'] = form['recent_travel']
+    inputs['tb_contact'] = form['tb_contact']
+    inputs['smoking'] = form['smoking']
+    inputs['diabetes'] = form['diabetes']
+    return inputs
+
+def record_row(form, timestamp, diagnosis, top_predictions, bmi_value, bmi_category):
+    """symptom_records row for a scored submission, as the app's submit handler builds it"""
+    conditions, risk_factors, _, risk_score, tb_risk_score = diagnosis
+    all_symptoms = [s for category in SYMPTOM_CATEGORIES for s in form['symptoms'][category]]
+    return make_record_row(dict(
+        {column: form[column] for column in FLAG_FIELDS},
+        timestamp=timestamp, name=form['name'], age=form['age'], gender=form['gender'], mobile=form['mobile'],
+        location=form['location'], weight=form['weight'], height=form['height'],
+        symptoms=", ".join(all_symptoms), symptom_duration=form['symptom_duration'],
+        severity=form['severity'], fever_pattern=form['fever_pattern'], exercise=form['exercise'],
+        conditions=format_conditions(conditions), risk_factors=", ".join(risk_factors),
+        risk_score=f"{risk_score:.1f}%", tb_risk_score=f"{tb_risk_score}%",
+        ml_predictions=format_ml_predictions(top_predictions),
+        bmi=f"{bmi_value:.1f}", bmi_category=bmi_category
+    ))
+
+class ScoringService:
+    """Scores batches of parsed submissions on a bounded worker pool and saves them"""
+    def __init__(self, predictor, store, workers=SERVICE_WORKERS, queue=SERVICE_QUEUE):
+        self.predictor = predictor
+        self.store = store
+        self.engine = RuleEngine()
+        self.workers = workers
+        self.queue = queue
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="score")
+        # Admits one request per worker plus `queue` waiting; the rest are rejected
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(self, forms):
+        """Future for score(forms), or None if the pool and its queue are full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return None
+        with self._lock:
+            self.admitted += 1
+        future = self._pool.submit(self.score, forms)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self.completed += 1
+        self._slots.release()
+
+    def score(self, forms):
+        """Rule diagnosis and top-3 predictions for each submission, saved to the record store"""
+        with timed("service_score"):
+            inputs = [diagnosis_inputs(form) for form in forms]
+            results = self.engine.evaluate_batch(self.engine.encode_batch(inputs))
+            primary, top_labels, top_probs = self.predictor.predict_batch(inputs)
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = []
+        responses = []
+        for i, form in enumerate(forms):
+            diagnosis = self.engine.results_from_batch(results, i)
+            conditions, risk_factors, recommendations, risk_score, tb_risk_score = diagnosis
+            top_predictions = [(str(label), float(prob)) for label, prob in zip(top_labels[i], top_probs[i])]
+            bmi_value, bmi_category = calculate_bmi(form['weight'], form['height'])
+            rows.append(record_row(form, timestamp, diagnosis, top_predictions, bmi_value, bmi_category))
+            responses.append({
+                'conditions': [{'condition': c, 'system': s, 'risk_level': r} for c, s, r in conditions],
+                'risk_factors': risk_factors,
+                'recommendations': recommendations,
+                'risk_score': round(risk_score, 1),
+                'tb_risk_score': tb_risk_score,
+                'bmi': round(bmi_value, 1),
+                'bmi_category': bmi_category,
+                'prediction': str(primary[i]),
+                'top_predictions': [{'disease': d, 'probability': p} for d, p in top_predictions]
+            })
+        with timed("service_persist"):
+            self.store.append_many(rows)
+        return responses
+
+    def health(self):
+        with self._lock:
+            in_pool = self.admitted - self.completed
+            return {
+                'model_version': self.predictor.model_version,
+                'workers': self.workers,
+                'queue': self.queue,
+                'busy': min(in_pool, self.workers),
+                'queued': max(in_pool - self.workers, 0),
+                'completed': self.completed,
+                'rejected': self.rejected
+            }
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self.store.flush()
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status, body, content_type="application/json", headers=()):
+        data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, self.server.service.health())
+        elif self.path == "/metrics":
+            self._send(200, render_prometheus(), "text/plain; version=0.0.4")
+        else:
+            self._send(404, {'error': "not found"})
+
+    def do_POST(self):
+        if self.path != "/score":
+            self._send(404, {'error': "not found"})
+            return
+        length = self.headers.get("Content-Length", "")
+        if not (length.isascii() and length.isdigit()):
+            # Without a valid length the body cannot be read, so the connection cannot be reused
+            self.close_connection = True
+            self._send(400, {'error': "Content-Length must be a non-negative integer"})
+            return
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send(413, {'error': f"body larger than {MAX_BODY_BYTES} bytes"})
+            return
+        try:
+            payload = json.loads(self.rfile.read(length))
+        except ValueError:
+            self._send(400, {'error': "body is not valid JSON"})
+            return
+        batch = isinstance(payload, list)
+        payloads = payload if batch else [payload]
+        if not payloads or len(payloads) > MAX_BATCH:
+            self._send(400, {'error': f"a batch holds 1 to {MAX_BATCH} submissions"})
+            return
+        try:
+            forms = [parse_submission(p) for p in payloads]
+        except InvalidSubmission as e:
+            self._send(400, {'error': str(e)})
+            return
+
+        future = self.server.service.submit(forms)
+        if future is None:
+            self._send(503, {'error': "scoring queue is full, retry later"},
+                       headers=[("Retry-After", str(RETRY_AFTER))])
+            return
+        try:
+            results = future.result()
+        except Exception as e:
+            self._send(500, {'error': f"scoring failed: {e}"})
+            return
+        self._send(200, {'results': results} if batch else results[0])
+
+    def log_message(self, *args):
+        pass
+
+def make_server(service, host="127.0.0.1", port=8080):
+    """HTTP server bound to (host, port) answering with `service`; port 0 picks a free one"""
+    server = ThreadingHTTPServer((host, port), ScoringHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def open_store(kind, path=None, secrets_path=None):
+    """The record store app.py would use for the same settings"""
+    if kind != "sheets":
+        return configured_record_store(kind, path)
+
+    def load_credentials():
+        import tomllib
+        with open(secrets_path, 'rb') as f:
+            return dict(tomllib.load(f)['google_service_account'])
+
+    return configured_record_store(kind, connection=configured_sheet_connection(load_credentials))
+
+def load_predictor(path=MODEL_ARTIFACT_PATH):
+    """Load the model artifact, training and saving it if it is missing or stale"""
+    return SymptomPredictor.load_or_train(path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on")
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="scoring threads")
+    parser.add_argument("--queue", type=int, default=SERVICE_QUEUE, help="requests that may wait for a worker")
+    parser.add_argument("--model", default=MODEL_ARTIFACT_PATH, help="model artifact to score with")
+    parser.add_argument("--record-store", default=RECORD_STORE, choices=['sheets', 'sqlite', 'parquet'],
+                        help="where scored submissions are saved")
+    parser.add_argument("--record-store-path", default=os.environ.get("RECORD_STORE_PATH"),
+                        help="SQLite file or Parquet directory for the local stores")
+    parser.add_argument("--secrets", default=os.path.join(".streamlit", "secrets.toml"),
+                        help="Streamlit secrets file holding google_service_account")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    service = ScoringService(load_predictor(args.model),
+                             open_store(args.record_store, args.record_store_path, args.secrets),
+                             args.workers, args.queue)
+    server = make_server(service, args.host, args.port)
+    print(f"[service] model {service.predictor.model_version} loaded in {time.perf_counter() - start:.1f}s; "
+          f"listening on http://{args.host}:{server.server_address[1]} "
+          f"({args.workers} workers, queue {args.queue}, {args.record_store} store)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == "__main__":
+    main()
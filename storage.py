@@ -0,0 +1,974 @@
+"""Persistence for symptom_records: the row layout, Google Sheets and local record stores
+
+gspread and oauth2client are only imported when a connection is first made,
+pyarrow only when a Parquet store is first written or read.
+"""
+import os
+import json
+import random
+import threading
+import time
+import sqlite3
+from datetime import datetime, timedelta
+
+from metrics import count, observe, timed
+
+# ---------- RECORD LAYOUT ----------
+# Column order of every row appended by the submit handler
+RECORD_COLUMNS = [
+    'timestamp', 'name', 'age', 'gender', 'mobile', 'bp', 'diabetes', 'heart', 'thyroid',
+    'asthma', 'kidney', 'liver', 'cancer_history', 'tb_history', 'hiv_immune', 'location',
+    'weight', 'height', 'symptoms', 'symptom_duration', 'severity', 'fever_pattern',
+    'smoking', 'alcohol', 'exercise', 'recent_travel', 'tb_contact',
+    'conditions', 'risk_factors', 'risk_score', 'tb_risk_score', 'ml_predictions',
+    'bmi', 'bmi_category'
+]
+
+MEDICAL_HISTORY_COLUMNS = ['bp', 'diabetes', 'heart', 'thyroid', 'asthma', 'kidney', 'liver',
+                           'cancer_history', 'tb_history', 'hiv_immune', 'smoking']
+
+# Columns stored as booleans and as numbers by the local stores; the rest are text.
+# Scores lose their "%" suffix there ("41.5%" -> 41.5).
+BOOL_COLUMNS = ['bp', 'diabetes', 'heart', 'thyroid', 'asthma', 'kidney', 'liver', 'cancer_history',
+                'tb_history', 'hiv_immune', 'smoking', 'alcohol', 'recent_travel', 'tb_contact']
+NUMBER_COLUMNS = ['age', 'weight', 'height', 'risk_score', 'tb_risk_score', 'bmi']
+
+def parse_flag(value):
+    """Interpret checkbox values, including the TRUE/FALSE strings Sheets returns"""
+    if isinstance(value, str):
+        return value.strip().upper() in ('TRUE', 'YES', '1')
+    return bool(value) if value == value else False  # NaN counts as unset
+
+def parse_number(value):
+    """Interpret numeric cells, treating blanks as zero"""
+    try:
+        number = float(str(value).rstrip('%'))
+    except (TypeError, ValueError):
+        return 0.0
+    return number if number == number else 0.0
+
+def make_record_row(record):
+    """Row in RECORD_COLUMNS order from a dict keyed by column name"""
+    return [record[column] for column in RECORD_COLUMNS]
+
+def row_to_record(row):
+    """Map a stored row (list of cell values) to a dict keyed by RECORD_COLUMNS"""
+    row = list(row) + [''] * (len(RECORD_COLUMNS) - len(row))
+    return dict(zip(RECORD_COLUMNS, row))
+
+def typed_row(row):
+    """Row with boolean and numeric columns converted from their stored text"""
+    record = row_to_record(row)
+    for column in BOOL_COLUMNS:
+        record[column] = parse_flag(record[column])
+    for column in NUMBER_COLUMNS:
+        record[column] = parse_number(record[column])
+    for column in RECORD_COLUMNS:
+        if column not in BOOL_COLUMNS and column not in NUMBER_COLUMNS:
+            record[column] = "" if record[column] is None else str(record[column])
+    return make_record_row(record)
+
+def primary_prediction(row):
+    """Primary ML prediction of a stored row, from its 'Disease: 41.7%; ...' cell"""
+    predictions = row[RECORD_COLUMNS.index('ml_predictions')]
+    return str(predictions).split(";")[0].split(":")[0].strip()
+
+def timestamp_bound(value):
+    """Normalize a date, datetime or string to the stored timestamp format"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value.strftime("%Y-%m-%d 00:00:00")
+
+def format_conditions(conditions):
+    """Conditions cell: 'Name (Risk), ...'"""
+    return ", ".join(f"{cond} ({risk})" for cond, sys, risk in conditions)
+
+def format_ml_predictions(top_predictions):
+    """ML predictions cell: 'Disease: 42.0%; ...'"""
+    return "; ".join(f"{disease}: {prob:.1%}" for disease, prob in top_predictions)
+
+# ---------- GOOGLE SHEETS CONNECTION ----------
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+SHEET_NAME = "symptom_records"
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)  # refresh access tokens this long before expiry
+RECONNECT_INTERVAL = 10  # seconds to wait before retrying a failed connection
+
+# Sheets allows 60 write requests per minute per user; writes beyond the
+# bucket's burst wait for a token instead of drawing 429s
+WRITE_QUOTA_PER_MINUTE = 60
+WRITE_BURST = 10
+WRITE_METHODS = {'append_row', 'append_rows', 'update', 'batch_update'}
+CALL_ATTEMPTS = 4  # tries per call; the first retry may reconnect, later ones follow transient errors only
+RETRY_BASE_DELAY = 0.5  # seconds; backoff before retry n is uniform in [0, base * 2**n]
+RETRY_MAX_DELAY = 8.0
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+RECONNECT_STATUSES = {401}  # the authorization has lapsed; other 4xx answers leave the handle usable
+CIRCUIT_FAILURE_THRESHOLD = 5  # consecutive transient failures that open the circuit
+CIRCUIT_RESET_TIMEOUT = 60.0  # seconds the circuit stays open before a trial call
+
+class SheetsAPIError(Exception):
+    """Sheets API error carrying its HTTP status in `code`, like gspread's APIError"""
+    def __init__(self, code, message=None):
+        super().__init__(message or f"Sheets API error {code}")
+        self.code = code
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling Sheets while the circuit breaker is open"""
+
+def error_status(error):
+    """HTTP status of a Sheets API error, or None for errors without one"""
+    status = getattr(error, 'code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+def is_transient(error):
+    """Whether a failed Sheets call is worth retrying: quota (429), server (5xx) and network errors"""
+    status = error_status(error)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    return isinstance(error, (ConnectionError, TimeoutError, OSError))
+
+def needs_reconnect(error):
+    """Whether a failed Sheets call calls for a fresh connection: an auth error, or no answer from the API"""
+    status = error_status(error)
+    return status is None or status in RECONNECT_STATUSES
+
+def backoff_delay(retry, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """Jittered exponential backoff before retry number `retry` (0-based)"""
+    return random.uniform(0, min(cap, base * 2 ** retry))
+
+class TokenBucket:
+    """Allows `rate` operations per second with bursts of up to `capacity`, shared by every thread"""
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until it is due; returns the seconds waited"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Going negative reserves a future token, so waiters are served in arrival order
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay:
+            time.sleep(delay)
+        return delay
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; once `reset_timeout` has passed one trial call
+    is let through (half-open), and its outcome closes or re-opens the circuit"""
+    def __init__(self, threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT, name="sheets"):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go ahead now"""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half-open"
+                return True
+            allowed = self.state == "closed"
+        if not allowed:
+            count(f"{self.name}_circuit_rejected")
+        return allowed
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                count(f"{self.name}_circuit_closed")
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or (self.state == "closed" and self.failures >= self.threshold):
+                count(f"{self.name}_circuit_opened")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def retry_in(self):
+        """Seconds until the next trial call is allowed; 0 unless the circuit is open"""
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+class SheetConnection:
+    """Process-wide Google Sheets connection that authorizes once and reconnects after errors
+
+    Every call goes through the circuit breaker, writes also through the
+    token bucket, so all sessions of the server share one quota and back off together.
+    """
+    def __init__(self, service_account_info, sheet_name=SHEET_NAME, scope=SCOPE, open_worksheet=None,
+                 write_limiter=None, breaker=None, attempts=CALL_ATTEMPTS):
+        self.service_account_info = service_account_info
+        self.sheet_name = sheet_name
+        self.scope = scope
+        # Optional callable returning a worksheet, used instead of gspread (e.g. a LocalWorksheet)
+        self.open_worksheet = open_worksheet
+        self.write_limiter = write_limiter or TokenBucket(WRITE_QUOTA_PER_MINUTE / 60, WRITE_BURST)
+        self.breaker = breaker or CircuitBreaker()
+        self.attempts = attempts
+        self._lock = threading.Lock()
+        self._client = None
+        self._worksheet = None
+        self._last_attempt = 0.0
+        self._connect_failed = False
+        self.connected_at = None
+        self.connect_latency = None
+        self.last_latency = None
+        self.last_error = None
+        self.failures = 0
+    
+    def _connect(self):
+        """Authorize and open the worksheet, recording how long it took"""
+        self._last_attempt = time.monotonic()
+        start = time.perf_counter()
+        if self.open_worksheet is not None:
+            client, worksheet = None, self.open_worksheet()
+        else:
+            from oauth2client.service_account import ServiceAccountCredentials
+            import gspread
+            creds = ServiceAccountCredentials.from_json_keyfile_dict(self.service_account_info, self.scope)
+            client = gspread.authorize(creds)
+            worksheet = client.open(self.sheet_name).sheet1
+        self.connect_latency = time.perf_counter() - start
+        self._client = client
+        self._worksheet = worksheet
+        self.connected_at = datetime.now()
+        self.last_error = None
+    
+    def _refresh_token_if_needed(self):
+        """Refresh the access token shortly before it expires instead of on a failed request"""
+        # gspread >= 5 converts the credentials to google-auth ones on its
+        # http_client; older versions keep the oauth2client ones on the client
+        holder = getattr(self._client, 'http_client', None) or self._client
+        auth = getattr(holder, 'auth', None)
+        # google-auth calls it expiry, oauth2client token_expiry; both are naive UTC
+        expiry = getattr(auth, 'expiry', None) or getattr(auth, 'token_expiry', None)
+        if expiry is not None and expiry - datetime.utcnow() < TOKEN_REFRESH_MARGIN:
+            holder.login()
+    
+    def invalidate(self, error=None):
+        """Drop the current handle so the next call reconnects"""
+        with self._lock:
+            self._client = None
+            self._worksheet = None
+            if error is not None:
+                self.last_error = str(error)
+                self.failures += 1
+    
+    def worksheet(self):
+        """Return the cached worksheet handle, connecting or refreshing the token if needed"""
+        with self._lock:
+            if self._worksheet is None:
+                if self._connect_failed and time.monotonic() - self._last_attempt < RECONNECT_INTERVAL:
+                    raise ConnectionError(f"Google Sheets unavailable: {self.last_error}")
+                try:
+                    self._connect()
+                except Exception as e:
+                    self._connect_failed = True
+                    self.last_error = str(e)
+                    self.failures += 1
+                    raise
+                self._connect_failed = False
+            else:
+                self._refresh_token_if_needed()
+            return self._worksheet
+    
+    def call(self, method, *args, **kwargs):
+        """Run a worksheet method, reconnecting once if the cached handle has gone bad
+        and retrying transient errors with jittered exponential backoff
+
+        A write that failed with a 5xx or a timeout may still have been
+        applied, so a retried append can add its rows twice (at-least-once).
+        """
+        for attempt in range(self.attempts):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Google Sheets paused after repeated errors: {self.last_error}")
+            if method in WRITE_METHODS:
+                waited = self.write_limiter.acquire()
+                if waited:
+                    count("sheets_throttled")
+                    observe("sheets_throttle_wait", waited)
+            try:
+                worksheet = self.worksheet()
+            except Exception as e:
+                error = e  # recorded by worksheet()
+            else:
+                start = time.perf_counter()
+                try:
+                    result = getattr(worksheet, method)(*args, **kwargs)
+                except Exception as e:
+                    error = e
+                    if needs_reconnect(e):
+                        self.invalidate(e)
+                    else:
+                        # The API answered, so the handle is fine
+                        self.last_error = str(e)
+                        self.failures += 1
+                else:
+                    self.last_latency = time.perf_counter() - start
+                    self.breaker.record_success()
+                    return result
+            transient = is_transient(error)
+            # Only outages count against the circuit; a rejected request shows the API is up
+            if transient:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            count("sheets_call_failed")
+            # A rejected request (400, 403, ...) fails the same way when repeated
+            if attempt + 1 == self.attempts or not (transient or (attempt == 0 and needs_reconnect(error))):
+                raise error
+            count("sheets_retry")
+            if transient:
+                time.sleep(backoff_delay(attempt))
+    
+    def append_row(self, row):
+        return self.call('append_row', row)
+    
+    def append_rows(self, rows):
+        return self.call('append_rows', rows)
+    
+    def health(self):
+        """Summary of connection state for display"""
+        return {
+            'connected': self._worksheet is not None,
+            'connected_at': self.connected_at,
+            'connect_latency': self.connect_latency,
+            'last_latency': self.last_latency,
+            'last_error': self.last_error,
+            'failures': self.failures,
+            'circuit': self.breaker.state,
+            'circuit_retry_in': self.breaker.retry_in()
+        }
+
+# ---------- WRITE-BEHIND SHEET WRITER ----------
+SPOOL_PATH = os.path.join("data", "sheet_spool.db")
+WRITE_BATCH_SIZE = 50  # flush as soon as this many rows are waiting
+WRITE_FLUSH_INTERVAL = 5.0  # seconds between timed flushes
+WRITE_MAX_BACKOFF = 300.0  # longest wait between flushes while Sheets keeps failing
+SPOOL_CLAIM_TIMEOUT = 600.0  # seconds after which rows claimed by a writer that died are sent again
+
+class SheetWriter:
+    """Spools rows to a local SQLite file and appends them to the sheet in batches from a background thread
+
+    Rows stay in the spool until Sheets accepts them, so a crash or quota error
+    loses nothing and anything left over is replayed when the writer restarts.
+    Delivery is at-least-once: a batch whose append failed with a 5xx or a
+    timeout, or that was sent just before a crash, may already be in the
+    sheet, and its replay then adds those rows again. Such duplicates repeat
+    a row cell for cell, timestamp included.
+    While the connection's circuit is open the spool is the store of record:
+    submissions keep landing there and the writer waits for the trial call.
+    Several processes may share one spool (the app and the scoring service
+    both default to SPOOL_PATH): a flush claims its batch in one write
+    transaction before sending it, so no two writers send the same rows.
+    """
+    def __init__(self, connection, spool_path=SPOOL_PATH, batch_size=WRITE_BATCH_SIZE,
+                 flush_interval=WRITE_FLUSH_INTERVAL):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        directory = os.path.dirname(spool_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(spool_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, row TEXT NOT NULL, queued_at REAL NOT NULL, "
+            "claim TEXT, claimed_at REAL)"
+        )
+        # Spools written before claims existed
+        columns = {info[1] for info in self._db.execute("PRAGMA table_info(spool)")}
+        if 'claim' not in columns:
+            self._db.execute("ALTER TABLE spool ADD COLUMN claim TEXT")
+            self._db.execute("ALTER TABLE spool ADD COLUMN claimed_at REAL")
+        self._db_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._backoff = 0.0
+        self.rows_written = 0
+        self.last_flush_error = None
+        self._thread = threading.Thread(target=self._run, name="sheet-writer", daemon=True)
+        self._thread.start()
+    
+    def enqueue(self, row):
+        """Durably queue one row; returns once it is in the spool"""
+        self.enqueue_many([row])
+
+    def enqueue_many(self, rows):
+        """Durably queue several rows in one spool transaction"""
+        now = time.time()
+        payloads = [(json.dumps(row, default=str), now) for row in rows]
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany("INSERT INTO spool (row, queued_at) VALUES (?, ?)", payloads)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        if self.pending() >= self.batch_size:
+            self._wake.set()
+    
+    def pending(self):
+        """Number of rows waiting to be written to the sheet"""
+        with self._db_lock:
+            return self._db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+    
+    def _claim(self):
+        """Claim the next batch of unclaimed rows for this writer; returns its (token, rows)"""
+        token = f"{os.getpid()}-{threading.get_ident()}-{time.time_ns()}"
+        now = time.time()
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "UPDATE spool SET claim = ?, claimed_at = ? WHERE id IN ("
+                    "SELECT id FROM spool WHERE claim IS NULL OR claimed_at < ? ORDER BY id LIMIT ?)",
+                    (token, now, now - SPOOL_CLAIM_TIMEOUT, self.batch_size)
+                )
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            batch = self._db.execute("SELECT row FROM spool WHERE claim = ? ORDER BY id", (token,)).fetchall()
+        return token, [json.loads(row) for row, in batch]
+
+    def flush(self):
+        """Append every spooled row to the sheet in batches; returns the number written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                token, rows = self._claim()
+                if not rows:
+                    break
+                try:
+                    with timed("sheet_append_rows"):
+                        self.connection.append_rows(rows)
+                except BaseException:
+                    # Hand the rows back for the next flush, in this process or another
+                    with self._db_lock:
+                        self._db.execute("UPDATE spool SET claim = NULL WHERE claim = ?", (token,))
+                    raise
+                with self._db_lock:
+                    self._db.execute("DELETE FROM spool WHERE claim = ?", (token,))
+                written += len(rows)
+                self.rows_written += len(rows)
+        return written
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval + self._backoff)
+            self._wake.clear()
+            try:
+                self.flush()
+                self._backoff = 0.0
+                self.last_flush_error = None
+            except CircuitOpenError as e:
+                self.last_flush_error = str(e)
+                self._backoff = self.connection.breaker.retry_in()
+            except Exception as e:
+                # Leave the rows spooled and back off so quota errors can clear
+                self.last_flush_error = str(e)
+                self._backoff = min(max(self._backoff * 2, self.flush_interval), WRITE_MAX_BACKOFF)
+    
+    def close(self):
+        """Stop the background thread after a final flush attempt"""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        try:
+            self.flush()
+        except Exception as e:
+            self.last_flush_error = str(e)
+
+# ---------- LOCAL STAND-IN WORKSHEET ----------
+class LocalWorksheet:
+    """In-memory stand-in for a gspread worksheet, for benchmarks and offline runs
+
+    Implements the calls the app makes on a worksheet. An optional latency
+    (seconds per call) imitates the Sheets API round trip. Failures can be
+    injected: `errors` lists the HTTP statuses the next calls raise as
+    SheetsAPIError, in order (None lets a call through), and after that each
+    call fails with probability `error_rate`.
+    """
+    def __init__(self, rows=None, latency=0.0, errors=(), error_rate=0.0, seed=None):
+        self.rows = [list(row) for row in rows or []]
+        self.latency = latency
+        self.errors = list(errors)
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors_raised = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        with self._lock:
+            self.calls += 1
+            if self.errors:
+                status = self.errors.pop(0)
+            elif self.error_rate and self._random.random() < self.error_rate:
+                status = self._random.choice([429, 429, 500, 503])
+            else:
+                status = None
+            if status is not None:
+                self.errors_raised += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if status is not None:
+            raise SheetsAPIError(status)
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values], **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        self._round_trip()
+        with self._lock:
+            self.rows.extend(list(row) for row in values)
+
+    def get_all_values(self):
+        self._round_trip()
+        with self._lock:
+            return [list(row) for row in self.rows]
+
+    def get(self, range_name):
+        """Rows of an A1 range such as "A5:AH" or "A5:AH9" (columns are not sliced)"""
+        self._round_trip()
+        start, _, end = range_name.partition(":")
+        first = int(start.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ")) - 1
+        last = end.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+        with self._lock:
+            return [list(row) for row in self.rows[first:int(last) if last else None]]
+
+# ---------- RECORD STORES ----------
+class RecordStore:
+    """Where submissions are kept; rows are lists in RECORD_COLUMNS order
+
+    Date ranges are half-open: start is inclusive, end is exclusive. Both may
+    be dates, datetimes or "YYYY-MM-DD HH:MM:SS" strings.
+    """
+    def append(self, row):
+        self.append_many([row])
+
+    def append_many(self, rows):
+        raise NotImplementedError
+
+    def scan(self, batch_size=10_000):
+        """Yield every stored row, in batches (lists of rows)"""
+        raise NotImplementedError
+
+    def query(self, start=None, end=None, location=None, predicted_condition=None):
+        """Rows in a timestamp range, optionally for one location and/or predicted condition"""
+        start, end = timestamp_bound(start), timestamp_bound(end)
+        matches = []
+        for batch in self.scan():
+            for row in batch:
+                record = row_to_record(row)
+                if start is not None and str(record['timestamp']) < start:
+                    continue
+                if end is not None and str(record['timestamp']) >= end:
+                    continue
+                if location is not None and record['location'] != location:
+                    continue
+                if predicted_condition is not None and primary_prediction(row) != predicted_condition:
+                    continue
+                matches.append(row)
+        return matches
+
+    def flush(self):
+        """Make every appended row visible to scan() and query()"""
+
+    def close(self):
+        self.flush()
+
+class SheetsRecordStore(RecordStore):
+    """The symptom_records Google Sheet, written through the write-behind SheetWriter"""
+    def __init__(self, connection, writer):
+        self.connection = connection
+        self.writer = writer
+
+    def append_many(self, rows):
+        self.writer.enqueue_many(rows)
+
+    def scan(self, batch_size=10_000):
+        rows = self.connection.call('get_all_values')
+        # Skip a header row, recognised by a non-numeric age cell
+        if rows and not is_number(row_to_record(rows[0])['age']):
+            rows = rows[1:]
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+
+def is_number(value):
+    """Whether a cell holds a number (a "%" suffix allowed)"""
+    try:
+        float(str(value).rstrip('%'))
+    except ValueError:
+        return False
+    return True
+
+class SQLiteRecordStore(RecordStore):
+    """Local SQLite table with indexes on timestamp, location and predicted condition"""
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+        columns = ", ".join(
+            f"{c} INTEGER" if c in BOOL_COLUMNS else f"{c} REAL" if c in NUMBER_COLUMNS else f"{c} TEXT"
+            for c in RECORD_COLUMNS
+        )
+        with self._db:
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS records ({columns}, predicted_condition TEXT)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS records_timestamp ON records (timestamp)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS records_location ON records (location, timestamp)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS records_condition ON records (predicted_condition, timestamp)")
+        placeholders = ", ".join("?" * (len(RECORD_COLUMNS) + 1))
+        self._insert = f"INSERT INTO records ({', '.join(RECORD_COLUMNS)}, predicted_condition) VALUES ({placeholders})"
+        self._select = f"SELECT {', '.join(RECORD_COLUMNS)} FROM records"
+
+    def append_many(self, rows):
+        values = []
+        for row in rows:
+            row = typed_row(row)
+            values.append(row + [primary_prediction(row)])
+        with self._lock, self._db:
+            self._db.executemany(self._insert, values)
+
+    def _rows(self, cursor):
+        bool_idx = [RECORD_COLUMNS.index(c) for c in BOOL_COLUMNS]
+        for row in cursor:
+            row = list(row)
+            for i in bool_idx:
+                row[i] = bool(row[i])
+            yield row
+
+    def scan(self, batch_size=10_000):
+        # One keyset query per batch: memory stays at one batch and appends are not blocked in between
+        sql = f"SELECT rowid, {self._select[len('SELECT '):]} WHERE rowid > ? ORDER BY rowid LIMIT ?"
+        last = 0
+        while True:
+            with self._lock:
+                fetched = self._db.execute(sql, (last, batch_size)).fetchall()
+            if not fetched:
+                return
+            last = fetched[-1][0]
+            yield list(self._rows(row[1:] for row in fetched))
+
+    def query(self, start=None, end=None, location=None, predicted_condition=None):
+        clauses, params = [], []
+        for column, op, value in (('timestamp', '>=', timestamp_bound(start)), ('timestamp', '<', timestamp_bound(end)),
+                                  ('location', '=', location), ('predicted_condition', '=', predicted_condition)):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        sql = self._select + (" WHERE " + " AND ".join(clauses) if clauses else "") + " ORDER BY timestamp"
+        with self._lock:
+            return list(self._rows(self._db.execute(sql, params)))
+
+    def close(self):
+        self._db.close()
+
+PARQUET_SPOOL_NAME = "_spool.db"  # Parquet readers skip names starting with "_"
+COMPACT_FILES = 32  # a date partition with this many files is merged into one
+MERGED_KEY = b"merged"  # compacted file metadata: JSON list of the files it replaces
+
+def parquet_files(root):
+    """Data files under a Parquet store root, leaving out files already merged by compaction"""
+    import pyarrow.parquet as pq
+    paths, merged = [], set()
+    for directory, _, names in os.walk(root):
+        for name in sorted(names):
+            if not name.endswith(".parquet") or name.startswith((".", "_")):
+                continue
+            path = os.path.join(directory, name)
+            paths.append(path)
+            if name.startswith("compact-"):
+                metadata = pq.read_schema(path).metadata or {}
+                merged.update(os.path.join(directory, n) for n in json.loads(metadata.get(MERGED_KEY, b"[]")))
+    return [path for path in paths if path not in merged]
+
+class ParquetRecordStore(RecordStore):
+    """Parquet files partitioned by submission date (root/date=YYYY-MM-DD/part-*.parquet)
+
+    append_many returns once the rows are committed to a SQLite spool in the
+    root. Spooled rows are written as one file per date once buffer_rows
+    accumulate, or on flush()/close(). Reads flush first, so every process
+    sharing the root sees every committed row. A file is named after the
+    first spool row it holds, so a flush replayed after a crash overwrites
+    what it had already written. A partition that reaches compact_files
+    files is merged into one. write_rows skips the spool for callers that
+    name their own files.
+    """
+    def __init__(self, root, buffer_rows=1000, compact_files=COMPACT_FILES):
+        self.root = root
+        self.buffer_rows = buffer_rows
+        self.compact_files = compact_files
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, PARQUET_SPOOL_NAME), check_same_thread=False,
+                                   isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS spool (id INTEGER PRIMARY KEY AUTOINCREMENT, row TEXT NOT NULL)")
+
+    @staticmethod
+    def schema():
+        import pyarrow as pa
+        fields = []
+        for column in RECORD_COLUMNS:
+            kind = pa.bool_() if column in BOOL_COLUMNS else pa.float64() if column in NUMBER_COLUMNS else pa.string()
+            fields.append(pa.field(column, kind))
+        fields.append(pa.field('predicted_condition', pa.string()))
+        return pa.schema(fields)
+
+    def append_many(self, rows):
+        payloads = []
+        for row in rows:
+            row = typed_row(row)
+            payloads.append((json.dumps(row + [primary_prediction(row)]),))
+        with self._lock:
+            # Autocommit connection: without an explicit transaction every row would commit on its own
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany("INSERT INTO spool (row) VALUES (?)", payloads)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            pending = self._db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+        if pending >= self.buffer_rows:
+            self.flush()
+
+    def pending(self):
+        """Rows committed to the spool but not yet in a Parquet file"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def flush(self, prefix="part"):
+        """Write spooled rows to their date partitions, in files named prefix-<first spool id>.parquet"""
+        with self._lock:
+            # The write lock keeps other processes from flushing the same rows meanwhile
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                spooled = self._db.execute("SELECT id, row FROM spool ORDER BY id").fetchall()
+                touched = []
+                if spooled:
+                    touched = self._write([json.loads(row) for _, row in spooled], f"{prefix}-{spooled[0][0]:012d}")
+                    self._db.execute("DELETE FROM spool WHERE id <= ?", (spooled[-1][0],))
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            self.compact(touched)
+
+    def write_rows(self, rows, name):
+        """Write rows straight to their partitions as name.parquet, bypassing the spool
+
+        A file of the same name is replaced, so writing a batch again under
+        its name does not add its rows twice. Returns the partition
+        directories written, for compact().
+        """
+        typed = []
+        for row in rows:
+            row = typed_row(row)
+            typed.append(row + [primary_prediction(row)])
+        with self._lock:
+            return self._write(typed, name)
+
+    def compact(self, directories):
+        """Merge each of these partitions that holds compact_files files or more into one"""
+        for directory in directories:
+            if len(parquet_files(directory)) >= self.compact_files:
+                self._compact(directory)
+
+    def _write(self, rows, name):
+        """One file per date; returns the partition directories written"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        by_date = {}
+        for row in rows:
+            by_date.setdefault(str(row[0])[:10], []).append(row)
+        schema = self.schema()
+        directories = []
+        for date, date_rows in by_date.items():
+            directory = os.path.join(self.root, f"date={date}")
+            os.makedirs(directory, exist_ok=True)
+            columns = zip(*date_rows)
+            table = pa.Table.from_arrays([pa.array(column, type=field.type)
+                                          for column, field in zip(columns, schema)], schema=schema)
+            _replace_parquet(table, os.path.join(directory, f"{name}.parquet"))
+            directories.append(directory)
+        return directories
+
+    def _compact(self, directory):
+        """Merge a partition's files into one, then remove the files it replaces"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        paths = parquet_files(directory)
+        # Finish removals an earlier compaction did not get to
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".parquet") and not name.startswith((".", "_")) and path not in paths:
+                os.remove(path)
+        if len(paths) < 2:
+            return
+        table = pa.concat_tables([pq.read_table(path, schema=self.schema()) for path in paths])
+        merged = json.dumps([os.path.basename(path) for path in paths]).encode()
+        _replace_parquet(table.replace_schema_metadata({MERGED_KEY: merged}),
+                         os.path.join(directory, f"compact-{time.time_ns()}.parquet"))
+        for path in paths:
+            os.remove(path)
+
+    def _dataset(self):
+        import pyarrow.dataset as ds
+        return ds.dataset(parquet_files(self.root), format="parquet", schema=self.schema())
+
+    def _table_rows(self, table):
+        columns = [table.column(c).to_pylist() for c in RECORD_COLUMNS]
+        return [list(row) for row in zip(*columns)]
+
+    def scan(self, batch_size=10_000):
+        self.flush()
+        for batch in self._dataset().to_batches(columns=RECORD_COLUMNS, batch_size=batch_size):
+            if batch.num_rows:
+                columns = [batch.column(i).to_pylist() for i in range(batch.num_columns)]
+                yield [list(row) for row in zip(*columns)]
+
+    def query(self, start=None, end=None, location=None, predicted_condition=None):
+        import pyarrow.dataset as ds
+        self.flush()
+        start, end = timestamp_bound(start), timestamp_bound(end)
+        condition = None
+        for expression in (
+            ds.field('timestamp') >= start if start is not None else None,
+            ds.field('timestamp') < end if end is not None else None,
+            ds.field('location') == location if location is not None else None,
+            ds.field('predicted_condition') == predicted_condition if predicted_condition is not None else None
+        ):
+            if expression is not None:
+                condition = expression if condition is None else condition & expression
+        # Only partitions that can hold the range are opened
+        fragments = [path for path in parquet_files(self.root) if _partition_in_range(path, start, end)]
+        if not fragments:
+            return []
+        dataset = ds.dataset(fragments, format="parquet", schema=self.schema())
+        table = dataset.to_table(columns=RECORD_COLUMNS, filter=condition).sort_by('timestamp')
+        return self._table_rows(table)
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+def _replace_parquet(table, path):
+    """Write a Parquet file atomically"""
+    import pyarrow.parquet as pq
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+def _partition_in_range(path, start, end):
+    """Whether a date=YYYY-MM-DD partition can hold timestamps in [start, end)"""
+    marker = "date="
+    idx = path.rfind(marker)
+    if idx < 0:
+        return True
+    date = path[idx + len(marker):idx + len(marker) + 10]
+    if start is not None and date < start[:10]:
+        return False
+    if end is not None and date + " 00:00:00" >= end:
+        return False
+    return True
+
+RECORD_STORES = {
+    'sheets': SheetsRecordStore,
+    'sqlite': SQLiteRecordStore,
+    'parquet': ParquetRecordStore
+}
+
+def open_record_store(kind, **options):
+    """Create the record store named by configuration ('sheets', 'sqlite' or 'parquet')"""
+    try:
+        store_class = RECORD_STORES[kind]
+    except KeyError:
+        raise ValueError(f"Unknown record store {kind!r}; expected one of {', '.join(RECORD_STORES)}")
+    return store_class(**options)
+
+# ---------- CONFIGURED STORE ----------
+# The app, the scoring service and the analytics page all store and read
+# submissions as configured here.
+# Where submissions are stored: "sheets" (default), "sqlite" or "parquet".
+# RECORD_STORE_PATH is the SQLite file or Parquet directory for the local stores.
+RECORD_STORE = os.environ.get("RECORD_STORE", "sheets")
+RECORD_STORE_PATHS = {'sqlite': os.path.join("data", "records.db"), 'parquet': os.path.join("data", "records")}
+# RECORD_FORMAT=compact writes Sheets rows in the packed layout of compact.py
+RECORD_FORMAT = os.environ.get("RECORD_FORMAT", "readable")
+
+# SHEETS_STUB=1 swaps Google Sheets for an in-memory worksheet (offline runs and
+# load tests); SHEETS_STUB_LATENCY adds a delay per call, in seconds, and
+# SHEETS_STUB_ERROR_RATE the fraction of calls failing with 429/5xx
+SHEETS_STUB = os.environ.get("SHEETS_STUB", "0") == "1"
+SHEETS_STUB_LATENCY = float(os.environ.get("SHEETS_STUB_LATENCY", "0"))
+SHEETS_STUB_ERROR_RATE = float(os.environ.get("SHEETS_STUB_ERROR_RATE", "0"))
+
+def record_store_path(kind=RECORD_STORE):
+    """SQLite file or Parquet directory of a local store: RECORD_STORE_PATH or the default"""
+    return os.environ.get("RECORD_STORE_PATH") or RECORD_STORE_PATHS.get(kind, "")
+
+def configured_sheet_connection(load_credentials):
+    """Sheets connection, or the in-memory stand-in with SHEETS_STUB=1
+
+    load_credentials returns the service account info; it is only called
+    when the real sheet is used.
+    """
+    if SHEETS_STUB:
+        worksheet = LocalWorksheet(latency=SHEETS_STUB_LATENCY, error_rate=SHEETS_STUB_ERROR_RATE)
+        return SheetConnection(None, open_worksheet=lambda: worksheet)
+    return SheetConnection(load_credentials())
+
+def configured_record_store(kind=RECORD_STORE, path=None, connection=None, writer=None):
+    """The record store for the configured kind, path and RECORD_FORMAT
+
+    Sheets goes through connection and writer (a new SheetWriter by
+    default), wrapped in a CompactRecordStore with RECORD_FORMAT=compact.
+    """
+    if kind == "sheets":
+        store = SheetsRecordStore(connection, writer or SheetWriter(connection))
+        if RECORD_FORMAT == "compact":
+            # Imported here: compact builds on this module
+            from compact import CompactRecordStore
+            store = CompactRecordStore(store)
+        return store
+    path = path or record_store_path(kind)
+    if kind == "sqlite":
+        return open_record_store(kind, path=path)
+    return open_record_store(kind, root=path, buffer_rows=WRITE_BATCH_SIZE)
@@ -0,0 +1,321 @@
+"""The original, unoptimized diagnosis and encoding code, kept as the oracle for equivalence tests
+
+enhanced_diagnose is the rule function as it stood before the rule engine
+(rules.RuleEngine) replaced it; the only edit is that the TB smoking bonus
+reads medical_history['smoking'], which the form fills from the same
+checkbox as the global it used to read. encode_features is the body of the
+original SymptomPredictor.predict up to the model call, and predict runs
+the original two model calls and argsort ranking. training_data is the
+original row-by-row labelling loop of prepare_training_data.
+"""
+import numpy as np
+
+def enhanced_diagnose(fever, basic, respiratory, tuberculosis, digestive, skin, neurological, cancer, heart, age, medical_history, lifestyle, fever_pattern, recent_travel, tb_contact):
+    conditions = []
+    risk_factors = []
+    recommendations = []
+    risk_score = 0
+    
+    all_symptoms = fever + basic + respiratory + tuberculosis + digestive + skin + neurological + cancer + heart
+    symptom_count = len(all_symptoms)
+    
+    # Risk factors from medical history and lifestyle
+    if medical_history.get('bp'): risk_factors.append("High Blood Pressure")
+    if medical_history.get('diabetes'): risk_factors.append("Diabetes")
+    if medical_history.get('heart'): risk_factors.append("Heart Disease History")
+    if medical_history.get('smoking'): risk_factors.append("Smoking")
+    if medical_history.get('alcohol'): risk_factors.append("Alcohol Use")
+    if medical_history.get('hiv_immune'): risk_factors.append("Weakened Immune System")
+    if recent_travel: risk_factors.append("Recent Travel")
+    if tb_contact: risk_factors.append("Contact with TB Patient")
+    
+    # -------------------------------
+    # TUBERCULOSIS (TB) ANALYSIS
+    # -------------------------------
+    
+    # Major TB symptoms
+    tb_major_symptoms = ["Cough lasting more than 3 weeks", "Coughing up blood", "Night sweats", "Weight loss"]
+    tb_minor_symptoms = ["Intermittent fever", "Loss of appetite", "Fatigue and weakness", "Chest pain", "Breathing difficulty"]
+    
+    tb_major_count = sum(1 for symptom in tb_major_symptoms if symptom in tuberculosis)
+    tb_minor_count = sum(1 for symptom in tb_minor_symptoms if symptom in (tuberculosis + fever + basic + respiratory))
+    
+    # TB risk assessment
+    tb_risk_score = 0
+    
+    # High risk for major symptoms
+    if tb_major_count >= 2:
+        tb_risk_score += 60
+    elif tb_major_count == 1:
+        tb_risk_score += 30
+    
+    # Moderate risk for minor symptoms
+    tb_risk_score += tb_minor_count * 10
+    
+    # Risk factors
+    if medical_history.get('tb_history'):
+        tb_risk_score += 20
+    if medical_history.get('hiv_immune'):
+        tb_risk_score += 25
+    if tb_contact:
+        tb_risk_score += 15
+    if medical_history.get('smoking'):  # the form's global smoking flag
+        tb_risk_score += 10
+    
+    # TB diagnosis
+    if tb_risk_score >= 50:
+        risk_level = "High" if tb_risk_score >= 70 else "Medium"
+        conditions.append((f"Tuberculosis (TB) - Risk Score: {tb_risk_score}%", "Lungs and Respiratory System", risk_level))
+        recommendations.append("🚨 Get immediate Chest X-ray and Sputum test")
+        recommendations.append("Visit TB clinic for DOTS therapy")
+        recommendations.append("Wear mask to prevent infection spread")
+    
+    # -------------------------------
+    # FEVER AND INFECTION ANALYSIS
+    # -------------------------------
+    
+    # Normal Fever
+    if "Fever" in fever and len(fever) == 1 and len([s for s in basic if s in ["Headache", "Body pain", "Fatigue"]]) >= 2:
+        conditions.append(("Normal Fever (Viral Fever)", "Immune System", "Low"))
+        recommendations.append("Rest, stay hydrated, and take paracetamol")
+    
+    # Viral Fever
+    viral_fever_symptoms = ["Fever", "Headache", "Body pain", "Fatigue", "Weakness"]
+    viral_count = sum(1 for symptom in viral_fever_symptoms if symptom in (fever + basic))
+    if viral_count >= 4:
+        conditions.append(("Viral Fever", "Immune System", "Medium"))
+        recommendations.append("Get plenty of rest and fluids")
+    
+    # Dengue - Mosquito-borne
+    dengue_symptoms = ["High fever (104°F+)", "Severe headache", "Eye pain", "Joint pain", "Muscle pain", "Red spots on skin"]
+    dengue_count = sum(1 for symptom in dengue_symptoms if symptom in (fever + basic + skin))
+    if dengue_count >= 4:
+        conditions.append(("Dengue Fever", "Blood and Immune System", "High"))
+        risk_factors.append("Mosquito-borne infection")
+        recommendations.append("🚨 Get immediate blood test and consult doctor")
+        recommendations.append("Monitor platelet count")
+    
+    # Malaria - Mosquito-borne
+    malaria_symptoms = ["Intermittent fever", "Chills", "Sweating", "Headache", "Nausea", "Fatigue"]
+    malaria_count = sum(1 for symptom in malaria_symptoms if symptom in (fever + basic))
+    if malaria_count >= 4 and fever_pattern in ["Intermittent fever", "Low in morning/high in evening"]:
+        conditions.append(("Malaria", "Blood and Liver", "High"))
+        risk_factors.append("Mosquito-borne infection")
+        recommendations.append("🚨 Get malaria blood test")
+        recommendations.append("Start anti-malarial medications")
+    
+    # Typhoid - Water/food borne
+    typhoid_symptoms = ["High fever (104°F+)", "Headache", "Weakness", "Abdominal pain", "Diarrhea or constipation", "Loss of appetite"]
+    typhoid_count = sum(1 for symptom in typhoid_symptoms if symptom in (fever + basic + digestive))
+    if typhoid_count >= 4:
+        conditions.append(("Typhoid Fever", "Digestive System and Blood", "High"))
+        risk_factors.append("Contaminated food/water")
+        recommendations.append("🚨 Get Widal test and start antibiotics")
+        recommendations.append("Maintain proper hygiene")
+    
+    # Chikungunya - Mosquito-borne
+    if "Joint pain" in basic and "Fever" in fever and "Red spots on skin" in skin:
+        conditions.append(("Chikungunya", "Joints and Immune System", "Medium"))
+        recommendations.append("Get physiotherapy for joint pain")
+    
+    # -------------------------------
+    # OTHER CONDITIONS
+    # -------------------------------
+    
+    # Respiratory infections
+    respiratory_symptom_count = len(respiratory)
+    if respiratory_symptom_count >= 2 and "Fever" in fever:
+        if "Cough" in respiratory and "Shortness of breath" in respiratory:
+            conditions.append(("Respiratory Infection (COVID-19/Influenza/Pneumonia)", "Respiratory System", "High"))
+        if "Wheezing" in respiratory and "Shortness of breath" in respiratory:
+            conditions.append(("Asthma/Bronchitis", "Respiratory System", "Medium"))
+    
+    # Digestive infections
+    digestive_symptom_count = len(digestive)
+    if digestive_symptom_count >= 3 and "Fever" in fever:
+        if "Diarrhea" in digestive and "Abdominal pain" in digestive:
+            conditions.append(("Gastroenteritis", "Digestive System", "Medium"))
+        if "Blood in stool" in digestive:
+            conditions.append(("Dysentery/Enteritis", "Digestive System", "High"))
+    
+    # Hepatitis
+    if "Yellow skin/eyes" in skin and "Fever" in fever:
+        conditions.append(("Hepatitis/Liver Infection", "Liver", "High"))
+    
+    # Cardiovascular risk assessment
+    heart_symptom_count = len(heart)
+    if heart_symptom_count >= 2:
+        conditions.append(("Cardiovascular Issue", "Heart/Circulatory System", "High"))
+        if "Chest pain/pressure" in heart:
+            recommendations.append("🚨 Seek immediate medical attention for chest pain")
+    
+    # Cancer risk assessment
+    cancer_symptom_count = len(cancer)
+    if cancer_symptom_count >= 2:
+        risk_level = "High" if cancer_symptom_count >= 3 or medical_history.get('cancer_history') else "Medium"
+        conditions.append(("Possible Cancer Indicators", "Multiple Systems", risk_level))
+        recommendations.append("Consult with oncologist for further evaluation")
+    
+    # Lifestyle risk assessment
+    if lifestyle.get('exercise') in ["Never", "Occasionally"] and medical_history.get('bp'):
+        risk_factors.append("Sedentary Lifestyle")
+        recommendations.append("Increase physical activity to 150 minutes per week")
+    
+    # Calculate comprehensive risk score
+    base_score = min(symptom_count * 4, 40)
+    age_score = min(age * 0.5, 20)
+    medical_score = len(risk_factors) * 5
+    lifestyle_score = 0
+    if lifestyle.get('smoking'): lifestyle_score += 10
+    if lifestyle.get('alcohol'): lifestyle_score += 5
+    if lifestyle.get('exercise') in ["Never", "Occasionally"]: lifestyle_score += 5
+    
+    # Additional scores for fever and TB
+    fever_score = len(fever) * 3
+    tb_score = min(tb_risk_score / 2, 20)  # Include TB risk in overall score
+    risk_score = min(base_score + age_score + medical_score + lifestyle_score + fever_score + tb_score, 95)
+    
+    # General recommendations
+    if "Fever" in fever:
+        recommendations.append("Monitor temperature regularly")
+        recommendations.append("Drink plenty of fluids")
+    
+    if tb_risk_score >= 30:
+        recommendations.append("Visit health center for TB screening")
+    
+    if risk_score > 50:
+        recommendations.append("Schedule appointment with primary care physician")
+    if symptom_count > 5:
+        recommendations.append("Consider comprehensive medical evaluation")
+    
+    return conditions, risk_factors, recommendations, risk_score, tb_risk_score
+
+def encode_features(symptom_features, symptoms_dict, age, smoking, diabetes):
+    """Model input vector exactly as the original predict built it"""
+    input_features = np.zeros(len(symptom_features))
+    
+    symptom_mapping = {
+        'Fever': 'Fever',
+        'Chills': 'Chills',
+        'Sweating': 'Chills',
+        'Increased body temperature': 'Fever',
+        'Intermittent fever': 'Fever',
+        'High fever (104°F+)': 'Fever',
+        'Mild fever (100-101°F)': 'Fever',
+        'Night sweats': 'Night_sweats',
+        'Morning fever': 'Fever',
+        'Fatigue': 'Fatigue',
+        'Headache': 'Headache',
+        'Nausea': 'Nausea',
+        'Vomiting': 'Nausea',
+        'Muscle pain': 'Muscle_pain',
+        'Joint pain': 'Joint_pain',
+        'Weakness': 'Fatigue',
+        'Dizziness': 'Headache',
+        'Loss of appetite': 'Loss_of_appetite',
+        'Body pain': 'Muscle_pain',
+        'Weight loss': 'Weight_loss',
+        'Chest pain': 'Chest_pain',
+        'Cough': 'Cough',
+        'Shortness of breath': 'Shortness_of_breath',
+        'Chest tightness': 'Chest_pain',
+        'Runny nose': 'Runny_nose',
+        'Sore throat': 'Sore_throat',
+        'Sneezing': 'Runny_nose',
+        'Wheezing': 'Wheezing',
+        'Loss of smell': 'Runny_nose',
+        'Loss of taste': 'Runny_nose',
+        'Persistent cough (3 weeks+)': 'Persistent_cough',
+        'Cough with blood': 'Cough_blood',
+        'Chest pain when breathing': 'Chest_pain',
+        'Breathlessness': 'Shortness_of_breath',
+        'Cough lasting more than 3 weeks': 'Persistent_cough',
+        'Coughing up blood': 'Cough_blood',
+        'Breathing difficulty': 'Shortness_of_breath',
+        'Diarrhea': 'Diarrhea',
+        'Abdominal pain': 'Abdominal_pain',
+        'Bloating': 'Abdominal_pain',
+        'Constipation': 'Abdominal_pain',
+        'Heartburn': 'Abdominal_pain',
+        'Blood in stool': 'Diarrhea',
+        'Difficulty swallowing': 'Sore_throat',
+        'Excessive thirst': 'Diabetes',
+        'Frequent urination': 'Diabetes',
+        'Abdominal cramps': 'Abdominal_pain',
+        'Rash': 'Rash',
+        'Itching': 'Rash',
+        'Yellow skin/eyes': 'Rash',
+        'Skin discoloration': 'Rash',
+        'Hives': 'Rash',
+        'Swelling': 'Rash',
+        'Easy bruising': 'Rash',
+        'Red spots on skin': 'Rash',
+        'Eye pain': 'Headache',
+        'Red eyes': 'Rash'
+    }
+
+    # Encode symptoms
+    for symptom_category, symptoms_list in symptoms_dict.items():
+        for symptom in symptoms_list:
+            if symptom in symptom_mapping:
+                feature_name = symptom_mapping[symptom]
+                if feature_name in symptom_features:
+                    idx = symptom_features.index(feature_name)
+                    input_features[idx] = 1
+
+    # Add demographic features
+    if 'Age' in symptom_features:
+        idx = symptom_features.index('Age')
+        input_features[idx] = min(age / 100, 1)  # Normalize age
+
+    if 'Smoking' in symptom_features:
+        idx = symptom_features.index('Smoking')
+        input_features[idx] = 1 if smoking else 0
+
+    if 'Diabetes' in symptom_features:
+        idx = symptom_features.index('Diabetes')
+        input_features[idx] = 1 if diabetes else 0
+    return input_features
+
+def predict(model, label_encoder, input_features):
+    """(predicted disease, top-3 (disease, probability) list) as the original predict returned them"""
+    prediction = model.predict([input_features])[0]
+    probabilities = model.predict_proba([input_features])[0]
+    predicted_disease = label_encoder.inverse_transform([prediction])[0]
+    top_3_idx = np.argsort(probabilities)[-3:][::-1]
+    top_3_diseases = label_encoder.inverse_transform(top_3_idx)
+    top_3_probs = probabilities[top_3_idx]
+    return predicted_disease, list(zip(top_3_diseases, top_3_probs))
+
+def training_data(n_samples=1000, seed=42):
+    """(X, labels) as the original prepare_training_data built them, one row at a time"""
+    np.random.seed(seed)
+    X = np.random.randint(0, 2, (n_samples, 24))
+    y = []
+    for i in range(n_samples):
+        symptoms = X[i]
+        
+        # TB pattern
+        if symptoms[9] == 1 and symptoms[8] == 1 and symptoms[20] == 1:  # Night sweats, weight loss, persistent cough
+            y.append('Tuberculosis')
+        # Dengue pattern
+        elif symptoms[0] == 1 and symptoms[5] == 1 and symptoms[15] == 1:  # Fever, headache, rash
+            y.append('Dengue')
+        # Malaria pattern
+        elif symptoms[0] == 1 and symptoms[10] == 1 and symptoms[1] == 0:  # Fever, chills, no cough
+            y.append('Malaria')
+        # Typhoid pattern
+        elif symptoms[0] == 1 and symptoms[7] == 1 and symptoms[13] == 1:  # Fever, loss of appetite, abdominal pain
+            y.append('Typhoid')
+        # Viral fever pattern
+        elif symptoms[0] == 1 and symptoms[4] == 1 and symptoms[5] == 1:  # Fever, fatigue, headache
+            y.append('Viral_Fever')
+        # Respiratory infection
+        elif symptoms[1] == 1 and symptoms[2] == 1 and symptoms[3] == 1:  # Cough, shortness of breath, chest pain
+            y.append('Respiratory_Infection')
+        # Gastroenteritis
+        elif symptoms[12] == 1 and symptoms[13] == 1 and symptoms[11] == 1:  # Diarrhea, abdominal pain, nausea
+            y.append('Gastroenteritis')
+        else:
+            y.append('Healthy')
+    return X, y
@@ -0,0 +1,31 @@
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import storage
+
+PAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pages", "admin_analytics.py")
+
+@pytest.fixture
+def page(monkeypatch):
+    monkeypatch.setattr(storage, "RECORD_STORE", "parquet")
+    monkeypatch.setenv("RECORD_STORE_PATH", "records")
+    return AppTest.from_file(PAGE)
+
+def test_denies_access_without_a_configured_password(page):
+    page.run()
+    assert "admin_password" in page.error[0].value
+    assert not page.text_input and not page.date_input
+
+def test_wrong_password_stops_the_page(page):
+    page.secrets["admin_password"] = "s3cret"
+    page.run()
+    page.text_input[0].input("guess").run()
+    assert not page.date_input
+
+def test_right_password_opens_the_page(page):
+    page.secrets["admin_password"] = "s3cret"
+    page.run()
+    page.text_input[0].input("s3cret").run()
+    assert page.date_input
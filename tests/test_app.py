@@ -0,0 +1,64 @@
+import os
+import threading
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import storage
+from storage import RECORD_COLUMNS, SQLiteRecordStore
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(storage, "RECORD_STORE", "sqlite")
+    monkeypatch.setenv("RECORD_STORE_PATH", "records.db")
+    # Shared resources (store, model, pool) are per process; start each test with fresh ones
+    st.cache_resource.clear()
+    yield AppTest.from_file(APP, default_timeout=120)
+    st.cache_resource.clear()
+
+def widget(widgets, label):
+    return next(w for w in widgets if w.label == label)
+
+def test_submit_renders_both_sections_and_saves_the_record(app, monkeypatch):
+    saved_by = []
+    append_many = SQLiteRecordStore.append_many
+    def recording_append_many(self, rows):
+        saved_by.append(threading.current_thread().name)
+        append_many(self, rows)
+    monkeypatch.setattr(SQLiteRecordStore, "append_many", recording_append_many)
+    app.run()
+    widget(app.text_input, "👤 Full Name").input("Asha Rao")
+    widget(app.text_input, "📱 Mobile Number").input("9800000000")
+    widget(app.number_input, "🎂 Age").set_value(34)
+    widget(app.multiselect, "Fever Symptoms").select("Fever").select("Chills")
+    widget(app.multiselect, "General Symptoms").select("Headache")
+    widget(app.selectbox, "Fever Pattern").select("Intermittent fever")
+    app.button[0].click().run()
+
+    assert not app.exception
+    infos = [info.value for info in app.info]
+    assert "## 🤖 AI Disease Prediction" in infos
+    assert "## 🌡️ Fever Analysis" in infos
+    assert [s.value for s in app.subheader if s.value in ("Top Predictions", "Prediction Insights")] == \
+        ["Top Predictions", "Prediction Insights"]
+    assert "Your response has been recorded securely in our database." in [s.value for s in app.success]
+
+    # Saved once, by a submit_pool thread rather than the script thread
+    assert len(saved_by) == 1 and saved_by[0].startswith("submit")
+    rows = [row for batch in SQLiteRecordStore("records.db").scan() for row in batch]
+    assert len(rows) == 1
+    record = dict(zip(RECORD_COLUMNS, rows[0]))
+    assert record['name'] == "Asha Rao" and record['age'] == 34
+    assert record['symptoms'] == "Fever, Chills, Headache"
+    assert record['fever_pattern'] == "Intermittent fever"
+    assert record['ml_predictions']
+
+def test_submit_without_a_name_saves_nothing(app):
+    app.run()
+    app.button[0].click().run()
+    assert "Please enter your Name" in app.error[0].value
+    assert not any(info.value == "## 🤖 AI Disease Prediction" for info in app.info)
+    assert not os.path.exists("records.db") or not list(SQLiteRecordStore("records.db").scan())
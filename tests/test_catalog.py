@@ -0,0 +1,26 @@
+import hashlib
+import random
+
+from catalog import CATALOG, SYMPTOM_VOCABULARY
+
+# SYMPTOM_VOCABULARY as released: stored records carry these positions as bits,
+# so the list may only grow at the end
+RELEASED_SYMPTOMS = 97
+RELEASED_DIGEST = "714142459b948a32d751671ed3096d332d35c671bf4c264f727ef30e4262844b"
+
+def test_vocabulary_is_append_only():
+    released = SYMPTOM_VOCABULARY[:RELEASED_SYMPTOMS]
+    assert len(released) == RELEASED_SYMPTOMS
+    assert hashlib.sha256("\n".join(released).encode()).hexdigest() == RELEASED_DIGEST, \
+        "SYMPTOM_VOCABULARY was reordered or edited; only append new symptoms"
+    assert SYMPTOM_VOCABULARY[0] == "Fever" and SYMPTOM_VOCABULARY[96] == "Palpitations"
+
+def test_symptom_bits_round_trip():
+    for symptom_id, name in enumerate(SYMPTOM_VOCABULARY):
+        assert CATALOG.symptom_bits([name]) == 1 << symptom_id
+        assert CATALOG.symptom_names(1 << symptom_id) == [name]
+    rng = random.Random(2)
+    for _ in range(200):
+        names = rng.sample(SYMPTOM_VOCABULARY, rng.randint(0, 12))
+        bits = CATALOG.symptom_bits(names + ["Not a symptom"])
+        assert CATALOG.symptom_names(bits) == sorted(names, key=SYMPTOM_VOCABULARY.index)
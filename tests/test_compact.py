@@ -0,0 +1,58 @@
+import random
+
+from benchmark import diagnose_args, record_row, sample_patient
+from compact import CompactRecordStore, decode_row, encode_row
+from rules import enhanced_diagnose
+from storage import RECORD_COLUMNS, RecordStore, typed_row
+
+SYMPTOMS = RECORD_COLUMNS.index('symptoms')
+
+class ListStore(RecordStore):
+    """Record store over a list, standing in for a sheet that holds rows of both layouts"""
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+
+    def append_many(self, rows):
+        self.rows.extend(rows)
+
+    def scan(self, batch_size=10_000):
+        for start in range(0, len(self.rows), batch_size):
+            yield self.rows[start:start + batch_size]
+
+def readable_rows(n, seed=5):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        patient = sample_patient(rng)
+        rows.append(record_row(patient, enhanced_diagnose(*diagnose_args(patient)),
+                               [("Viral_Fever", 0.5), ("Dengue", 0.25)], (22.5, "Normal")))
+    return rows
+
+def comparable(row):
+    """Typed row with the symptoms as a set: decoding lists them in catalog order, each once"""
+    row = typed_row(row)
+    row[SYMPTOMS] = set(row[SYMPTOMS].split(", "))
+    return row
+
+def test_round_trip_keeps_every_typed_value():
+    for row in readable_rows(200):
+        assert comparable(decode_row(encode_row(row))) == comparable(row)
+
+def test_scan_passes_readable_rows_through():
+    old, new = readable_rows(3), readable_rows(3, seed=6)
+    store = CompactRecordStore(ListStore(old))
+    store.append_many(new)
+    assert len(store.store.rows[3]) < len(old[0])
+    scanned = [row for batch in store.scan(batch_size=4) for row in batch]
+    assert scanned[:3] == old
+    assert [comparable(row) for row in scanned[3:]] == [comparable(row) for row in new]
+
+def test_scan_frame_reads_both_layouts():
+    old, new = readable_rows(3), readable_rows(2, seed=6)
+    unknown = list(old[0])
+    unknown[SYMPTOMS] = "Not a catalog symptom"
+    store = CompactRecordStore(ListStore(old + [unknown]))
+    store.append_many(new)
+    frame = store.scan_frame()
+    assert len(frame) == 5
+    assert list(frame['age']) == [float(row[2]) for row in old + new]
@@ -0,0 +1,36 @@
+import random
+
+import pytest
+import streamlit as st
+
+import loadtest
+import storage
+from benchmark import sample_patient
+from catalog import SYMPTOM_CATEGORIES
+from storage import RECORD_COLUMNS, SQLiteRecordStore
+
+@pytest.fixture
+def local_store(monkeypatch):
+    monkeypatch.setattr(storage, "RECORD_STORE", "sqlite")
+    monkeypatch.setenv("RECORD_STORE_PATH", "records.db")
+    st.cache_resource.clear()
+    yield
+    st.cache_resource.clear()
+
+def test_sessions_submit_the_sampled_patients(local_store):
+    for seed in range(3):
+        page_load, submit, ok = loadtest.run_session(random.Random(seed))
+        assert ok and page_load > 0 and submit > 0
+    rows = [dict(zip(RECORD_COLUMNS, row)) for batch in SQLiteRecordStore("records.db").scan() for row in batch]
+    assert len(rows) == 3
+    for seed, record in enumerate(rows):
+        patient = sample_patient(random.Random(seed))
+        assert record['age'] == patient['age'] and record['fever_pattern'] == patient['fever_pattern']
+        expected = [name for category in SYMPTOM_CATEGORIES for name in patient['symptoms'][category]]
+        assert record['symptoms'] == ", ".join(expected)
+        assert record['location'] in loadtest.LOCATIONS
+
+def test_percentiles_in_milliseconds():
+    assert loadtest.percentiles([]) == {'p50_ms': None, 'p99_ms': None}
+    stats = loadtest.percentiles([0.001 * i for i in range(1, 101)])
+    assert stats['p50_ms'] == pytest.approx(50.5) and stats['p99_ms'] == pytest.approx(99.01)
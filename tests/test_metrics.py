@@ -0,0 +1,50 @@
+import pytest
+
+import metrics
+from metrics import COUNTER_NAME, METRIC_NAME, Histogram
+
+@pytest.fixture
+def fresh(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    monkeypatch.setattr(metrics, "_histograms", {})
+    monkeypatch.setattr(metrics, "_counters", {})
+
+def test_histogram_counts_each_value_in_its_bucket():
+    hist = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 1.0, 3.0, 7.0):
+        hist.observe(value)
+    counts, count, total = hist.snapshot()
+    # Bounds are inclusive upper limits, the last slot is +Inf
+    assert counts == [2, 2, 2]
+    assert count == 6 and total == pytest.approx(11.65)
+    assert hist.quantile(0.3) == 0.1 and hist.quantile(0.5) == 1.0 and hist.quantile(1.0) == float('inf')
+    assert Histogram().quantile(0.5) is None
+
+def test_render_prometheus_exposition_format(fresh):
+    metrics.observe("rules", 0.003)
+    metrics.observe("rules", 0.2)
+    metrics.observe("model", 20.0)
+    metrics.count("cache_hit", 3)
+    lines = metrics.render_prometheus().splitlines()
+    assert lines[:2] == [f"# HELP {METRIC_NAME} Latency of app stages in seconds", f"# TYPE {METRIC_NAME} histogram"]
+    rules = [line for line in lines if 'stage="rules"' in line]
+    assert len(rules) == len(metrics.LATENCY_BUCKETS) + 3
+    assert f'{METRIC_NAME}_bucket{{stage="rules",le="0.0025"}} 0' in rules
+    assert f'{METRIC_NAME}_bucket{{stage="rules",le="0.005"}} 1' in rules
+    assert f'{METRIC_NAME}_bucket{{stage="rules",le="0.25"}} 2' in rules
+    assert f'{METRIC_NAME}_bucket{{stage="rules",le="+Inf"}} 2' in rules
+    assert rules[-2:] == [f'{METRIC_NAME}_sum{{stage="rules"}} 0.203000', f'{METRIC_NAME}_count{{stage="rules"}} 2']
+    # Buckets are cumulative: an observation past the last bound only shows in +Inf
+    assert f'{METRIC_NAME}_bucket{{stage="model",le="10"}} 0' in lines
+    assert f'{METRIC_NAME}_bucket{{stage="model",le="+Inf"}} 1' in lines
+    # Stages are sorted, and counters follow the histograms
+    assert lines.index(f'{METRIC_NAME}_count{{stage="model"}} 1') < lines.index(rules[0])
+    assert lines[-3:] == [f"# HELP {COUNTER_NAME} Events counted by the app", f"# TYPE {COUNTER_NAME} counter",
+                          f'{COUNTER_NAME}{{event="cache_hit"}} 3']
+
+def test_disabled_metrics_record_nothing(fresh, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    with metrics.timed("rules"):
+        pass
+    metrics.count("cache_hit")
+    assert metrics.stages() == {} and metrics.counters() == {}
@@ -0,0 +1,44 @@
+import multiprocessing
+import os
+
+from mirror import SheetMirror, load_frame
+from storage import RECORD_COLUMNS, LocalWorksheet, SheetConnection
+from test_storage import record_rows
+
+def mirror_of(rows, page_rows=4):
+    worksheet = LocalWorksheet([RECORD_COLUMNS] + rows)
+    return SheetMirror(SheetConnection(None, open_worksheet=lambda: worksheet), root="mirror", page_rows=page_rows)
+
+def sync_and_die_before_saving_state(rows):
+    mirror = mirror_of(rows)
+    mirror._save_state = lambda state: os._exit(1)
+    mirror.sync()
+
+def test_sync_copies_every_row_once():
+    rows = record_rows(10)
+    mirror = mirror_of(rows)
+    assert mirror.sync() == 10
+    assert mirror.state()['synced_rows'] == 11  # header included
+    assert list(load_frame("mirror")['name']) == [row[1] for row in rows]
+    assert mirror_of(rows).sync() == 0
+
+def test_crash_between_data_and_state_does_not_duplicate_rows():
+    rows = record_rows(10)
+    process = multiprocessing.get_context("fork").Process(target=sync_and_die_before_saving_state, args=(rows,))
+    process.start()
+    process.join()
+    assert process.exitcode == 1
+    assert len(load_frame("mirror")) == 3  # the first page (header + 3 rows) was written
+    # The sheet grew meanwhile; the re-sync starts again at the unrecorded page
+    rows += record_rows(2, day="2024-05-02")
+    mirror_of(rows).sync()
+    assert sorted(load_frame("mirror")['timestamp']) == sorted(row[0] for row in rows)
+
+def test_resync_after_compaction_keeps_one_copy():
+    rows = record_rows(40)
+    mirror = mirror_of(rows)
+    mirror.store.compact_files = 3
+    mirror.sync()
+    directory = os.path.join("mirror", "date=2024-05-01")
+    assert len(os.listdir(directory)) < 10
+    assert len(load_frame("mirror")) == 40
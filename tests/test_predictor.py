@@ -0,0 +1,196 @@
+import copy
+import random
+
+import numpy as np
+import pytest
+
+import reference
+from benchmark import sample_patient
+from predictor import (SYMPTOM_FEATURES, FeatureEncoder, FeatureImportance, FlatForest, ModelSlot, PredictionCache,
+                       SymptomPredictor, generate_training_chunks, prediction_cache)
+from test_rules import patients
+
+@pytest.fixture(scope="module")
+def predictor():
+    predictor = SymptomPredictor()
+    predictor.train_model()
+    return predictor
+
+def inputs(patient):
+    return (patient['symptoms'], patient['age'], patient['lifestyle']['smoking'],
+            patient['medical_history']['diabetes'])
+
+def assert_same_ranking(top, expected, probabilities):
+    """Same probabilities in the same order; labels may only differ between exactly tied classes"""
+    assert [p for _, p in top] == [p for _, p in expected]
+    for (label, p), (expected_label, _) in zip(top, expected):
+        if np.count_nonzero(probabilities == p) == 1:
+            assert label == expected_label
+
+@pytest.mark.parametrize("n_samples, seed", [(1000, 42), (2500, 7)])
+def test_training_data_matches_original(n_samples, seed):
+    expected_X, expected_labels = reference.training_data(n_samples, seed)
+    predictor = SymptomPredictor()
+    X, y = predictor.prepare_training_data(n_samples, seed)
+    assert np.array_equal(X, expected_X)
+    assert list(predictor.label_encoder.inverse_transform(y)) == expected_labels
+
+def test_chunked_training_data_matches_one_chunk():
+    whole_X, whole_labels = next(generate_training_chunks(2500, 7, chunk_size=2500))
+    chunks = list(generate_training_chunks(2500, 7, chunk_size=300))
+    assert len(chunks) == 9
+    assert np.array_equal(np.vstack([X for X, _ in chunks]), whole_X)
+    assert np.array_equal(np.concatenate([labels for _, labels in chunks]), whole_labels)
+
+def test_no_training_samples_gives_empty_arrays():
+    X, y = SymptomPredictor().prepare_training_data(0)
+    assert X.shape == (0, len(SYMPTOM_FEATURES)) and len(y) == 0
+
+def test_encoder_matches_original(predictor):
+    for patient in patients(500):
+        expected = reference.encode_features(predictor.symptom_features, *inputs(patient))
+        assert np.array_equal(predictor.encoder.encode(*inputs(patient)), expected)
+
+def test_predict_matches_original(predictor):
+    prediction_cache.invalidate()
+    for patient in patients(500):
+        disease, top, features = predictor.predict(*inputs(patient))
+        expected_disease, expected_top = reference.predict(predictor.model, predictor.label_encoder, features)
+        probabilities = predictor.model.predict_proba([features])[0]
+        assert disease == expected_disease
+        assert_same_ranking(top, expected_top, probabilities)
+
+def test_predict_batch_matches_predict(predictor):
+    cases = patients(300)
+    records = [dict(p['symptoms'], age=p['age'], smoking=p['lifestyle']['smoking'],
+                    diabetes=p['medical_history']['diabetes']) for p in cases]
+    primary, top_labels, top_probs = predictor.predict_batch(records)
+    for i, patient in enumerate(cases):
+        disease, top, _ = predictor.predict(*inputs(patient))
+        assert primary[i] == disease
+        assert top_probs[i].tolist() == [p for _, p in top]
+
+def test_cache_hits_on_model_version_bits_and_age(predictor):
+    prediction_cache.invalidate()
+    patient = sample_patient(random.Random(5))
+    symptoms, age, smoking, diabetes = inputs(patient)
+    first = predictor.predict(symptoms, age, smoking, diabetes)
+    hits = prediction_cache.hits
+    again = predictor.predict(dict(symptoms), age, smoking, diabetes)
+    assert prediction_cache.hits == hits + 1
+    assert again[0] == first[0] and again[1] == first[1]
+    # A different age or a retrained model is a different key
+    predictor.predict(symptoms, age + 1, smoking, diabetes)
+    retrained = copy.copy(predictor)
+    retrained.revision += 1
+    retrained.predict(symptoms, age, smoking, diabetes)
+    assert prediction_cache.hits == hits + 1
+
+def test_cache_evicts_least_recently_used():
+    cache = PredictionCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1 and cache.stats()['size'] == 2
+
+def test_swap_invalidates_the_cache(predictor):
+    prediction_cache.invalidate()
+    patient = sample_patient(random.Random(8))
+    slot = ModelSlot(predictor)
+    disease, _, _ = slot.current.predict(*inputs(patient))
+    # Same model_version, different labels: only invalidation keeps the old answer out
+    relabelled = copy.copy(predictor)
+    relabelled.label_encoder = copy.deepcopy(predictor.label_encoder)
+    relabelled.label_encoder.classes_ = np.array([f"new {label}" for label in predictor.label_encoder.classes_],
+                                                 dtype=object)
+    assert relabelled.model_version == predictor.model_version
+    assert slot.swap(relabelled, expected=predictor)
+    assert prediction_cache.stats()['size'] == 0
+    swapped, top, _ = slot.current.predict(*inputs(patient))
+    assert swapped == f"new {disease}"
+    assert all(label.startswith("new ") for label, _ in top)
+
+def test_flat_forest_matches_sklearn(predictor):
+    rng = np.random.RandomState(0)
+    X = (rng.rand(400, len(predictor.symptom_features)) < 0.2).astype(float)
+    X[:, predictor.encoder.age_index] = rng.rand(400)
+    flat = FlatForest(predictor.model)
+    assert np.array_equal(flat.predict_proba(X), predictor.model.predict_proba(X))
+    assert np.array_equal(flat.predict_proba(X[:1]), predictor.model.predict_proba(X[:1]))
+
+def test_contributions_add_up_to_the_prediction(predictor):
+    rng = random.Random(3)
+    X = np.array([predictor.encoder.encode(*inputs(sample_patient(rng))) for _ in range(200)])
+    classes, bias, contributions = predictor.flat_forest.contributions(X)
+    probabilities = predictor.model.predict_proba(X)
+    assert np.array_equal(classes, probabilities.argmax(axis=1))
+    assert np.allclose(bias + contributions.sum(axis=1), probabilities[np.arange(len(X)), classes], atol=1e-12)
+
+def test_explain_ranks_only_what_the_patient_has(predictor):
+    rng = random.Random(4)
+    age = predictor.encoder.age_index
+    for _ in range(200):
+        features = predictor.encoder.encode(*inputs(sample_patient(rng)))
+        _, _, contributions = predictor.flat_forest.contributions(np.asarray(features)[np.newaxis, :])
+        factors = predictor.explain(features)
+        assert all(column == age or features[column] for column, _, _ in factors)
+        values = [value for _, _, value in factors]
+        assert all(value > 0 for value in values) and values == sorted(values, reverse=True)
+        assert values == [contributions[0][column] for column, _, _ in factors]
+    no_symptoms = predictor.encoder.encode({}, 40, False, False)
+    assert all(column == age for column, _, _ in predictor.explain(no_symptoms))
+
+def test_explain_without_an_age_column(predictor):
+    from sklearn.ensemble import RandomForestClassifier
+    keep = [i for i, name in enumerate(predictor.symptom_features) if name != 'Age']
+    no_age = SymptomPredictor()
+    no_age.symptom_features = [predictor.symptom_features[i] for i in keep]
+    no_age.encoder = FeatureEncoder(no_age.symptom_features)
+    no_age.label_encoder = predictor.label_encoder
+    no_age.model = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0).fit(predictor.X[:, keep], predictor.y)
+    no_age.is_trained = True
+    assert no_age.encoder.age_index is None
+    rng = random.Random(6)
+    for _ in range(100):
+        features = no_age.encoder.encode(*inputs(sample_patient(rng)))
+        assert all(features[column] for column, _, _ in no_age.explain(features))
+
+def test_importance_top_is_most_important_first(predictor):
+    importances = predictor.model.feature_importances_
+    top = predictor.importance.top(5)
+    assert len(top) == 5
+    assert [name for _, name, _ in top] == [predictor.symptom_features[column] for column, _, _ in top]
+    assert [value for _, _, value in top] == [importances[column] for column, _, _ in top]
+    assert [value for _, _, value in top] == sorted(importances, reverse=True)[:5]
+    assert predictor.importance.top(len(importances) + 10) == predictor.importance.top(len(importances))
+
+def test_importance_top_keeps_column_order_between_ties():
+    class Model:
+        feature_importances_ = np.array([0.1, 0.3, 0.1, 0.3, 0.2])
+    view = FeatureImportance.from_model(Model, ['a', 'b', 'c', 'd', 'e'])
+    assert view.top(4) == [(1, 'b', 0.3), (3, 'd', 0.3), (4, 'e', 0.2), (0, 'a', 0.1)]
+
+def test_importance_follows_a_new_model(predictor):
+    from sklearn.ensemble import RandomForestClassifier
+    other = copy.copy(predictor)
+    assert other.importance is predictor.importance
+    other.model = RandomForestClassifier(n_estimators=5, max_depth=3, random_state=1).fit(predictor.X, predictor.y)
+    assert other.importance is not predictor.importance
+    assert other.importance.top(3)[0][2] == other.model.feature_importances_.max()
+
+def test_load_or_train_saves_and_reuses_the_artifact(workdir):
+    path = str(workdir / "models" / "predictor.pkl")
+    trained = SymptomPredictor.load_or_train(path)
+    loaded = SymptomPredictor.load_or_train(path)
+    assert not hasattr(loaded, 'X')  # loaded, not trained again
+    assert loaded.fingerprint == trained.fingerprint
+    assert np.array_equal(loaded.model.predict_proba(trained.X[:50]),
+                          trained.model.predict_proba(trained.X[:50]))
+
+def test_load_or_train_serves_a_model_it_cannot_save(workdir):
+    (workdir / "blocked").write_text("")
+    predictor = SymptomPredictor.load_or_train(str(workdir / "blocked" / "predictor.pkl"))
+    assert predictor.is_trained
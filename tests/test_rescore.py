@@ -0,0 +1,74 @@
+import csv
+import glob
+import os
+import random
+
+import pandas as pd
+import pytest
+
+import rescore
+from benchmark import diagnose_args, record_row, sample_patient
+from compact import decode_row, encode_row, is_compact
+from rules import enhanced_diagnose
+from catalog import SYMPTOM_CATEGORIES
+from storage import RECORD_COLUMNS, format_conditions, row_to_record
+
+def write_export(path, n=45, seed=11):
+    """CSV export of a sheet holding readable rows, then compact ones; returns the rows as written"""
+    rng = random.Random(seed)
+    patients = [sample_patient(rng) for _ in range(n)]
+    rows = [record_row(p, enhanced_diagnose(*diagnose_args(p)), [("Viral_Fever", 0.5)], (22.5, "Normal"))
+            for p in patients]
+    rows = rows[:n // 2] + [encode_row(row) for row in rows[n // 2:]]
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(RECORD_COLUMNS)
+        writer.writerows(rows)
+    return rows
+
+def stored_patient(row):
+    """The patient as rescore can know it: per-category symptoms rebuilt from the stored column"""
+    inputs = rescore.rebuild_inputs(row_to_record(decode_row(row) if is_compact(row) else row))
+    return dict(inputs, symptoms={category: inputs[category] for category in SYMPTOM_CATEGORIES})
+
+def run(*extra):
+    rescore.main(["export.csv", "out", "--model", "model.pkl", "--workers", "2", "--chunk-size", "10", *extra])
+
+def output():
+    return pd.concat([pd.read_csv(path, keep_default_na=False) for path in sorted(glob.glob("out/part-*.csv"))],
+                     ignore_index=True)
+
+def test_rescore_resumes_and_matches_enhanced_diagnose():
+    rows = write_export("export.csv")
+    run()
+    parts = sorted(glob.glob("out/part-*.csv"))
+    assert len(parts) == 5
+    # As if the run had stopped after the first three chunks
+    for path in parts[3:]:
+        os.remove(path)
+    kept = os.path.getmtime(parts[0])
+    run()
+    assert os.path.getmtime(parts[0]) == kept
+    frame = output()
+    assert list(frame['row']) == list(range(2, 2 + len(rows)))
+    assert any(is_compact(row) for row in rows)
+    for row, (_, scored) in zip(rows, frame.iterrows()):
+        conditions, risk_factors, _, risk_score, tb_risk_score = enhanced_diagnose(*diagnose_args(stored_patient(row)))
+        assert scored['conditions'] == format_conditions(conditions)
+        assert scored['risk_factors'] == ", ".join(risk_factors)
+        assert scored['risk_score'] == f"{risk_score:.1f}%"
+        assert scored['tb_risk_score'] == f"{tb_risk_score}%"
+
+def test_refuses_to_resume_with_different_settings():
+    write_export("export.csv", n=5)
+    run()
+    with pytest.raises(SystemExit, match="different run"):
+        rescore.main(["export.csv", "out", "--model", "model.pkl", "--workers", "1", "--chunk-size", "3"])
+    rescore.main(["export.csv", "out", "--model", "model.pkl", "--workers", "1", "--chunk-size", "3", "--restart"])
+    assert len(glob.glob("out/part-*.csv")) == 2
+
+def test_fails_fast_without_a_loadable_artifact(tmp_path):
+    write_export("export.csv", n=5)
+    (tmp_path / "blocked").write_text("")
+    with pytest.raises(SystemExit, match="Could not save"):
+        rescore.main(["export.csv", "out", "--model", "blocked/model.pkl", "--workers", "1"])
@@ -0,0 +1,81 @@
+import os
+import random
+
+import pytest
+
+import retrain
+from benchmark import diagnose_args, record_row, sample_patient
+from predictor import ModelSlot, SymptomPredictor
+from rules import enhanced_diagnose
+from storage import SQLiteRecordStore
+
+@pytest.fixture(scope="module")
+def predictor():
+    predictor = SymptomPredictor()
+    predictor.train_model()
+    return predictor
+
+def stored_rows(n, seed=3):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        patient = sample_patient(rng)
+        rows.append(record_row(patient, enhanced_diagnose(*diagnose_args(patient)), [("Viral_Fever", 0.5)], (22.0, "Normal")))
+    return rows
+
+def test_each_retrain_seeds_its_new_trees_differently(predictor):
+    X, y = predictor.X[:200], predictor.y[:200]
+    full = retrain.grow_forest(predictor.model, X, y, extra_trees=5, max_trees=100, seed=43)
+    again = retrain.grow_forest(predictor.model, X, y, extra_trees=5, max_trees=100, seed=43)
+    other = retrain.grow_forest(predictor.model, X, y, extra_trees=5, max_trees=100, seed=44)
+    seeds = lambda model: [tree.random_state for tree in model.estimators_[-5:]]
+    assert seeds(full) == seeds(again)
+    assert seeds(full) != seeds(other)
+
+def test_run_once_swaps_in_a_warmed_candidate(predictor, monkeypatch):
+    monkeypatch.setattr(retrain, 'HOLDOUT_TOLERANCE', 1.0)
+    store = SQLiteRecordStore("records.db")
+    store.append_many(stored_rows(60))
+    slot = ModelSlot(predictor)
+    result = retrain.Retrainer(slot, store, model_path="models/predictor.pkl", min_rows=50).run_once()
+    store.close()
+    assert result['status'] == 'swapped' and result['revision'] == 1
+    assert slot.current is not predictor
+    assert slot.current._flat_forest is not None and slot.current._flat_forest.model is slot.current.model
+
+def test_rows_stored_in_the_checkpoint_second_are_still_new(predictor, monkeypatch):
+    monkeypatch.setattr(retrain, 'HOLDOUT_TOLERANCE', 1.0)
+    rows = stored_rows(65)
+    for row in rows:
+        row[0] = "2024-05-01 10:00:00"
+    store = SQLiteRecordStore("records.db")
+    store.append_many(rows[:60])
+    slot = ModelSlot(predictor)
+    retrainer = retrain.Retrainer(slot, store, model_path="models/predictor.pkl", min_rows=50)
+    assert retrainer.run_once()['status'] == 'swapped'
+    assert retrainer.new_rows(slot.current) == []
+    # Same second as the checkpoint, stored after the retrain read the store
+    store.append_many(rows[60:])
+    assert len(retrainer.new_rows(slot.current)) == 5
+    # The checkpoint survives a reload of the artifact
+    assert len(retrainer.new_rows(SymptomPredictor.load("models/predictor.pkl"))) == 5
+    store.close()
+
+def test_a_superseded_candidate_is_neither_counted_nor_saved(predictor, monkeypatch):
+    monkeypatch.setattr(retrain, 'HOLDOUT_TOLERANCE', 1.0)
+    store = SQLiteRecordStore("records.db")
+    store.append_many(stored_rows(60))
+    slot = ModelSlot(predictor)
+    other = SymptomPredictor.load_or_train("other.pkl")
+    grow = retrain.grow_forest
+
+    def grow_while_another_model_goes_in(*args, **kwargs):
+        slot.swap(other)
+        return grow(*args, **kwargs)
+
+    monkeypatch.setattr(retrain, 'grow_forest', grow_while_another_model_goes_in)
+    retrainer = retrain.Retrainer(slot, store, model_path="models/predictor.pkl", min_rows=50)
+    assert retrainer.run_once()['status'] == 'superseded'
+    assert slot.current is other and retrainer.retrains == 0
+    assert not os.path.exists("models/predictor.pkl")
+    store.close()
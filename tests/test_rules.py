@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+import reference
+from benchmark import sample_patient
+from catalog import SYMPTOM_CATEGORIES, SYMPTOM_OPTIONS
+from rules import RuleEngine, enhanced_diagnose
+
+def uniform_patient(rng):
+    """Any option with equal chance, so rare rules and escalations fire too"""
+    patient = sample_patient(rng)
+    patient['symptoms'] = {category: [s for s in SYMPTOM_OPTIONS[category] if rng.random() < 0.3]
+                           for category in SYMPTOM_CATEGORIES}
+    return patient
+
+def patients(n=2000, seed=7):
+    rng = random.Random(seed)
+    return [(sample_patient if i % 2 else uniform_patient)(rng) for i in range(n)]
+
+def diagnose_args(patient):
+    return ([patient['symptoms'][c] for c in SYMPTOM_CATEGORIES]
+            + [patient['age'], patient['medical_history'], patient['lifestyle'],
+               patient['fever_pattern'], patient['recent_travel'], patient['tb_contact']])
+
+@pytest.fixture(scope="module")
+def cases():
+    return [(p, reference.enhanced_diagnose(*diagnose_args(p))) for p in patients()]
+
+def test_enhanced_diagnose_matches_original(cases):
+    for patient, expected in cases:
+        assert enhanced_diagnose(*diagnose_args(patient)) == expected
+
+def test_evaluate_batch_matches_original(cases):
+    engine = RuleEngine()
+    records = []
+    for patient, _ in cases:
+        record = dict(patient['symptoms'], age=patient['age'], medical_history=patient['medical_history'],
+                      lifestyle=patient['lifestyle'], fever_pattern=patient['fever_pattern'],
+                      recent_travel=patient['recent_travel'], tb_contact=patient['tb_contact'])
+        records.append(record)
+    results = engine.evaluate_batch(engine.encode_batch(records))
+    for i, (_, expected) in enumerate(cases):
+        assert engine.results_from_batch(results, i) == expected
+
+def test_cases_cover_the_rules(cases):
+    conditions = {condition for _, (found, *_) in cases for condition, _, _ in found}
+    assert len(conditions) >= 12
@@ -0,0 +1,92 @@
+import http.client
+import json
+import os
+import threading
+
+import pytest
+
+import storage
+from compact import CompactRecordStore
+from service import MAX_BODY_BYTES, ScoringService, make_server, open_store, parse_submission
+from storage import RECORD_COLUMNS, ParquetRecordStore, SheetsRecordStore, SQLiteRecordStore
+
+# ---------- STORE SELECTION ----------
+@pytest.fixture
+def stub_sheets(monkeypatch):
+    monkeypatch.setattr(storage, "SHEETS_STUB", True)
+
+def test_opens_the_compact_sheet_store_the_app_writes(stub_sheets, monkeypatch):
+    monkeypatch.setattr(storage, "RECORD_FORMAT", "compact")
+    store = open_store("sheets")
+    assert isinstance(store, CompactRecordStore) and isinstance(store.store, SheetsRecordStore)
+    store.close()
+
+def test_opens_readable_sheet_store_by_default(stub_sheets):
+    store = open_store("sheets")
+    assert isinstance(store, SheetsRecordStore)
+    store.close()
+
+def test_local_stores_follow_record_store_path(monkeypatch):
+    monkeypatch.setenv("RECORD_STORE_PATH", "shared.db")
+    store = open_store("sqlite")
+    assert isinstance(store, SQLiteRecordStore) and os.path.exists("shared.db")
+    store.close()
+    store = open_store("parquet", "records")
+    assert isinstance(store, ParquetRecordStore) and store.root == "records"
+    assert store.buffer_rows == storage.WRITE_BATCH_SIZE
+    store.close()
+
+# ---------- HTTP ----------
+@pytest.fixture(scope="module")
+def trained_predictor():
+    from predictor import SymptomPredictor
+    predictor = SymptomPredictor()
+    predictor.train_model()
+    return predictor
+
+@pytest.fixture
+def server(trained_predictor):
+    store = SQLiteRecordStore("records.db")
+    service = ScoringService(trained_predictor, store, workers=2, queue=2)
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    service.close()
+    store.close()
+
+def post(server, body=b"", headers=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    connection.putrequest("POST", "/score")
+    for name, value in (headers if headers is not None else {'Content-Length': str(len(body))}).items():
+        connection.putheader(name, value)
+    connection.endheaders(body)
+    response = connection.getresponse()
+    result = response.status, json.loads(response.read())
+    connection.close()
+    return result
+
+SUBMISSION = {'name': "Asha", 'mobile': "9800000000", 'age': 34, 'symptoms': ["Fever", "Cough", "Fever"]}
+
+def test_scores_and_stores_a_submission(server):
+    status, result = post(server, json.dumps(SUBMISSION).encode())
+    assert status == 200 and result['top_predictions']
+    rows = [row for batch in server.service.store.scan() for row in batch]
+    assert len(rows) == 1 and rows[0][RECORD_COLUMNS.index('symptoms')] == "Fever, Cough"
+
+@pytest.mark.parametrize("length", [None, "ten", "-1", "1e3"])
+def test_rejects_a_bad_content_length(server, length):
+    status, result = post(server, b"{}", headers={} if length is None else {'Content-Length': length})
+    assert status == 400 and "Content-Length" in result['error']
+
+def test_rejects_a_body_over_the_cap(server):
+    status, _ = post(server, headers={'Content-Length': str(MAX_BODY_BYTES + 1)})
+    assert status == 413
+
+def test_drops_repeated_symptoms_within_a_category():
+    form = parse_submission(dict(SUBMISSION, symptoms={'fever': ["Fever", "Chills", "Fever"]}))
+    assert form['symptoms']['fever'] == ["Fever", "Chills"]
+    flat = parse_submission(SUBMISSION)
+    assert sum(symptoms.count("Fever") for symptoms in flat['symptoms'].values()) == 1
@@ -0,0 +1,297 @@
+from datetime import datetime, timedelta
+
+import os
+import random
+import threading
+import time
+
+import pytest
+
+import storage
+from metrics import counters
+from storage import RECORD_COLUMNS, SheetConnection, LocalWorksheet, ParquetRecordStore, SQLiteRecordStore, \
+    CircuitBreaker, CircuitOpenError, SheetsAPIError, SheetWriter, TokenBucket, backoff_delay, parquet_files, typed_row
+
+class FakeCredentials:
+    def __init__(self, **expiry):
+        self.__dict__.update(expiry)
+
+class FakeLoginHolder:
+    """Stands in for a gspread client or http_client: holds `auth` and counts login() calls"""
+    def __init__(self, auth):
+        self.auth = auth
+        self.logins = 0
+
+    def login(self):
+        self.logins += 1
+
+def connection_with_client(client):
+    worksheet = LocalWorksheet()
+    connection = SheetConnection(None, open_worksheet=lambda: worksheet)
+    connection.worksheet()
+    connection._client = client
+    return connection
+
+# ---------- TOKEN REFRESH ----------
+def test_refreshes_google_auth_credentials_before_expiry():
+    http_client = FakeLoginHolder(FakeCredentials(expiry=datetime.utcnow() + timedelta(minutes=1)))
+    client = type("Client", (), {'http_client': http_client})()
+    connection_with_client(client).worksheet()
+    assert http_client.logins == 1
+
+def test_refreshes_oauth2client_credentials_before_expiry():
+    client = FakeLoginHolder(FakeCredentials(token_expiry=datetime.utcnow() + timedelta(minutes=1)))
+    connection_with_client(client).worksheet()
+    assert client.logins == 1
+
+def test_leaves_fresh_token_alone():
+    client = FakeLoginHolder(FakeCredentials(token_expiry=datetime.utcnow() + timedelta(hours=1)))
+    connection_with_client(client).worksheet()
+    assert client.logins == 0
+
+# ---------- RETRIES AND CIRCUIT BREAKER ----------
+@pytest.fixture
+def delays(monkeypatch):
+    """Backoff delays asked for by SheetConnection.call, which then retries at once"""
+    asked = []
+    monkeypatch.setattr(storage, "backoff_delay", lambda retry: asked.append(retry) or 0.0)
+    return asked
+
+class Opener:
+    """open_worksheet callable that counts (re)connections"""
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+        self.opens = 0
+
+    def __call__(self):
+        self.opens += 1
+        return self.worksheet
+
+def test_backoff_is_jittered_and_capped():
+    random.seed(1)
+    for retry in range(8):
+        bound = min(storage.RETRY_MAX_DELAY, storage.RETRY_BASE_DELAY * 2 ** retry)
+        samples = [backoff_delay(retry) for _ in range(200)]
+        assert all(0 <= delay <= bound for delay in samples)
+        assert len(set(samples)) > 1
+
+def test_retries_transient_errors_with_backoff(delays):
+    opener = Opener(LocalWorksheet([["a"]], errors=[503, 429]))
+    connection = SheetConnection(None, open_worksheet=opener)
+    retries_before = counters().get("sheets_retry", 0)
+    assert connection.call('get_all_values') == [["a"]]
+    assert opener.worksheet.calls == 3 and delays == [0, 1]
+    assert counters()["sheets_retry"] - retries_before == 2
+    assert opener.opens == 1  # the API answered, so the handle was kept
+
+def test_gives_up_after_the_last_attempt(delays):
+    worksheet = LocalWorksheet(errors=[503] * 10)
+    connection = SheetConnection(None, open_worksheet=Opener(worksheet), attempts=3)
+    with pytest.raises(SheetsAPIError):
+        connection.call('get_all_values')
+    assert worksheet.calls == 3 and delays == [0, 1]
+
+@pytest.mark.parametrize("status", [400, 403, 404])
+def test_rejected_requests_are_neither_retried_nor_reconnected(delays, status):
+    opener = Opener(LocalWorksheet(errors=[status]))
+    connection = SheetConnection(None, open_worksheet=opener)
+    with pytest.raises(SheetsAPIError):
+        connection.call('get_all_values')
+    assert opener.worksheet.calls == 1 and opener.opens == 1
+    assert connection.health()['connected']
+
+def test_auth_errors_reconnect_once(delays):
+    opener = Opener(LocalWorksheet([["a"]], errors=[401]))
+    connection = SheetConnection(None, open_worksheet=opener)
+    assert connection.call('get_all_values') == [["a"]]
+    assert opener.opens == 2 and delays == []
+
+def test_circuit_opens_after_repeated_outages_and_recovers(delays):
+    worksheet = LocalWorksheet([["a"]], errors=[503, 503, 503])
+    breaker = CircuitBreaker(threshold=3, reset_timeout=0.05)
+    connection = SheetConnection(None, open_worksheet=Opener(worksheet), breaker=breaker, attempts=1)
+    for _ in range(3):
+        with pytest.raises(SheetsAPIError):
+            connection.call('get_all_values')
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        connection.call('get_all_values')
+    assert worksheet.calls == 3  # rejected without calling Sheets
+    time.sleep(0.06)
+    assert connection.call('get_all_values') == [["a"]]  # the half-open trial call
+    assert breaker.state == "closed"
+
+def test_failed_trial_call_reopens_the_circuit(delays):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0.05)
+    connection = SheetConnection(None, open_worksheet=Opener(LocalWorksheet(errors=[503, 503])), breaker=breaker,
+                                 attempts=1)
+    with pytest.raises(SheetsAPIError):
+        connection.call('get_all_values')
+    time.sleep(0.06)
+    with pytest.raises(SheetsAPIError):
+        connection.call('get_all_values')
+    assert breaker.state == "open" and breaker.retry_in() > 0
+
+# ---------- SPOOL REPLAY ----------
+def test_spooled_rows_survive_failed_flushes_and_a_restart(delays):
+    rows = [["2024-05-01 10:00:00", "Asha"], ["2024-05-01 10:00:01", "Ravi"]]
+    down = SheetConnection(None, open_worksheet=Opener(LocalWorksheet(errors=[503] * 100)), attempts=2)
+    writer = SheetWriter(down, spool_path="spool.db", flush_interval=3600)
+    writer.enqueue_many(rows)
+    with pytest.raises(SheetsAPIError):
+        writer.flush()
+    writer.close()  # its final flush fails too
+    assert writer.pending() == 2
+
+    sheet = LocalWorksheet()
+    restarted = SheetWriter(SheetConnection(None, open_worksheet=Opener(sheet)), spool_path="spool.db",
+                            flush_interval=3600)
+    assert restarted.flush() == 2
+    assert sheet.rows == rows and restarted.pending() == 0
+    restarted.close()
+
+def test_writer_waits_for_the_circuit_while_rows_stay_spooled(delays):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=60)
+    sheet = LocalWorksheet(errors=[503])
+    connection = SheetConnection(None, open_worksheet=Opener(sheet), breaker=breaker, attempts=1)
+    writer = SheetWriter(connection, spool_path="spool.db", flush_interval=3600)
+    writer.enqueue(["2024-05-01 10:00:00", "Asha"])
+    with pytest.raises(SheetsAPIError):
+        writer.flush()
+    writer.enqueue(["2024-05-01 10:00:01", "Ravi"])
+    with pytest.raises(CircuitOpenError):
+        writer.flush()
+    writer.close()
+    assert writer.pending() == 2 and sheet.rows == []
+
+def test_writers_sharing_a_spool_send_each_row_once():
+    sheet = LocalWorksheet(latency=0.005)
+    # Two writers on one spool file stand in for the app and the scoring service
+    writers = [SheetWriter(SheetConnection(None, open_worksheet=Opener(sheet), write_limiter=TokenBucket(1e6, 1e6)),
+                           spool_path="spool.db", batch_size=7, flush_interval=3600) for _ in range(2)]
+    rows = [[f"2024-05-01 10:{i // 60:02d}:{i % 60:02d}", f"Patient {i}"] for i in range(200)]
+    writers[0].enqueue_many(rows[:100])
+    writers[1].enqueue_many(rows[100:])
+    threads = [threading.Thread(target=writer.flush) for writer in writers for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(sheet.rows) == sorted(rows)
+    assert sum(writer.rows_written for writer in writers) == 200
+    for writer in writers:
+        writer.close()
+
+def test_failed_append_hands_its_claim_back(delays):
+    sheet = LocalWorksheet(errors=[403])
+    writer = SheetWriter(SheetConnection(None, open_worksheet=Opener(sheet)), spool_path="spool.db",
+                         flush_interval=3600)
+    writer.enqueue(["2024-05-01 10:00:00", "Asha"])
+    with pytest.raises(SheetsAPIError):
+        writer.flush()
+    other = SheetWriter(SheetConnection(None, open_worksheet=Opener(sheet)), spool_path="spool.db",
+                        flush_interval=3600)
+    assert other.flush() == 1 and sheet.rows == [["2024-05-01 10:00:00", "Asha"]]
+    writer.close()
+    other.close()
+
+# ---------- RECORD STORES ----------
+def record_rows(n, day="2024-05-01"):
+    rows = []
+    for i in range(n):
+        record = dict.fromkeys(RECORD_COLUMNS, "")
+        record.update(timestamp=f"{day} 10:{i // 60:02d}:{i % 60:02d}", name=f"Patient {i}", age=str(20 + i % 50),
+                      bp="TRUE" if i % 2 else "FALSE", location="Pune", ml_predictions="Flu: 41.5%")
+        rows.append([record[column] for column in RECORD_COLUMNS])
+    return rows
+
+def test_sqlite_scan_streams_every_row_in_batches():
+    store = SQLiteRecordStore("records.db")
+    rows = record_rows(25)
+    store.append_many(rows)
+    batches = list(store.scan(batch_size=10))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert [row for batch in batches for row in batch] == [typed_row(row) for row in rows]
+    store.close()
+
+def test_sqlite_scan_sees_rows_appended_between_batches():
+    store = SQLiteRecordStore("records.db")
+    store.append_many(record_rows(4))
+    scanned = 0
+    for batch in store.scan(batch_size=2):
+        if not scanned:
+            store.append_many(record_rows(2, day="2024-05-02"))
+        scanned += len(batch)
+    assert scanned == 6
+    store.close()
+
+def test_parquet_rows_are_durable_before_a_flush():
+    store = ParquetRecordStore("records", buffer_rows=50)
+    rows = record_rows(3)
+    store.append_many(rows)
+    assert store.pending() == 3 and parquet_files("records") == []
+    # Another process opening the same root reads the spooled rows
+    other = ParquetRecordStore("records", buffer_rows=50)
+    assert [row for batch in other.scan() for row in batch] == [typed_row(row) for row in rows]
+    assert store.pending() == 0
+    other.close()
+    store.close()
+
+def test_parquet_spools_a_batch_in_one_transaction():
+    store = ParquetRecordStore("records", buffer_rows=1000)
+    statements = []
+    store._db.set_trace_callback(statements.append)
+    store.append_many(record_rows(20))
+    writes = [s.split()[0] for s in statements if not s.startswith("SELECT")]
+    assert writes == ["BEGIN"] + ["INSERT"] * 20 + ["COMMIT"]
+    assert store.pending() == 20
+
+def test_parquet_flush_replay_overwrites_its_own_files():
+    store = ParquetRecordStore("records", buffer_rows=50)
+    store.append_many(record_rows(3))
+    written = store._write([typed_row(row) + ["Flu"] for row in record_rows(3)], "part-000000000001")
+    # As if the process died after writing but before clearing the spool
+    store.flush()
+    assert parquet_files("records") == [os.path.join("records", "date=2024-05-01", "part-000000000001.parquet")]
+    assert written == [os.path.join("records", "date=2024-05-01")]
+    assert len(store.query()) == 3
+    store.close()
+
+def test_parquet_compacts_a_partition_into_one_file():
+    store = ParquetRecordStore("records", buffer_rows=1, compact_files=4)
+    rows = record_rows(6)
+    for row in rows:
+        store.append_many([row])
+    files = parquet_files("records")
+    assert len(files) < 4 and any(os.path.basename(path).startswith("compact-") for path in files)
+    assert store.query() == [typed_row(row) for row in rows]
+    store.close()
+
+def test_parquet_reads_skip_files_an_interrupted_compaction_left_behind():
+    store = ParquetRecordStore("records", buffer_rows=1, compact_files=3)
+    rows = record_rows(3)
+    for row in rows[:2]:
+        store.append_many([row])
+    directory = os.path.join("records", "date=2024-05-01")
+    leftovers = {name: open(os.path.join(directory, name), 'rb').read() for name in os.listdir(directory)
+                 if name.endswith(".parquet")}
+    store.append_many([rows[2]])
+    # Put back the merged files as if their removal had not happened
+    for name, data in leftovers.items():
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(data)
+    assert len(store.query()) == 3
+    store._compact(directory)
+    assert len(os.listdir(directory)) == 1
+    store.close()
+
+@pytest.mark.parametrize("make_store", [lambda: SQLiteRecordStore("records.db"),
+                                        lambda: ParquetRecordStore("records", buffer_rows=2)])
+def test_query_filters_by_range_and_location(make_store):
+    store = make_store()
+    store.append_many(record_rows(3, day="2024-05-01") + record_rows(2, day="2024-05-03"))
+    assert len(store.query(start="2024-05-02")) == 2
+    assert len(store.query(end="2024-05-02")) == 3
+    assert store.query(location="Mumbai") == []
+    assert len(store.query(predicted_condition="Flu")) == 5
+    store.close()
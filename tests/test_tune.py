@@ -0,0 +1,33 @@
+import json
+import os
+
+import pytest
+import sklearn.ensemble
+
+import tune
+
+PARAMS = tune.candidates({'n_estimators': [5], 'max_depth': [4]})[0]
+
+def test_fold_results_are_cached_and_reused(monkeypatch):
+    first = tune.evaluate_fold(PARAMS, 0, 3, 300, 1, ".")
+    assert os.listdir(".") == [tune.fold_key(PARAMS, 0, 3, 300, 1) + ".json"]
+
+    # A cached fold is read back without fitting anything
+    def no_fit(*args, **kwargs):
+        raise AssertionError("fitted a fold that was cached")
+    monkeypatch.setattr(sklearn.ensemble, "RandomForestClassifier", no_fit)
+    assert tune.evaluate_fold(PARAMS, 0, 3, 300, 1, ".") == json.loads(json.dumps(first))
+    for other in [(dict(PARAMS, max_depth=5), 0, 3, 300, 1), (PARAMS, 1, 3, 300, 1), (PARAMS, 0, 3, 300, 2)]:
+        with pytest.raises(AssertionError, match="fitted a fold"):
+            tune.evaluate_fold(*other, ".")
+
+def test_resumed_search_reads_every_fold_from_the_cache():
+    args = ["--grid", '{"n_estimators": [5, 10], "max_depth": [4]}', "--folds", "2", "--samples", "300",
+            "--workers", "1", "--cache-dir", "cache"]
+    tune.main(args + ["--output", "first.json"])
+    cached = {name: os.path.getmtime(os.path.join("cache", name)) for name in os.listdir("cache")}
+    assert len(cached) == 4
+    tune.main(args + ["--output", "second.json"])
+    assert {name: os.path.getmtime(os.path.join("cache", name)) for name in os.listdir("cache")} == cached
+    with open("first.json") as f, open("second.json") as g:
+        assert json.load(f)['leaderboard'] == json.load(g)['leaderboard']
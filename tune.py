@@ -0,0 +1,200 @@
+"""Hyperparameter search for the disease predictor with stratified k-fold CV
+
+Fits every (parameter set, fold) pair across a process pool and caches each
+fold's result as a JSON file, so an interrupted search resumes where it
+stopped. The leaderboard ranks parameter sets by mean CV accuracy and also
+reports per-class F1, fit time and single-row inference latency, so a model
+that is both accurate and fast can be picked for MODEL_PARAMS.
+
+    python tune.py --folds 5 --workers 8 --output leaderboard.json
+    python tune.py --grid '{"n_estimators": [50, 100], "max_depth": [8, 10]}' --search random --n-iter 4
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import predictor as predictor_module
+from predictor import (MODEL_PARAMS, MODEL_VERSION, SYMPTOM_FEATURES, TRAINING_SAMPLES, TRAINING_SEED,
+                       FlatForest, SymptomPredictor)
+
+TUNE_CACHE_DIR = os.path.join("data", "tune_cache")
+DEFAULT_GRID = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [6, 10, None],
+    'min_samples_split': [2, 5],
+    'min_samples_leaf': [1, 2]
+}
+LATENCY_CALLS = 200  # single-row predictions timed per fold
+
+def candidates(grid, search='grid', n_iter=None, seed=0):
+    """Parameter sets to evaluate: the full grid, or n_iter random picks from it"""
+    names = sorted(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    if search == 'random' and n_iter is not None and n_iter < len(combos):
+        combos = random.Random(seed).sample(combos, n_iter)
+    # Parameters left out of the grid keep their MODEL_PARAMS value
+    return [dict(MODEL_PARAMS, **combo) for combo in combos]
+
+def fold_key(params, fold, folds, samples, seed):
+    """Cache file name for one fold of one parameter set on one dataset"""
+    import sklearn
+    spec = {
+        'version': MODEL_VERSION, 'features': SYMPTOM_FEATURES, 'samples': samples, 'seed': seed,
+        'folds': folds, 'fold': fold, 'params': params, 'sklearn': sklearn.__version__,
+        'engine': predictor_module.FOREST_ENGINE
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:20]
+
+def single_row_latency(model, X, calls=LATENCY_CALLS):
+    """Median seconds to score one row with the serving forest engine"""
+    if predictor_module.FOREST_ENGINE == "flat":
+        score = FlatForest(model).predict_proba
+    else:
+        score = model.predict_proba
+        calls = min(calls, 20)  # predict_proba costs milliseconds per row
+    timings = []
+    for i in range(calls):
+        row = X[i % len(X)][np.newaxis, :]
+        start = time.perf_counter()
+        score(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def evaluate_fold(params, fold, folds, samples, seed, cache_dir):
+    """Fit and score one fold, reading or writing its cached result"""
+    path = os.path.join(cache_dir, fold_key(params, fold, folds, samples, seed) + ".json")
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import accuracy_score, classification_report
+    from sklearn.model_selection import StratifiedKFold
+
+    data = SymptomPredictor()
+    X, y = data.prepare_training_data(samples, seed)
+    splits = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(X, y)
+    train_idx, test_idx = next(itertools.islice(splits, fold, None))
+
+    model = RandomForestClassifier(**params, n_jobs=1)
+    start = time.perf_counter()
+    model.fit(X[train_idx], y[train_idx])
+    fit_seconds = time.perf_counter() - start
+    y_pred = model.predict(X[test_idx])
+    labels = np.arange(len(data.label_encoder.classes_))
+    result = {
+        'params': params,
+        'fold': fold,
+        'accuracy': accuracy_score(y[test_idx], y_pred),
+        'report': classification_report(y[test_idx], y_pred, labels=labels,
+                                        target_names=list(data.label_encoder.classes_),
+                                        output_dict=True, zero_division=0),
+        'fit_seconds': fit_seconds,
+        'latency_seconds': single_row_latency(model, X[test_idx].astype(np.float32)),
+        'y_true': y[test_idx].tolist(),
+        'y_pred': y_pred.tolist()
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(result, f)
+    os.replace(tmp_path, path)
+    return result
+
+def leaderboard(results, class_names):
+    """One row per parameter set, best mean accuracy first (faster inference breaks ties)"""
+    from sklearn.metrics import classification_report
+    by_params = {}
+    for result in results:
+        by_params.setdefault(json.dumps(result['params'], sort_keys=True), []).append(result)
+    rows = []
+    for key, fold_results in by_params.items():
+        accuracies = [r['accuracy'] for r in fold_results]
+        # Out-of-fold predictions from every fold give one report over the whole dataset
+        y_true = list(itertools.chain.from_iterable(r['y_true'] for r in fold_results))
+        y_pred = list(itertools.chain.from_iterable(r['y_pred'] for r in fold_results))
+        report = classification_report(y_true, y_pred, labels=list(range(len(class_names))),
+                                       target_names=class_names, output_dict=True, zero_division=0)
+        rows.append({
+            'params': json.loads(key),
+            'folds': len(fold_results),
+            'accuracy_mean': float(np.mean(accuracies)),
+            'accuracy_std': float(np.std(accuracies)),
+            'macro_f1': report['macro avg']['f1-score'],
+            'class_f1': {name: report[name]['f1-score'] for name in class_names},
+            'fit_seconds': float(np.mean([r['fit_seconds'] for r in fold_results])),
+            'latency_us': float(np.mean([r['latency_seconds'] for r in fold_results])) * 1e6,
+            'report': report
+        })
+    rows.sort(key=lambda row: (-row['accuracy_mean'], row['latency_us']))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--grid", help="JSON object (or path to one) mapping parameter names to value lists")
+    parser.add_argument("--search", choices=['grid', 'random'], default='grid', help="full grid or random picks")
+    parser.add_argument("--n-iter", type=int, help="parameter sets to try with --search random")
+    parser.add_argument("--folds", type=int, default=5, help="stratified CV folds")
+    parser.add_argument("--samples", type=int, default=TRAINING_SAMPLES, help="synthetic training rows")
+    parser.add_argument("--seed", type=int, default=TRAINING_SEED, help="seed for the data, folds and random search")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--cache-dir", default=TUNE_CACHE_DIR, help="directory for cached fold results")
+    parser.add_argument("--output", help="write the leaderboard JSON here")
+    parser.add_argument("--top", type=int, default=10, help="leaderboard rows to print")
+    args = parser.parse_args(argv)
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        if os.path.exists(args.grid):
+            with open(args.grid) as f:
+                grid = json.load(f)
+        else:
+            grid = json.loads(args.grid)
+    params_list = candidates(grid, args.search, args.n_iter, args.seed)
+    os.makedirs(args.cache_dir, exist_ok=True)
+
+    tasks = [(params, fold) for params in params_list for fold in range(args.folds)]
+    print(f"[tune] {len(params_list)} parameter sets x {args.folds} folds", file=sys.stderr)
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(evaluate_fold, params, fold, args.folds, args.samples, args.seed, args.cache_dir)
+                   for params, fold in tasks]
+        for done, future in enumerate(as_completed(futures), 1):
+            results.append(future.result())
+            if done % max(len(futures) // 10, 1) == 0:
+                print(f"[tune] {done}/{len(futures)} folds done, {time.perf_counter() - start:.1f}s",
+                      file=sys.stderr)
+
+    data = SymptomPredictor()
+    data.prepare_training_data(args.samples, args.seed)
+    class_names = list(data.label_encoder.classes_)
+    board = leaderboard(results, class_names)
+
+    print(f"{'accuracy':>14} {'macro F1':>8} {'fit s':>7} {'latency us':>10}  params")
+    for row in board[:args.top]:
+        shown = {name: row['params'][name] for name in sorted(grid)}
+        print(f"{row['accuracy_mean']:>7.4f}±{row['accuracy_std']:.4f} {row['macro_f1']:>8.4f} "
+              f"{row['fit_seconds']:>7.3f} {row['latency_us']:>10.1f}  {shown}")
+    if board:
+        best = board[0]
+        print("\nPer-class report for the best parameter set:")
+        for name in class_names:
+            stats = best['report'][name]
+            print(f"  {name:<22} precision {stats['precision']:.3f}  recall {stats['recall']:.3f}  "
+                  f"f1 {stats['f1-score']:.3f}  support {stats['support']:.0f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'grid': grid, 'folds': args.folds, 'samples': args.samples, 'seed': args.seed,
+                       'leaderboard': board}, f, indent=2)
+
+if __name__ == "__main__":
+    main()